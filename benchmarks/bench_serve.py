@@ -0,0 +1,307 @@
+"""
+Load test of the HTTP/JSON API (cli_pyassist.py serve).
+
+The benchmark starts the server on a free port (or uses a running one given with --url) and sends GET requests
+from many keep-alive connections at the same time for the given duration, each connection sends its next request
+when the previous response has been read. The paths are requested in turn (--path can be repeated).
+The client is a minimal HTTP/1.1 client on asyncio streams (stdlib only): it reads responses with Content-Length
+and chunked ones (streamed JSON lines). Only GET requests are sent, so the data of the server is not changed.
+Reported: requests/sec, latency percentiles (p50, p90, p99, max) overall and per path, errors (statuses >= 400
+and connection errors). Results are saved to a JSON file, which can be compared with the results of another run.
+The run fails (exit status 1) if there were errors, if p99 is over --max-p99-ms or requests/sec under --min-rps.
+
+Usage (from the repository root):
+    python benchmarks/bench_serve.py --connections 32 --duration 10 --output after.json --compare before.json
+    python benchmarks/bench_serve.py --url http://127.0.0.1:8080 --path "/contacts?q=smith" --path /birthdays
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+import platform
+import subprocess
+from urllib.parse import urlsplit
+
+PACKAGE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "pyassit_poetry"
+)
+
+DEFAULT_PATHS = [
+    "/health",
+    "/contacts?limit=20",
+    "/contacts?q=a&limit=50",
+    "/birthdays?days=30",
+    "/notes?q=a&limit=50",
+]
+
+
+class Client:
+    """
+    Minimal HTTP/1.1 client with one keep-alive connection.
+
+    Args:
+        host (str): host of the server
+        port (int): port of the server
+    """
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method: str, path: str, body=None) -> tuple:
+        """
+        The method sends a request (reconnecting if the server has closed the connection) and reads the response.
+
+        :param body: JSON body of the request
+        :type body: dict
+        :return: status, headers (lowercase names) and body of the response
+        :rtype: tuple
+        """
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port
+            )
+        data = json.dumps(body).encode() if body is not None else b""
+        self.writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+        )
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split(" ")[1])
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        if headers.get("transfer-encoding") == "chunked":
+            body = b""
+            while True:
+                size = int((await self.reader.readuntil(b"\r\n")).strip(), 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                body += chunk[:-2]
+        else:
+            body = await self.reader.readexactly(int(headers.get("content-length", 0)))
+        if headers.get("connection") == "close":
+            await self.close()
+        return status, headers, body
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = self.reader = None
+
+
+async def _connection(host, port, paths, offset, deadline, samples):
+    # one keep-alive connection sending the paths in turn until the deadline
+    client = Client(host, port)
+    i = offset
+    try:
+        while time.perf_counter() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                status, _, _ = await client.request("GET", path)
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                samples.append((path, time.perf_counter() - start, type(e).__name__))
+                await client.close()
+                continue
+            samples.append((path, time.perf_counter() - start, status))
+    finally:
+        await client.close()
+
+
+async def load_test(host, port, paths, connections, duration) -> tuple:
+    deadline = time.perf_counter() + duration
+    samples = []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            _connection(host, port, paths, i, deadline, samples)
+            for i in range(connections)
+        )
+    )
+    return samples, time.perf_counter() - start
+
+
+def percentiles(latencies: list) -> dict:
+    latencies = sorted(latencies)
+    if not latencies:
+        return {}
+
+    def percentile(p):
+        return latencies[min(int(len(latencies) * p), len(latencies) - 1)]
+
+    return {
+        "p50_ms": percentile(0.5) * 1000,
+        "p90_ms": percentile(0.9) * 1000,
+        "p99_ms": percentile(0.99) * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+def summarize(samples: list, elapsed: float) -> dict:
+    errors = [
+        sample
+        for sample in samples
+        if not isinstance(sample[2], int) or sample[2] >= 400
+    ]
+    summary = {
+        "requests": len(samples),
+        "errors": len(errors),
+        "requests_per_s": len(samples) / elapsed,
+        **percentiles([latency for _, latency, _ in samples]),
+        "paths": {},
+    }
+    for path in dict.fromkeys(path for path, _, _ in samples):
+        latencies = [
+            latency for sample_path, latency, _ in samples if sample_path == path
+        ]
+        summary["paths"][path] = {"requests": len(latencies), **percentiles(latencies)}
+    return summary
+
+
+def start_server(workers: int) -> tuple:
+    """
+    The function starts cli_pyassist.py serve on a free port.
+
+    :return: the server process and its URL
+    :rtype: tuple
+    """
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "cli_pyassist.py",
+            "serve",
+            "--port",
+            "0",
+            "--workers",
+            str(workers),
+        ],
+        cwd=PACKAGE_DIR,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    # Serving PyAssist API on http://127.0.0.1:<port> (...)
+    line = process.stdout.readline()
+    if not line.startswith("Serving"):
+        process.kill()
+        raise RuntimeError(f"the server has not started: {line!r}")
+    return process, line.split()[4]
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGINT if os.name == "posix" else signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def compare(result: dict, baseline: dict):
+    print(f"{'metric':<20}{'baseline':>14}{'current':>14}{'change':>10}")
+    for name in ("requests_per_s", "p50_ms", "p90_ms", "p99_ms", "max_ms"):
+        previous, value = baseline["summary"].get(name), result["summary"].get(name)
+        if previous and value is not None:
+            print(
+                f"{name:<20}{previous:>14.4g}{value:>14.4g}{(value / previous - 1):>+10.1%}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP/JSON API load test")
+    parser.add_argument("--url", help="URL of a running server (default: start one)")
+    parser.add_argument(
+        "--path", action="append", help="requested path (default: a mix of endpoints)"
+    )
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10, help="seconds")
+    parser.add_argument(
+        "--server-workers", type=int, default=4, help="--workers of the started server"
+    )
+    parser.add_argument("--max-p99-ms", type=float, help="maximum p99 latency in ms")
+    parser.add_argument("--min-rps", type=float, help="minimum requests/sec")
+    parser.add_argument("--output", default="bench_serve.json")
+    parser.add_argument("--compare", help="JSON file with baseline results")
+    arguments = parser.parse_args()
+    paths = arguments.path or DEFAULT_PATHS
+
+    process = None
+    url = arguments.url
+    if url is None:
+        process, url = start_server(arguments.server_workers)
+    try:
+        address = urlsplit(url)
+        # a short warm-up run (thread pool, snapshots of the data)
+        asyncio.run(load_test(address.hostname, address.port, paths, 1, 0.5))
+        samples, elapsed = asyncio.run(
+            load_test(
+                address.hostname,
+                address.port,
+                paths,
+                arguments.connections,
+                arguments.duration,
+            )
+        )
+    finally:
+        if process is not None:
+            stop_server(process)
+    summary = summarize(samples, elapsed)
+    print(
+        f"{summary['requests']} requests in {elapsed:.2f} s over {arguments.connections} connections: "
+        f"{summary['requests_per_s']:.0f} requests/s, {summary['errors']} errors"
+    )
+    print(
+        f"latency: p50 {summary['p50_ms']:.2f} ms, p90 {summary['p90_ms']:.2f} ms, "
+        f"p99 {summary['p99_ms']:.2f} ms, max {summary['max_ms']:.2f} ms"
+    )
+    for path, stats in summary["paths"].items():
+        print(
+            f"    {stats['requests']:>8}  p50 {stats['p50_ms']:8.2f} ms  p99 {stats['p99_ms']:8.2f} ms  {path}"
+        )
+    result = {
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "url": url,
+        "connections": arguments.connections,
+        "duration": arguments.duration,
+        "summary": summary,
+    }
+    with open(arguments.output, "w") as fh:
+        json.dump(result, fh, indent=2)
+    print(f"Results saved to {arguments.output}")
+    if arguments.compare:
+        with open(arguments.compare) as fh:
+            compare(result, json.load(fh))
+    failures = []
+    if summary["errors"]:
+        failures.append(f"{summary['errors']} requests failed")
+    if arguments.max_p99_ms is not None and summary["p99_ms"] > arguments.max_p99_ms:
+        failures.append(
+            f"p99 {summary['p99_ms']:.2f} ms is over the budget of {arguments.max_p99_ms} ms"
+        )
+    if arguments.min_rps is not None and summary["requests_per_s"] < arguments.min_rps:
+        failures.append(
+            f"{summary['requests_per_s']:.0f} requests/s is under {arguments.min_rps}"
+        )
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+Throughput benchmark of FileSorter on reproducible synthetic directory trees.
+
+Every run generates a tree in a temporary directory, sorts it in a separate process (with HOME pointing to
+the temporary directory, so the real report, journal and index are not touched) and records:
+files/sec, wall time of the phases (plan, execute), peak RSS and - if strace is available -
+syscall counts (from a second, traced run on an identical tree, so tracing does not distort the timings).
+Results are saved to a JSON file, which can be compared with the results of another run.
+
+Usage (from the repository root):
+    python benchmarks/bench_sort.py --files 20000 --workers 4 --output after.json --compare before.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import zipfile
+
+PACKAGE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "pyassit_poetry"
+)
+
+POLISH_NAMES = ["zdjęcie", "Łódź", "źródło", "ŚCIEŻKA", "żółw", "gęś", "ćma", "pączek"]
+LATIN_NAMES = [
+    "IMG_0001",
+    "report",
+    "a b c",
+    "notes-final",
+    "scan",
+    "x",
+    "holiday photo",
+    "data",
+]
+DIRECTORY_NAMES = [
+    "sub",
+    "Folder ą",
+    "data",
+    "sub 2",
+    "Dir-ż",
+    "folder_a",
+    "2024",
+    "misc",
+]
+DEFAULT_EXTENSIONS = ".jpg:20,.JPG:5,.png:10,.txt:10,.pdf:10,.mp3:8,.mkv:4,.docx:5,.xyz:10,:3,.webp:3,.flac:2"
+
+
+def _parse_extensions(extensions: str) -> tuple:
+    # ".jpg:20,.txt:10,:3" -> ([".jpg", ".txt", ""], [20, 10, 3])
+    names, weights = [], []
+    for item in extensions.split(","):
+        name, _, weight = item.rpartition(":")
+        names.append(name)
+        weights.append(float(weight))
+    return names, weights
+
+
+def generate_tree(root: str, params: dict) -> dict:
+    """
+    The function generates a reproducible directory tree (the same params always give the same tree).
+
+    :param root: path to the (existing, empty) directory in which the tree is generated
+    :type root: str
+    :param params: generator parameters (see the command line arguments)
+    :type params: dict
+    :return: statistics of the generated tree
+    :rtype: dict
+    """
+    rng = random.Random(params["seed"])
+    extensions, weights = _parse_extensions(params["extensions"])
+    directories = [root]
+    level = [root]
+    for _ in range(params["depth"]):
+        next_level = []
+        for parent in level:
+            for i in range(params["fanout"]):
+                directory = os.path.join(parent, f"{rng.choice(DIRECTORY_NAMES)} {i}")
+                os.mkdir(directory)
+                next_level.append(directory)
+        directories.extend(next_level)
+        level = next_level
+    size = 0
+    names = set()
+    for i in range(params["files"]):
+        directory = rng.choice(directories)
+        if rng.random() < params["polish"]:
+            name = rng.choice(POLISH_NAMES)
+        else:
+            name = rng.choice(LATIN_NAMES)
+        # names without a number collide with each other after normalization
+        if rng.random() >= params["collisions"]:
+            name = f"{name} {i}"
+        extension = rng.choices(extensions, weights)[0]
+        path = os.path.join(directory, name + extension)
+        if path in names:
+            path = os.path.join(directory, f"{name} {i}{extension}")
+        names.add(path)
+        with open(path, "wb") as fh:
+            fh.write(rng.randbytes(rng.randint(0, params["max_size"])))
+        size += os.path.getsize(path)
+    for i in range(params["archives"]):
+        path = os.path.join(rng.choice(directories), f"archive {i}.zip")
+        with zipfile.ZipFile(path, "w") as archive:
+            for j in range(params["archive_members"]):
+                # a fixed date keeps the archives identical between runs
+                archive.writestr(
+                    zipfile.ZipInfo(f"member {j}.txt", (2020, 1, 1, 0, 0, 0)),
+                    rng.randbytes(rng.randint(0, params["max_size"])),
+                )
+        size += os.path.getsize(path)
+    return {
+        "directories": len(directories),
+        "files": params["files"] + params["archives"],
+        "bytes": size,
+    }
+
+
+def _run_sort(root: str, sorter_args: dict) -> dict:
+    # runs in the child process: sorts the tree and measures the phases
+    sys.path.insert(0, PACKAGE_DIR)
+    from utility.sorter import FileSorter
+
+    sorter = FileSorter(**sorter_args)
+    start = time.perf_counter()
+    plan = sorter.plan(root)
+    planned = time.perf_counter()
+    sorter.apply(plan, root)
+    executed = time.perf_counter()
+    return {
+        "operations": len(plan),
+        "phases": {"plan": planned - start, "execute": executed - planned},
+        "wall": executed - start,
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        // (1024 if sys.platform == "darwin" else 1),
+    }
+
+
+def _child_command(root: str, sorter_args: dict) -> list:
+    return [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--child",
+        root,
+        json.dumps(sorter_args),
+    ]
+
+
+def _parse_strace(file_path: str) -> dict:
+    # summary table of strace -c: % time, seconds, usecs/call, calls, errors, syscall
+    calls = {}
+    with open(file_path) as fh:
+        for line in fh:
+            fields = line.split()
+            if len(fields) >= 5 and fields[0][0].isdigit() and fields[-1] != "total":
+                try:
+                    calls[fields[-1]] = int(fields[3])
+                except ValueError:
+                    continue
+    return dict(sorted(calls.items(), key=lambda item: -item[1]))
+
+
+def run_once(params: dict, sorter_args: dict, strace: bool) -> dict:
+    with tempfile.TemporaryDirectory(prefix="bench_sort_") as base:
+        root = os.path.join(base, "tree")
+        os.mkdir(root)
+        tree = generate_tree(root, params)
+        env = dict(os.environ, HOME=base)
+        output = subprocess.run(
+            _child_command(root, sorter_args),
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result["tree"] = tree
+        result["files_per_sec"] = tree["files"] / result["wall"]
+        if strace:
+            shutil.rmtree(root)
+            os.mkdir(root)
+            shutil.rmtree(os.path.join(base, "PyAssist"), ignore_errors=True)
+            generate_tree(root, params)
+            strace_file = os.path.join(base, "strace.txt")
+            traced = subprocess.run(
+                ["strace", "-f", "-c", "-o", strace_file]
+                + _child_command(root, sorter_args),
+                env=env,
+                capture_output=True,
+            )
+            # e.g. ptrace is not permitted in a container
+            if traced.returncode == 0:
+                result["syscalls"] = _parse_strace(strace_file)
+                result["syscalls_total"] = sum(result["syscalls"].values())
+    return result
+
+
+def summarize(runs: list) -> dict:
+    # median of every numeric measurement of the runs
+    def median(values):
+        values = sorted(values)
+        return values[len(values) // 2]
+
+    summary = {
+        "files_per_sec": median([run["files_per_sec"] for run in runs]),
+        "wall": median([run["wall"] for run in runs]),
+        "peak_rss_kb": median([run["peak_rss_kb"] for run in runs]),
+        "phases": {
+            phase: median([run["phases"][phase] for run in runs])
+            for phase in runs[0]["phases"]
+        },
+    }
+    if "syscalls_total" in runs[0]:
+        summary["syscalls_total"] = runs[0]["syscalls_total"]
+    return summary
+
+
+def compare(result: dict, baseline: dict):
+    # prints the change of every summary measurement against the baseline
+    def rows(current, previous, prefix=""):
+        for key, value in current.items():
+            if isinstance(value, dict):
+                yield from rows(value, previous.get(key, {}), f"{prefix}{key}.")
+            elif key in previous and previous[key]:
+                yield f"{prefix}{key}", previous[key], value
+
+    print(f"{'metric':<24}{'baseline':>14}{'current':>14}{'change':>10}")
+    for name, previous, value in rows(result["summary"], baseline["summary"]):
+        print(
+            f"{name:<24}{previous:>14.4g}{value:>14.4g}{(value / previous - 1):>+10.1%}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FileSorter throughput benchmark")
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument(
+        "--extensions",
+        default=DEFAULT_EXTENSIONS,
+        help="extension mix as ext:weight pairs, e.g. .jpg:20,.txt:10,:3 (empty - no extension)",
+    )
+    parser.add_argument(
+        "--collisions",
+        type=float,
+        default=0.3,
+        help="share of files with colliding names",
+    )
+    parser.add_argument(
+        "--polish",
+        type=float,
+        default=0.3,
+        help="share of files with Polish characters in names",
+    )
+    parser.add_argument("--archives", type=int, default=20)
+    parser.add_argument("--archive-members", type=int, default=10)
+    parser.add_argument("--max-size", type=int, default=4096)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--dedupe", choices=("hardlink", "move", "skip"))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-strace", action="store_true")
+    parser.add_argument("--output", default="bench_sort.json")
+    parser.add_argument("--compare", help="JSON file with baseline results")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    if arguments.child:
+        root, sorter_args = arguments.child
+        print(json.dumps(_run_sort(root, json.loads(sorter_args))))
+        return
+
+    params = {
+        "files": arguments.files,
+        "depth": arguments.depth,
+        "fanout": arguments.fanout,
+        "extensions": arguments.extensions,
+        "collisions": arguments.collisions,
+        "polish": arguments.polish,
+        "archives": arguments.archives,
+        "archive_members": arguments.archive_members,
+        "max_size": arguments.max_size,
+        "seed": arguments.seed,
+    }
+    sorter_args = {"workers": arguments.workers, "dedupe": arguments.dedupe}
+    strace = not arguments.no_strace and shutil.which("strace") is not None
+    runs = []
+    for i in range(arguments.repeat):
+        # syscalls are counted in the first run only (the tree is the same every time)
+        runs.append(run_once(params, sorter_args, strace and i == 0))
+        print(
+            f"run {i + 1}/{arguments.repeat}: {runs[-1]['files_per_sec']:.0f} files/s, "
+            f"{runs[-1]['wall']:.3f} s, peak RSS {runs[-1]['peak_rss_kb']} kB"
+        )
+    result = {
+        "params": params,
+        "sorter": sorter_args,
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "runs": runs,
+        "summary": summarize(runs),
+    }
+    if not strace:
+        result["strace"] = "not available" if not arguments.no_strace else "disabled"
+    with open(arguments.output, "w") as fh:
+        json.dump(result, fh, indent=2)
+    print(f"Results saved to {arguments.output}")
+    if arguments.compare:
+        with open(arguments.compare) as fh:
+            compare(result, json.load(fh))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Startup benchmark of the CLI entry point (cli_pyassist.py).
+
+Every run starts a new interpreter and measures time-to-prompt: the wall time from starting the process
+to the moment the first prompt could be shown (the module is imported, the banner printed, the addressbook
+and the notes loaded and prompt_toolkit imported for the prompt). The imports of the module alone are
+profiled with python -X importtime: the modules with the longest cumulative and self import times are listed
+and the modules which must be imported on first use only (the banner, the exit cow, prompts, email validation,
+fuzzy matching, the sorter) are checked not to be imported at startup - neither by the import of the module
+nor before the first prompt. The banner is rendered by pyfiglet only on the first start (then it is cached
+in the home directory), so the runs use a temporary home directory in which the warm-up run caches it.
+Results are saved to a JSON file, which can be compared with the results of another run.
+The run fails (exit status 1) if the median time-to-prompt is over the budget (DEFAULT_BUDGET_MS unless
+--budget-ms is given, 0 - no budget), if it is slower than the baseline by more than the allowed regression,
+or if a deferred module is imported at startup.
+
+Usage (from the repository root):
+    python benchmarks/bench_startup.py --budget-ms 250 --output after.json --compare before.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+import platform
+import tempfile
+import subprocess
+
+PACKAGE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "pyassit_poetry"
+)
+
+# maximum median time-to-prompt in ms - a few times the time-to-prompt of a development machine
+# (about 250 ms, most of it the start of the interpreter and the import of prompt_toolkit for the prompt)
+DEFAULT_BUDGET_MS = 500
+
+# modules which are imported on first use, not at startup
+DEFERRED_MODULES = [
+    "pyfiglet",
+    "cowsay",
+    "difflib",
+    "prompt_toolkit",
+    "validator_collection",
+    "utility.sorter",
+    "utility.notes_grep",
+]
+
+
+def _run_startup() -> dict:
+    # runs in the child process: everything which is done before the first prompt
+    sys.path.insert(0, PACKAGE_DIR)
+    start = time.perf_counter()
+    import cli_pyassist
+
+    imported = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        cli_pyassist.startup()
+    loaded = time.perf_counter()
+    # prompt_toolkit is imported below for the prompt itself
+    deferred_imported = [name for name in DEFERRED_MODULES if name in sys.modules]
+    from prompt_toolkit import prompt
+    from prompt_toolkit.completion import FuzzyWordCompleter
+
+    FuzzyWordCompleter(cli_pyassist.CliPyassist.COMMANDS.keys())
+    ready = time.perf_counter()
+    return {
+        "phases": {
+            "import": imported - start,
+            "startup": loaded - imported,
+            "prompt": ready - loaded,
+        },
+        "deferred_imported": deferred_imported,
+    }
+
+
+def measure_time_to_prompt(home: str) -> dict:
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child"],
+        cwd=PACKAGE_DIR,
+        env={**os.environ, "HOME": home},
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    wall = time.perf_counter() - start
+    result = json.loads(output.strip().splitlines()[-1])
+    result["time_to_prompt"] = wall
+    return result
+
+
+def profile_imports(top: int) -> dict:
+    """
+    The function profiles the imports of cli_pyassist with python -X importtime.
+
+    :param top: number of the slowest modules listed
+    :type top: int
+    :return: total import time of cli_pyassist, the slowest modules and the deferred modules imported at startup
+    :rtype: dict
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import cli_pyassist"],
+        cwd=PACKAGE_DIR,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+    # import time: self [us] | cumulative | imported package
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        try:
+            self_time, cumulative = int(fields[0]), int(fields[1])
+        except ValueError:
+            # the header line
+            continue
+        modules.append((fields[2].strip(), self_time / 1e6, cumulative / 1e6))
+    names = {name for name, _, _ in modules}
+    return {
+        "import": next(
+            cumulative for name, _, cumulative in modules if name == "cli_pyassist"
+        ),
+        "modules": len(modules),
+        "top_cumulative": {
+            name: cumulative
+            for name, _, cumulative in sorted(modules, key=lambda item: -item[2])[:top]
+        },
+        "top_self": {
+            name: self_time
+            for name, self_time, _ in sorted(modules, key=lambda item: -item[1])[:top]
+        },
+        "deferred_imported": [name for name in DEFERRED_MODULES if name in names],
+    }
+
+
+def summarize(runs: list) -> dict:
+    # median of every measurement of the runs
+    def median(values):
+        values = sorted(values)
+        return values[len(values) // 2]
+
+    return {
+        "time_to_prompt": median([run["time_to_prompt"] for run in runs]),
+        "phases": {
+            phase: median([run["phases"][phase] for run in runs])
+            for phase in runs[0]["phases"]
+        },
+    }
+
+
+def compare(result: dict, baseline: dict):
+    # prints the change of every summary measurement against the baseline
+    def rows(current, previous, prefix=""):
+        for key, value in current.items():
+            if isinstance(value, dict):
+                yield from rows(value, previous.get(key, {}), f"{prefix}{key}.")
+            elif key in previous and previous[key]:
+                yield f"{prefix}{key}", previous[key], value
+
+    print(f"{'metric':<24}{'baseline':>14}{'current':>14}{'change':>10}")
+    for name, previous, value in rows(result["summary"], baseline["summary"]):
+        print(
+            f"{name:<24}{previous:>14.4g}{value:>14.4g}{(value / previous - 1):>+10.1%}"
+        )
+
+
+def check_budget(result: dict, budget_ms, baseline, max_regression: float) -> list:
+    """
+    The function checks the results against the budget and the baseline.
+
+    :return: descriptions of the exceeded limits (empty if the startup is within them)
+    :rtype: list
+    """
+    failures = []
+    time_to_prompt = result["summary"]["time_to_prompt"]
+    if budget_ms and time_to_prompt * 1000 > budget_ms:
+        failures.append(
+            f"time-to-prompt {time_to_prompt * 1000:.1f} ms is over the budget of {budget_ms} ms"
+        )
+    if baseline is not None:
+        previous = baseline["summary"]["time_to_prompt"]
+        if time_to_prompt > previous * (1 + max_regression):
+            failures.append(
+                f"time-to-prompt {time_to_prompt * 1000:.1f} ms is more than {max_regression:.0%} "
+                f"slower than the baseline ({previous * 1000:.1f} ms)"
+            )
+    deferred_imported = dict.fromkeys(result["imports"]["deferred_imported"])
+    for run in result["runs"]:
+        deferred_imported.update(dict.fromkeys(run["deferred_imported"]))
+    if deferred_imported:
+        failures.append("imported at startup: " + ", ".join(deferred_imported))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI startup benchmark")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument(
+        "--top", type=int, default=10, help="number of the slowest imports listed"
+    )
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=DEFAULT_BUDGET_MS,
+        help="maximum median time-to-prompt in ms (0 - no budget)",
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.2,
+        help="maximum slowdown against the --compare baseline (0.2 - 20%%)",
+    )
+    parser.add_argument("--output", default="bench_startup.json")
+    parser.add_argument("--compare", help="JSON file with baseline results")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    if arguments.child:
+        print(json.dumps(_run_startup()))
+        return
+
+    with tempfile.TemporaryDirectory() as home:
+        # the first run warms up the file system cache, the bytecode cache and the banner cache
+        measure_time_to_prompt(home)
+        runs = []
+        for i in range(arguments.repeat):
+            runs.append(measure_time_to_prompt(home))
+            print(
+                f"run {i + 1}/{arguments.repeat}: time-to-prompt {runs[-1]['time_to_prompt'] * 1000:.1f} ms"
+            )
+    imports = profile_imports(arguments.top)
+    print(f"import of cli_pyassist: {imports['import'] * 1000:.1f} ms")
+    for name, cumulative in imports["top_cumulative"].items():
+        print(f"    {cumulative * 1000:8.2f} ms  {name}")
+    result = {
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "runs": runs,
+        "imports": imports,
+        "summary": summarize(runs),
+    }
+    with open(arguments.output, "w") as fh:
+        json.dump(result, fh, indent=2)
+    print(f"Results saved to {arguments.output}")
+    baseline = None
+    if arguments.compare:
+        with open(arguments.compare) as fh:
+            baseline = json.load(fh)
+        compare(result, baseline)
+    failures = check_budget(
+        result, arguments.budget_ms, baseline, arguments.max_regression
+    )
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,58 @@
-import difflib
-import pyfiglet
-import cowsay
+import argparse
+import shlex
 import sys
-from prompt_toolkit import prompt
-from prompt_toolkit.completion import FuzzyWordCompleter
+import textwrap
+from functools import lru_cache
 from pathlib import Path
 
 from utility.addressbook import AddressBook
 from utility.notes import Notes
 from utility.cli_addressbook_interaction import CliAddressBookInteraction
-from utility.sorter import FileSorter
 from utility.cli_notes_interaction import CliNotesInteraction
 from utility.exit_interrupt import ExitInterrupt
+from utility.lazy import banner, close_matches
+from utility.user_input import ask
 from abstract_pyassist import AbstractPyassist
 
 
+class _SortArgumentParser(argparse.ArgumentParser):
+    # argparse exits the program on invalid arguments, in the menu they are reported as a regular error
+    def error(self, message):
+        raise ValueError(message)
+
+
+# The modules below take most of the startup time and are imported on first use:
+# pyfiglet (banner, cached after the first start), cowsay (exit), prompt_toolkit (prompts)
+# and difflib (command suggestions) - see utility/lazy.py,
+# the sorter modules (sort) and validator_collection (email validation, see utility/email.py).
+# benchmarks/bench_startup.py checks that they stay out of the startup imports.
+@lru_cache(maxsize=None)
+def _sort_arguments() -> _SortArgumentParser:
+    # the parser needs FileSorter (dedupe modes), so it is built on the first sort
+    from utility.sorter import FileSorter
+
+    arguments = _SortArgumentParser(prog="sort", add_help=False)
+    arguments.add_argument("paths", nargs="*")
+    arguments.add_argument("--workers", type=int, default=1)
+    arguments.add_argument("--dry-run", action="store_true")
+    arguments.add_argument("--dedupe", choices=FileSorter.DEDUPE_MODES)
+    arguments.add_argument("--text-report", action="store_true")
+    arguments.add_argument("--full", action="store_true")
+    arguments.add_argument("--watch", action="store_true")
+    arguments.add_argument("--polling", action="store_true")
+    arguments.add_argument("--sniff", action="store_true")
+    arguments.add_argument("--resume", action="store_true")
+    arguments.add_argument("--undo", metavar="RUN_ID")
+    arguments.add_argument("--metrics", metavar="FILE")
+    arguments.add_argument("--archive-workers", type=int)
+    arguments.add_argument("--max-archive-size", type=int, default=8192)
+    arguments.add_argument("--max-archive-members", type=int, default=100_000)
+    arguments.add_argument("--max-archive-ratio", type=float, default=200)
+    arguments.add_argument("--per-device", type=int, default=1)
+    arguments.add_argument("--exclude", action="append", default=[])
+    return arguments
+
+
 class CliPyassist(AbstractPyassist):
     # function to handle with errors
     def _error_handler(func):
@@ -37,45 +75,123 @@ class CliPyassist(AbstractPyassist):
         self.cli_addressbook_interaction = cli_addressbook_interaction
         self.cli_notes_interaction = cli_notes_interaction
 
-    def addressbook_interaction(self, *args):
-        return self.cli_addressbook_interaction.cli_addressbook_menu()
+    @staticmethod
+    def parse_sort_arguments(argument: str) -> argparse.Namespace:
+        """
+        Parses the arguments of the sort command.
+
+        :raise ValueError: if the arguments are invalid
+        """
+        return _sort_arguments().parse_args(shlex.split(argument or ""))
 
-    def notes_interaction(self, *args):
-        return self.cli_notes_interaction.cli_notes_menu()
+    # progress - whether the progress line is shown (not in the background jobs of the REPL)
+    @_error_handler
+    def sort_init(self, argument="", progress=True):
+        arguments = self.parse_sort_arguments(argument)
+        from utility.sorter import FileSorter
+        from utility.sort_metrics import SortMetrics, ProgressLine
+        from utility.archive_extractor import ArchiveExtractor
+        from utility.sort_scheduler import SortScheduler
 
-    def sort_init(self, folder_path=None):
-        if not folder_path:
-            folder_path = input(
-                "Type the path to the folder whose contents you want to sort: "
-            ).strip()
-        sorter = FileSorter()
-        return sorter.sort(folder_path)
+        if arguments.resume:
+            return FileSorter(workers=max(arguments.workers, 1)).resume()
+        if arguments.undo:
+            return FileSorter().undo(arguments.undo)
+        folder_paths = arguments.paths
+        if not folder_paths:
+            folder_paths = [
+                ask(
+                    "Type the path to the folder whose contents you want to sort: "
+                ).strip()
+            ]
+        if len(folder_paths) > 1 and (arguments.watch or arguments.dry_run):
+            raise ValueError("--watch and --dry-run take one folder")
+        if arguments.workers < 1:
+            raise ValueError("number of workers must be at least 1")
+        if arguments.archive_workers is not None and arguments.archive_workers < 1:
+            raise ValueError("number of archive workers must be at least 1")
+        # the progress line is shown only in a terminal (in watch mode every batch is printed instead)
+        progress = (
+            ProgressLine()
+            if progress and sys.stderr.isatty() and not arguments.watch
+            else None
+        )
+        # the metrics are shared by the sorters of all the folders
+        metrics = SortMetrics(progress)
 
-    # exit / close program
-    def cli_pyassist_exit(self, argument):
+        def new_sorter():
+            return FileSorter(
+                workers=arguments.workers,
+                dedupe=arguments.dedupe,
+                incremental=not arguments.full,
+                sniff=arguments.sniff,
+                metrics=metrics,
+                extractor=ArchiveExtractor(
+                    workers=arguments.archive_workers,
+                    max_size=arguments.max_archive_size << 20,
+                    max_members=arguments.max_archive_members,
+                    max_ratio=arguments.max_archive_ratio,
+                ),
+                exclude=arguments.exclude,
+            )
+
+        try:
+            if len(folder_paths) > 1:
+                return SortScheduler(new_sorter, arguments.per_device).run(
+                    folder_paths, text_report=arguments.text_report
+                )
+            if arguments.watch:
+                return new_sorter().watch(
+                    folder_paths[0], polling=arguments.polling, on_batch=print
+                )
+            return new_sorter().sort(
+                folder_paths[0],
+                dry_run=arguments.dry_run,
+                text_report=arguments.text_report,
+            )
+        finally:
+            if progress is not None:
+                progress.close()
+            if arguments.metrics:
+                metrics.dump(arguments.metrics)
+
+    @staticmethod
+    def data_files() -> (Path, Path):
         # for the time being, the path to the addressbook and notes files are hardcoded
         program_dir = Path(__file__).parent
-        addressbook_filename = program_dir.joinpath("data/addressbook.dat")
-        notes_filename = program_dir.joinpath("data/notes.dat")
+        return program_dir.joinpath("data/addressbook.dat"), program_dir.joinpath(
+            "data/notes.dat"
+        )
+
+    # exit / close program
+    def cli_pyassist_exit(self, argument):
+        addressbook_filename, notes_filename = self.data_files()
         self.cli_addressbook_interaction.save_addressbook(addressbook_filename)
         self.cli_notes_interaction.save_notes(notes_filename)
+        import cowsay
+
         cowsay.cow("Your data has been saved.\nGood bye!")
         sys.exit()
 
     # show help
     def help(self, argument):
-        width = 60
+        width = 75
         help_table = f'╔{"═" * width}╗\n'
-        help_table += "║ {:>12} - {:<43} ║\n".format("command", "description")
+        help_table += "║ {:>27} - {:<43} ║\n".format("command", "description")
         help_table += f'╠{"═" * width}╣\n'
         for command, description in self.COMMANDS_HELP.items():
-            help_table += "║ {:>12} - {:<43} ║\n".format(command, description)
+            # long descriptions are wrapped, so the box keeps its width
+            lines = textwrap.wrap(description, 43)
+            help_table += "║ {:>27} - {:<43} ║\n".format(command, lines[0])
+            for line in lines[1:]:
+                help_table += "║ {:>27}   {:<43} ║\n".format("", line)
         help_table += f'╚{"═" * width}╝'
         return help_table
 
+    # menus opened from the main menu (see AsyncRepl)
+    MENUS = ("addressbook", "notes")
+
     COMMANDS = {
-        "addressbook": addressbook_interaction,
-        "notes": notes_interaction,
         "sort": sort_init,
         "exit": cli_pyassist_exit,
         "help": help,
@@ -85,6 +201,28 @@ class CliPyassist(AbstractPyassist):
         "addressbook": "open addressbook",
         "notes": "open notes",
         "sort <folder path>": "sort files <in given folder>",
+        "sort <path> <path> ...": "sort several folders at the same time",
+        "  --per-device <n>": "sort at most <n> folders of one disk at a time",
+        "  --exclude <pattern>": "leave matching files and folders alone",
+        "  .sortignore": "file with patterns to exclude in the sorted folder",
+        "  --workers <n>": "sort with <n> threads",
+        "  --dry-run": "only show planned operations",
+        "  --dedupe <mode>": "hardlink, move or skip duplicated files",
+        "  --text-report": "also save a human-readable report",
+        "  --full": "sort also directories which have not changed since the last sort",
+        "  --watch": "keep sorting new files until Ctrl+C",
+        "  --polling": "watch by polling instead of inotify",
+        "  --sniff": "recognize files with unknown extensions by their content",
+        "  --metrics <file>": "save metrics of the sort to a JSON file",
+        "  --archive-workers <n>": "extract archives with <n> processes",
+        "  --max-archive-size <MB>": "skip archives bigger after extraction",
+        "  --max-archive-members <n>": "skip archives with more members",
+        "  --max-archive-ratio <r>": "skip archives compressed more than <r>:1",
+        "sort --resume": "finish the last interrupted sort",
+        "sort --undo <run id>": "roll back the sort with given run id (see report)",
+        "jobs": "show background jobs and their state",
+        "wait <job>": "wait for background job <job> (or all of them)",
+        "cancel <job>": "cancel background job <job>",
         "exit": "exit from the program",
         "help": "show this menu",
     }
@@ -102,18 +240,10 @@ class CliPyassist(AbstractPyassist):
             str: command
             str: argument
         """
-        tokens = user_input.split()
+        tokens = user_input.split(maxsplit=1)
         command = tokens[0].lower()
-        argument = "".join(tokens[1:])
-        return command, tuple(argument)
-
-    # receiving a command from a user
-    def _user_command_input(self):
-        commands_completer = FuzzyWordCompleter(self.COMMANDS.keys())
-        user_input = prompt(f"main menu >>> ", completer=commands_completer).strip()
-        if user_input:
-            return self._parse_command(user_input)
-        return "", ""
+        argument = tokens[1].strip() if len(tokens) > 1 else ""
+        return command, argument
 
     def _execute_commands(self, cmd: str, argument: str):
         """Function to execute user commands
@@ -126,31 +256,139 @@ class CliPyassist(AbstractPyassist):
             func: function with data_ti_use and arguments
         """
         if cmd not in self.COMMANDS:
-            matches = difflib.get_close_matches(cmd, self.COMMANDS)
+            matches = close_matches(cmd, [*self.MENUS, *self.COMMANDS])
             info = f"\nmaybe you meant: {' or '.join(matches)}" if matches else ""
             return f"Command {cmd} is not recognized" + info
         cmd = self.COMMANDS[cmd]
         return cmd(self, argument)
 
+    # the menus run on an asyncio event loop, so long commands can run as background jobs (see AsyncRepl)
     @_error_handler
     def main_menu(self):
-        while True:
-            cmd, argument = self._user_command_input()
-            print(self._execute_commands(cmd, argument))
+        from utility.async_repl import AsyncRepl
 
+        AsyncRepl(self).run()
 
-def main():
-    print(pyfiglet.figlet_format("PyAssist", font="slant"))
+
+def load() -> CliPyassist:
+    """
+    Creates the assistant with the addressbook and the notes loaded from the data files.
+
+    Returns:
+        CliPyassist: the assistant
+    """
     cli_pyassist = CliPyassist(
         CliAddressBookInteraction(AddressBook()), CliNotesInteraction(Notes())
     )
-    # for the time being, the path to the addressbook and notes files are hardcoded
-    program_dir = Path(__file__).parent
-    addressbook_filename = program_dir.joinpath("data/addressbook.dat")
-    notes_filename = program_dir.joinpath("data/notes.dat")
+    addressbook_filename, notes_filename = cli_pyassist.data_files()
     cli_pyassist.cli_addressbook_interaction.load_addressbook(addressbook_filename)
     cli_pyassist.cli_notes_interaction.load_notes(notes_filename)
-    cli_pyassist.main_menu()
+    return cli_pyassist
+
+
+def startup() -> CliPyassist:
+    """
+    Everything done before the first prompt: the banner is shown, the addressbook and the notes are loaded.
+
+    Returns:
+        CliPyassist: the assistant ready for the main menu
+    """
+    print(banner("PyAssist"))
+    return load()
+
+
+def run_script(argv: list) -> int:
+    """
+    Batch mode (cli_pyassist.py run [script] [--quiet] [--stop-on-error]): runs the commands of a script file
+    or of stdin without prompts (see BatchRunner) and saves the changes after the last one.
+
+    Args:
+        argv (list): arguments after "run"
+
+    Returns:
+        int: exit status - 0 if all the commands succeeded, 1 if any failed, 2 if the script cannot be read
+    """
+    from utility.batch_runner import BatchRunner
+
+    parser = argparse.ArgumentParser(
+        prog="cli_pyassist.py run",
+        description="run PyAssist commands from a script, one command per line "
+        '(e.g. notes add shopping content="milk, bread"), "help" lists the commands',
+    )
+    parser.add_argument(
+        "script", nargs="?", default="-", help="file with commands (default: stdin)"
+    )
+    parser.add_argument(
+        "--quiet", action="store_true", help="print only failed commands"
+    )
+    parser.add_argument("--stop-on-error", action="store_true")
+    arguments = parser.parse_args(argv)
+    runner = BatchRunner(load(), arguments.quiet, arguments.stop_on_error)
+    if arguments.script == "-":
+        return runner.run(sys.stdin)
+    try:
+        with open(arguments.script, encoding="utf-8") as fh:
+            return runner.run(fh)
+    except OSError as e:
+        print(f"Error: unable to read the script: {e}", file=sys.stderr)
+        return 2
+
+
+def serve(argv: list) -> int:
+    """
+    Server mode (cli_pyassist.py serve [--host HOST] [--port PORT] ...): serves the addressbook and the notes
+    as a local HTTP/JSON API (see ApiServer) until Ctrl+C, the changes are saved.
+
+    Args:
+        argv (list): arguments after "serve"
+
+    Returns:
+        int: exit status - 0, or 2 if the server cannot listen on the address
+    """
+    from utility.api_server import ApiServer
+
+    parser = argparse.ArgumentParser(
+        prog="cli_pyassist.py serve",
+        description="serve the addressbook and the notes as a local HTTP/JSON API",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument(
+        "--port", type=int, default=8080, help="port (0 - any free port)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="threads for searches, encoding and saving",
+    )
+    parser.add_argument(
+        "--stream-threshold",
+        type=int,
+        default=1000,
+        help="longer lists are streamed as chunked JSON lines",
+    )
+    parser.add_argument(
+        "--keep-alive", type=float, default=15, help="idle connection timeout in s"
+    )
+    arguments = parser.parse_args(argv)
+    if arguments.workers < 1:
+        parser.error("number of workers must be at least 1")
+    return ApiServer(
+        load(),
+        arguments.host,
+        arguments.port,
+        arguments.workers,
+        arguments.stream_threshold,
+        arguments.keep_alive,
+    ).run()
+
+
+def main():
+    if sys.argv[1:2] == ["run"]:
+        sys.exit(run_script(sys.argv[2:]))
+    if sys.argv[1:2] == ["serve"]:
+        sys.exit(serve(sys.argv[2:]))
+    startup().main_menu()
 
 
 if __name__ == "__main__":
@@ -15,6 +15,7 @@ from utility.city import City
 from utility.zip_code import ZipCode
 from utility.country import Country
 from utility.invalid_csv_file_structure import InvalidCSVFileStructure
+from utility.job_cancelled import JobCancelled
 
 
 class AddressBook(UserDict):
@@ -41,10 +42,11 @@ class AddressBook(UserDict):
         self.data[record.name.value] = record
 
     # search in addressbook, return addressbook object that containing records with the query
-    def search(self, query: str):
+    def search(self, query: str, limit=None):
         """
         The method first looks for an exact match in the keys
         then searches the values of the individual records and adds them to the returned Addresbook object if the fragment matches the query.
+        With a limit the search stops when that many records are found.
 
         Returns:
             Addresbook: a new object of class Addresbook with records based on the query
@@ -55,23 +57,26 @@ class AddressBook(UserDict):
         if key_query in self.keys():
             query_addresbook[key_query] = self[key_query]
         query = query.lower()
-        for record in self.values():
+        for record in self.data.values():
+            if limit is not None and len(query_addresbook) >= limit:
+                break
             if query in record.name.value.lower() or key_query in record.name.value:
                 query_addresbook[record.name.value] = record
             for phone in record.phones:
                 if query in phone.value:
                     query_addresbook[record.name.value] = record
             for email in record.emails:
-                if query in email.value:
+                if email.value and query in email.value:
                     query_addresbook[record.name.value] = record
             if record.birthday is not None:
                 if query in str(record.birthday.value):
                     query_addresbook[record.name.value] = record
+            # the address fields are Field objects (their values can be None)
             if record.address and (
-                query in record.address.street.lower()
-                or query in record.address.city.lower()
-                or query in record.address.zip_code.lower()
-                or query in record.address.country.lower()
+                query in (record.address.street.value or "").lower()
+                or query in (record.address.city.value or "").lower()
+                or query in (record.address.zip_code.value or "").lower()
+                or query in (record.address.country.value or "").lower()
             ):
                 query_addresbook[record.name.value] = record
         return query_addresbook
@@ -138,9 +143,10 @@ class AddressBook(UserDict):
     
     Phones and emails are separated (if there is more than one phone or email) with "|".
     Birthday should be written as: day month year e.g. 21 12 1999 or 30-01-2012 or 09/01/1987
+    The import is stopped (JobCancelled) when the cancel event is set - it is checked before every row.
     """
 
-    def import_from_csv(self, filename):
+    def import_from_csv(self, filename, cancel=None):
         with open(filename, "r", newline="") as fh:
             reader = csv.DictReader(fh)
             if [
@@ -155,6 +161,8 @@ class AddressBook(UserDict):
             ] != reader.fieldnames:
                 raise InvalidCSVFileStructure
             for row in reader:
+                if cancel is not None and cancel.is_set():
+                    raise JobCancelled
                 name = row["name"]
                 phones = row["phones"].split("|")
                 phones_to_add = []
@@ -0,0 +1,790 @@
+import sys
+import copy
+import json
+import time
+import signal
+import asyncio
+from datetime import date, timedelta
+from itertools import islice
+from bisect import bisect_left, bisect_right
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs, unquote
+from concurrent.futures import ThreadPoolExecutor
+
+from utility.name import Name
+from utility.phone import Phone
+from utility.email import Email
+from utility.birthday import Birthday, FutureDateError
+from utility.address import Address
+from utility.street import Street
+from utility.city import City
+from utility.zip_code import ZipCode
+from utility.country import Country
+from utility.record import Record
+from utility.note import Note
+from utility.title import Title
+from utility.content import Content
+
+
+class ApiError(Exception):
+    """
+    Exception raised when a request of the API cannot be handled, it is sent as a JSON error response.
+
+    Args:
+        status (int): HTTP status of the response
+        message (str): description of the error
+    """
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class ApiServer:
+    """
+    Class for the local HTTP/JSON API of PyAssist (cli_pyassist.py serve), built on asyncio streams only.
+
+    Resources (names and titles in the path are URL-encoded, bodies are JSON objects):
+        GET /health                                      - state of the server
+        GET /contacts[?q=<query>][&limit=<n>]            - all the contacts or the ones matching the query
+        GET|PATCH|DELETE /contacts/<name>                - one contact
+        POST /contacts                                   - new contact
+        GET /birthdays[?days=<n>]                        - contacts with birthdays in the next n days (default 7)
+        GET /notes[?q=<query>][&limit=<n>]               - all the notes or the ones matching the query
+        GET|PATCH|DELETE /notes/<title>                  - one note
+        POST /notes                                      - new note
+    A contact is {"name", "phones": [], "emails": [], "birthday": "dd-mm-yyyy", "address": {"street", "city",
+    "zip_code", "country"}}, a note is {"title", "content", "tags": []}. PATCH changes only the given fields.
+    Errors are returned as {"error": "..."} with the HTTP status.
+
+    Lists are returned as {"count": n, "results": [...]}. A list longer than stream_threshold (or any list
+    when the client accepts application/x-ndjson) is streamed instead: chunked, one JSON object per line,
+    so neither side holds the whole encoded list in memory. Connections are kept alive (HTTP/1.1)
+    until the client closes them or they are idle for keep_alive seconds.
+
+    The addressbook and the notes are changed only in the event loop thread. Searches, the birthdays
+    and the encoding of long lists run in a thread pool, on a snapshot of the data - a shallow copy taken
+    after the last change (reused until the next one). Changes replace whole records / notes
+    instead of changing them, so a snapshot is never changed while a thread reads it.
+    Changed data is saved in the thread pool save_delay seconds after the change
+    (a burst of changes is saved once) and when the server stops.
+
+    Args:
+        cli_pyassist (CliPyassist): assistant with the loaded addressbook and notes
+        host (str): address the server listens on
+        port (int): port the server listens on (0 - any free port)
+        workers (int): number of threads for searches, encoding and saving
+        stream_threshold (int): number of results above which a list is streamed as JSON lines
+        keep_alive (float): seconds an idle connection is kept open
+        save_delay (float): seconds between a change and the save of the data
+    """
+
+    MAX_HEADER_SIZE = 64 * 1024
+    MAX_BODY_SIZE = 1024 * 1024
+    # number of results encoded by the thread pool at a time (one chunk of a streamed list)
+    CHUNK_SIZE = 1000
+    JSON = "application/json"
+    JSON_LINES = "application/x-ndjson"
+
+    def __init__(
+        self,
+        cli_pyassist,
+        host="127.0.0.1",
+        port=8080,
+        workers=4,
+        stream_threshold=1000,
+        keep_alive=15.0,
+        save_delay=1.0,
+    ) -> None:
+        self.cli_pyassist = cli_pyassist
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.stream_threshold = stream_threshold
+        self.keep_alive = keep_alive
+        self.save_delay = save_delay
+        self._executor = None
+        # number of changes of the data, of the cached snapshots and of the saved data
+        self._versions = {"contacts": 0, "notes": 0}
+        self._snapshots = {}
+        # (version, index) of the birthdays of the contacts
+        self._birthdays = (None, None)
+        self._saved_versions = {"contacts": 0, "notes": 0}
+        self._saves = {}
+        self._save_locks = {}
+        # open connections: writer -> whether a request is being handled, and their handler tasks
+        self._connections = {}
+        self._handlers = set()
+        self._stopping = False
+        self.start_time = time.monotonic()
+        self.requests = 0
+        self.connections = 0
+
+    @property
+    def addressbook(self):
+        return self.cli_pyassist.cli_addressbook_interaction.addressbook
+
+    @property
+    def notes(self):
+        return self.cli_pyassist.cli_notes_interaction.notes
+
+    # conversions to JSON objects
+    @staticmethod
+    def record_to_dict(record: Record) -> dict:
+        address = record.address
+        return {
+            "name": record.name.value,
+            "phones": [phone.value for phone in record.phones],
+            "emails": [email.value for email in record.emails],
+            "birthday": (
+                record.birthday.value.strftime("%d-%m-%Y")
+                if record.birthday is not None
+                else None
+            ),
+            "address": (
+                {
+                    "street": address.street.value,
+                    "city": address.city.value,
+                    "zip_code": address.zip_code.value,
+                    "country": address.country.value,
+                }
+                if address
+                else None
+            ),
+        }
+
+    @staticmethod
+    def note_to_dict(note: Note) -> dict:
+        return {
+            "title": note.title.value,
+            "content": note.content.value,
+            "tags": sorted(note.tags),
+        }
+
+    @staticmethod
+    def _encode_lines(results: list) -> bytes:
+        return b"".join(
+            json.dumps(result, ensure_ascii=False).encode() + b"\n"
+            for result in results
+        )
+
+    # the data in the thread pool
+    async def _run(self, function, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self.workers, thread_name_prefix="pyassist-api"
+            )
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, function, *args
+        )
+
+    def _snapshot(self, store: str):
+        # a shallow copy of the data for the thread pool, taken again only after a change
+        version, snapshot = self._snapshots.get(store, (None, None))
+        if version != self._versions[store]:
+            data = self.addressbook if store == "contacts" else self.notes
+            snapshot = copy.copy(data)
+            self._snapshots[store] = (self._versions[store], snapshot)
+        return snapshot
+
+    def _changed(self, store: str):
+        self._versions[store] += 1
+        if store not in self._saves:
+            self._saves[store] = asyncio.ensure_future(self._save_later(store))
+
+    async def _save_later(self, store: str):
+        try:
+            await asyncio.sleep(self.save_delay)
+        finally:
+            # the changes made from now on are saved by the next save
+            del self._saves[store]
+        await self._save(store)
+
+    async def _save(self, store: str):
+        lock = self._save_locks.setdefault(store, asyncio.Lock())
+        async with lock:
+            version = self._versions[store]
+            if version == self._saved_versions[store]:
+                return
+            addressbook_filename, notes_filename = self.cli_pyassist.data_files()
+            snapshot = self._snapshot(store)
+            try:
+                if store == "contacts":
+                    await self._run(snapshot.save_addresbook, addressbook_filename)
+                else:
+                    await self._run(snapshot.save_notes, notes_filename)
+            except OSError as e:
+                print(f"Error: unable to save the {store}: {e}", file=sys.stderr)
+                return
+            self._saved_versions[store] = version
+
+    # validation of the request data
+    @staticmethod
+    def _body(body: bytes) -> dict:
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError as e:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"invalid JSON: {e}")
+        if not isinstance(data, dict):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "the body must be a JSON object")
+        return data
+
+    @staticmethod
+    def _value(data: dict, field: str, kind=str, default=None):
+        value = data.get(field, default)
+        if value is not None and not isinstance(value, kind):
+            raise ApiError(
+                HTTPStatus.BAD_REQUEST,
+                f"{field} must be {'a list of strings' if kind is list else 'a string'}",
+            )
+        if kind is list and value and not all(isinstance(item, str) for item in value):
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"{field} must be a list of strings")
+        return value
+
+    @staticmethod
+    def _field(field_class, value: str):
+        # fields validate their values with ValueError, which is reported with the value
+        try:
+            return field_class(value)
+        except FutureDateError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"{value} is a future date")
+        except ValueError:
+            raise ApiError(
+                HTTPStatus.BAD_REQUEST,
+                f"invalid {field_class.__name__.lower()}: {value!r}",
+            )
+
+    @staticmethod
+    def _limit(query: dict):
+        limit = query.get("limit")
+        if limit is None:
+            return None
+        if not limit.isdigit():
+            raise ApiError(HTTPStatus.BAD_REQUEST, "limit must be a number")
+        return int(limit)
+
+    def _record(self, name: str) -> Record:
+        record = self.addressbook.get(name.strip().title())
+        if record is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"contact {name} not found")
+        return record
+
+    def _note(self, title: str) -> Note:
+        note = self.notes.get(title.strip().lower())
+        if note is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"note {title} not found")
+        return note
+
+    def _address(self, data, address=None):
+        # the given address fields replace the ones of the address (if there is one)
+        if data is None:
+            return None
+        if not isinstance(data, dict):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "address must be a JSON object")
+        values = {
+            field: self._value(
+                data,
+                field,
+                default=getattr(address, field).value if address else "",
+            )
+            or ""
+            for field in ("street", "city", "zip_code", "country")
+        }
+        if not any(values.values()):
+            return None
+        return Address(
+            Street(values["street"]),
+            City(values["city"]),
+            ZipCode(values["zip_code"]),
+            Country(values["country"]),
+        )
+
+    def _set_record_fields(self, record: Record, data: dict):
+        # all the values are validated before the record is changed
+        fields = {}
+        if "phones" in data:
+            fields["phones"] = [
+                self._field(Phone, phone)
+                for phone in self._value(data, "phones", list) or []
+            ]
+        if "emails" in data:
+            fields["emails"] = [
+                self._field(Email, email)
+                for email in self._value(data, "emails", list) or []
+            ]
+        if "birthday" in data:
+            birthday = self._value(data, "birthday")
+            fields["birthday"] = self._field(Birthday, birthday) if birthday else None
+        if "address" in data:
+            fields["address"] = self._address(data["address"], record.address)
+        for field, value in fields.items():
+            setattr(record, field, value)
+
+    # handlers of the requests: (query, body, item) -> (status, JSON object or list of results)
+    async def health(self, query, body, item):
+        return HTTPStatus.OK, {
+            "status": "stopping" if self._stopping else "ok",
+            "contacts": len(self.addressbook),
+            "notes": len(self.notes),
+            "uptime": round(time.monotonic() - self.start_time, 3),
+            "requests": self.requests,
+        }
+
+    async def list_contacts(self, query, body, item):
+        search, limit = query.get("q", "").strip(), self._limit(query)
+        snapshot = self._snapshot("contacts")
+
+        def contacts():
+            records = snapshot.search(search, limit) if search else snapshot
+            return [
+                self.record_to_dict(record)
+                for record in islice(records.values(), limit)
+            ]
+
+        return HTTPStatus.OK, await self._run(contacts)
+
+    async def get_contact(self, query, body, item):
+        return HTTPStatus.OK, self.record_to_dict(self._record(item))
+
+    async def add_contact(self, query, body, item):
+        data = self._body(body)
+        name = (self._value(data, "name") or "").strip().title()
+        if not name:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "name is required")
+        if name in self.addressbook:
+            raise ApiError(HTTPStatus.CONFLICT, f"contact {name} already exists")
+        record = Record(self._field(Name, name), [], [], None, None)
+        self._set_record_fields(record, data)
+        self.addressbook.add_record(record)
+        self._changed("contacts")
+        return HTTPStatus.CREATED, self.record_to_dict(record)
+
+    async def edit_contact(self, query, body, item):
+        data = self._body(body)
+        old = self._record(item)
+        # a changed copy replaces the record, so the snapshots read by the thread pool stay unchanged
+        record = copy.deepcopy(old)
+        self._set_record_fields(record, data)
+        if "name" in data:
+            name = (self._value(data, "name") or "").strip().title()
+            if name != old.name.value and name in self.addressbook:
+                raise ApiError(HTTPStatus.CONFLICT, f"contact {name} already exists")
+            record.name = self._field(Name, name)
+        del self.addressbook[old.name.value]
+        self.addressbook.add_record(record)
+        self._changed("contacts")
+        return HTTPStatus.OK, self.record_to_dict(record)
+
+    async def delete_contact(self, query, body, item):
+        record = self.addressbook.pop(self._record(item).name.value)
+        self._changed("contacts")
+        return HTTPStatus.OK, {"deleted": record.name.value}
+
+    def _birthday_index(self, version: int, snapshot) -> tuple:
+        # records with birthdays sorted by the (month, day) of the birthday, built once for a snapshot
+        # (in the thread pool), so a query takes only the records in its range of days
+        index_version, index = self._birthdays
+        if index_version != version:
+            records = sorted(
+                (
+                    record
+                    for record in snapshot.values()
+                    if record.birthday is not None and record.birthday.value is not None
+                ),
+                key=lambda record: (
+                    record.birthday.value.month,
+                    record.birthday.value.day,
+                ),
+            )
+            keys = [
+                (record.birthday.value.month, record.birthday.value.day)
+                for record in records
+            ]
+            index = (keys, records)
+            self._birthdays = (version, index)
+        return index
+
+    async def upcoming_birthdays(self, query, body, item):
+        days = query.get("days", "7")
+        if not days.isdigit() or int(days) < 1:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "days must be a positive number")
+        days = int(days)
+        snapshot = self._snapshot("contacts")
+        version = self._versions["contacts"]
+
+        def birthdays():
+            keys, records = self._birthday_index(version, snapshot)
+            today = date.today()
+            end = today + timedelta(days=days)
+            if days >= 365:
+                ranges = [((1, 1), (12, 31))]
+            elif (today.month, today.day) <= (end.month, end.day):
+                ranges = [((today.month, today.day), (end.month, end.day))]
+            else:
+                ranges = [
+                    ((today.month, today.day), (12, 31)),
+                    ((1, 1), (end.month, end.day)),
+                ]
+            # birthdays on 29 February are celebrated on 1 March in the other years, they are checked below
+            ranges.append(((2, 29), (2, 29)))
+            candidates = {
+                i
+                for first, last in ranges
+                for i in range(bisect_left(keys, first), bisect_right(keys, last))
+            }
+            upcoming = []
+            for i in candidates:
+                record = records[i]
+                next_birthday = self._next_birthday(record.birthday.value, today)
+                if (next_birthday - today).days <= days:
+                    upcoming.append((next_birthday, record.name.value, record))
+            upcoming.sort(key=lambda item: item[:2])
+            return [
+                {
+                    **self.record_to_dict(record),
+                    "date": next_birthday.strftime("%d-%m-%Y"),
+                    "days": (next_birthday - today).days,
+                }
+                for next_birthday, _, record in upcoming
+            ]
+
+        return HTTPStatus.OK, await self._run(birthdays)
+
+    @staticmethod
+    def _next_birthday(birthday: date, today: date) -> date:
+        # birthdays on 29 February are celebrated on 1 March in the other years
+        for year in (today.year, today.year + 1):
+            try:
+                next_birthday = birthday.replace(year=year)
+            except ValueError:
+                next_birthday = date(year, 3, 1)
+            if next_birthday >= today:
+                return next_birthday
+        return today + timedelta(days=366)
+
+    async def list_notes(self, query, body, item):
+        search, limit = query.get("q", "").strip(), self._limit(query)
+        snapshot = self._snapshot("notes")
+
+        def notes():
+            found = snapshot.search(search, limit) if search else snapshot
+            return [self.note_to_dict(note) for note in islice(found.values(), limit)]
+
+        return HTTPStatus.OK, await self._run(notes)
+
+    async def get_note(self, query, body, item):
+        return HTTPStatus.OK, self.note_to_dict(self._note(item))
+
+    def _tags(self, data: dict) -> set:
+        return {
+            tag
+            for tags in self._value(data, "tags", list) or []
+            for tag in tags.split()
+        }
+
+    async def add_note(self, query, body, item):
+        data = self._body(body)
+        title = (self._value(data, "title") or "").strip().lower()
+        if not title:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "title is required")
+        if title in self.notes:
+            raise ApiError(HTTPStatus.CONFLICT, f"note {title} already exists")
+        note = Note(
+            Title(title),
+            Content(self._value(data, "content", default="")),
+            self._tags(data),
+        )
+        self.notes.add_note(note)
+        self._changed("notes")
+        return HTTPStatus.CREATED, self.note_to_dict(note)
+
+    async def edit_note(self, query, body, item):
+        data = self._body(body)
+        old = self._note(item)
+        note = copy.deepcopy(old)
+        if "content" in data:
+            note.content = Content(self._value(data, "content") or "")
+        if "tags" in data:
+            # the given tags replace the previous ones
+            tags = self._tags(data)
+            for tag in list(note.tags):
+                note.delete_tag(tag)
+            for tag in tags:
+                note.add_tag(tag)
+        if "title" in data:
+            title = (self._value(data, "title") or "").strip().lower()
+            if not title:
+                raise ApiError(HTTPStatus.BAD_REQUEST, "the title cannot be empty")
+            if title != old.title.value.lower() and title in self.notes:
+                raise ApiError(HTTPStatus.CONFLICT, f"note {title} already exists")
+            note.title = Title(title)
+        del self.notes[old.title.value.lower()]
+        self.notes.add_note(note)
+        self._changed("notes")
+        return HTTPStatus.OK, self.note_to_dict(note)
+
+    async def delete_note(self, query, body, item):
+        note = self.notes.pop(self._note(item).title.value.lower())
+        self._changed("notes")
+        return HTTPStatus.OK, {"deleted": note.title.value}
+
+    # dict of the routes: (method, resource, with item) -> handler
+    ROUTES = {
+        ("GET", "health", False): health,
+        ("GET", "contacts", False): list_contacts,
+        ("POST", "contacts", False): add_contact,
+        ("GET", "contacts", True): get_contact,
+        ("PATCH", "contacts", True): edit_contact,
+        ("DELETE", "contacts", True): delete_contact,
+        ("GET", "birthdays", False): upcoming_birthdays,
+        ("GET", "notes", False): list_notes,
+        ("POST", "notes", False): add_note,
+        ("GET", "notes", True): get_note,
+        ("PATCH", "notes", True): edit_note,
+        ("DELETE", "notes", True): delete_note,
+    }
+
+    async def _dispatch(self, method: str, target: str, body: bytes):
+        url = urlsplit(target)
+        segments = [unquote(segment) for segment in url.path.strip("/").split("/")]
+        if len(segments) > 2:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"{url.path} not found")
+        resource = segments[0]
+        item = segments[1] if len(segments) == 2 else None
+        handler = self.ROUTES.get((method, resource, item is not None))
+        if handler is None:
+            methods = [
+                route_method
+                for route_method, route_resource, with_item in self.ROUTES
+                if route_resource == resource and with_item == (item is not None)
+            ]
+            if methods:
+                raise ApiError(
+                    HTTPStatus.METHOD_NOT_ALLOWED,
+                    f"{method} is not allowed for {url.path} (allowed: {', '.join(methods)})",
+                )
+            raise ApiError(HTTPStatus.NOT_FOUND, f"{url.path} not found")
+        query = {field: values[-1] for field, values in parse_qs(url.query).items()}
+        return await handler(self, query, body, item)
+
+    # HTTP
+    def _head(self, status: int, headers: dict, keep_alive: bool) -> bytes:
+        status = HTTPStatus(status)
+        head = f"HTTP/1.1 {status.value} {status.phrase}\r\nServer: PyAssist\r\n"
+        for name, value in headers.items():
+            head += f"{name}: {value}\r\n"
+        if keep_alive:
+            head += f"Connection: keep-alive\r\nKeep-Alive: timeout={int(self.keep_alive)}\r\n"
+        else:
+            head += "Connection: close\r\n"
+        return (head + "\r\n").encode("latin-1")
+
+    def _send(self, writer, status: int, payload, keep_alive: bool):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        writer.write(
+            self._head(
+                status,
+                {"Content-Type": self.JSON, "Content-Length": len(body)},
+                keep_alive,
+            )
+            + body
+        )
+
+    async def _send_results(self, writer, results: list, accept: str, keep_alive):
+        if len(results) <= self.stream_threshold and self.JSON_LINES not in accept:
+            self._send(
+                writer,
+                HTTPStatus.OK,
+                {"count": len(results), "results": results},
+                keep_alive,
+            )
+            return
+        # chunked JSON lines, encoded by the thread pool chunk by chunk
+        writer.write(
+            self._head(
+                HTTPStatus.OK,
+                {
+                    "Content-Type": self.JSON_LINES,
+                    "Transfer-Encoding": "chunked",
+                    "X-Result-Count": len(results),
+                },
+                keep_alive,
+            )
+        )
+        for start in range(0, len(results), self.CHUNK_SIZE):
+            chunk = await self._run(
+                self._encode_lines, results[start : start + self.CHUNK_SIZE]
+            )
+            writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            # a slow client slows down the encoding instead of filling the memory
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+
+    async def _read_request(self, reader, writer):
+        """
+        The method reads a request from the connection.
+
+        :raise ApiError: if the request is invalid
+        :return: method, target, headers (lowercase names) and body or None if the connection is closed / idle
+        :rtype: tuple
+        """
+        try:
+            head = await asyncio.wait_for(
+                reader.readuntil(b"\r\n\r\n"), self.keep_alive
+            )
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            return None
+        except asyncio.LimitOverrunError:
+            raise ApiError(
+                HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "the headers are too large"
+            )
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "invalid request line")
+        if not version.startswith("HTTP/1."):
+            raise ApiError(
+                HTTPStatus.HTTP_VERSION_NOT_SUPPORTED, f"{version} is not supported"
+            )
+        headers = {"version": version}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise ApiError(
+                HTTPStatus.LENGTH_REQUIRED, "chunked bodies are not supported"
+            )
+        length = headers.get("content-length", "0")
+        if not length.isdigit():
+            raise ApiError(HTTPStatus.BAD_REQUEST, "invalid Content-Length")
+        if int(length) > self.MAX_BODY_SIZE:
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "the body is too large")
+        if headers.get("expect", "").lower() == "100-continue":
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        try:
+            body = await reader.readexactly(int(length))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return None
+        return method.upper(), target, headers, body
+
+    async def _handle_connection(self, reader, writer):
+        self.connections += 1
+        self._connections[writer] = False
+        self._handlers.add(asyncio.current_task())
+        try:
+            while not self._stopping:
+                try:
+                    request = await self._read_request(reader, writer)
+                except ApiError as e:
+                    # the rest of an invalid request cannot be skipped, so the connection is closed
+                    self._send(writer, e.status, {"error": e.message}, False)
+                    await writer.drain()
+                    return
+                if request is None:
+                    return
+                method, target, headers, body = request
+                self._connections[writer] = True
+                self.requests += 1
+                connection = headers.get("connection", "").lower()
+                keep_alive = (
+                    connection == "keep-alive"
+                    if headers["version"] == "HTTP/1.0"
+                    else connection != "close"
+                )
+                try:
+                    status, payload = await self._dispatch(method, target, body)
+                except ApiError as e:
+                    status, payload = e.status, {"error": e.message}
+                except Exception as e:
+                    print(f"Error: {method} {target}: {e!r}", file=sys.stderr)
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {
+                        "error": f"{type(e).__name__}: {e}"
+                    }
+                keep_alive = keep_alive and not self._stopping
+                if isinstance(payload, list):
+                    await self._send_results(
+                        writer, payload, headers.get("accept", ""), keep_alive
+                    )
+                else:
+                    self._send(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    return
+                self._connections[writer] = False
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.pop(writer, None)
+            self._handlers.discard(asyncio.current_task())
+            writer.close()
+
+    async def serve(self, stop=None):
+        """
+        The method serves the API until stop is set (or SIGINT / SIGTERM is received), then closes
+        the connections and saves the changed data.
+
+        :param stop: event stopping the server (a new one if None)
+        :type stop: asyncio.Event
+        """
+        loop = asyncio.get_running_loop()
+        stop = stop or asyncio.Event()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signal_number, stop.set)
+            except (NotImplementedError, RuntimeError):
+                # Windows (or not the main thread) - Ctrl+C raises KeyboardInterrupt instead
+                pass
+        server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=self.MAX_HEADER_SIZE
+        )
+        self.port = server.sockets[0].getsockname()[1]
+        print(
+            f"Serving PyAssist API on http://{self.host}:{self.port} "
+            f"({len(self.addressbook)} contacts, {len(self.notes)} notes), Ctrl+C to stop",
+            flush=True,
+        )
+        try:
+            await stop.wait()
+        finally:
+            self._stopping = True
+            server.close()
+            # idle keep-alive connections are closed, the requests in progress are finished
+            for writer, busy in list(self._connections.items()):
+                if not busy:
+                    writer.close()
+            if self._handlers:
+                await asyncio.wait(self._handlers, timeout=30)
+            await server.wait_closed()
+            # the saves waiting for save_delay are done now (the ones in progress are waited for by _save)
+            for task in list(self._saves.values()):
+                task.cancel()
+            for store in self._versions:
+                await self._save(store)
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+            print(
+                f"Server stopped: {self.requests} requests on {self.connections} connections."
+            )
+
+    def run(self) -> int:
+        """
+        The method runs the server until it is stopped with Ctrl+C.
+
+        :return: exit status - 0, or 2 if the server cannot listen on the address
+        :rtype: int
+        """
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+        except OSError as e:
+            print(
+                f"Error: unable to listen on {self.host}:{self.port}: {e}",
+                file=sys.stderr,
+            )
+            return 2
+        return 0
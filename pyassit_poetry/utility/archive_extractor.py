@@ -0,0 +1,260 @@
+import os
+import bz2
+import gzip
+import lzma
+import time
+import shutil
+import tarfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+# archive formats by (lowercase) name suffix, the longest suffixes are checked first
+ARCHIVE_FORMATS = (
+    (".tar.gz", "tar"),
+    (".tar.bz2", "tar"),
+    (".tar.xz", "tar"),
+    (".tgz", "tar"),
+    (".tbz2", "tar"),
+    (".txz", "tar"),
+    (".tar", "tar"),
+    (".zip", "zip"),
+    (".gz", "gz"),
+    (".bz2", "bz2"),
+    (".xz", "xz"),
+)
+# modules which open single compressed files
+COMPRESSED_FILES = {"gz": gzip, "bz2": bz2, "xz": lzma}
+CHUNK_SIZE = 1 << 20
+
+
+class ArchiveError(Exception):
+    # the archive breaks one of the limits or contains a member outside the destination directory
+    pass
+
+
+def archive_format(file_name: str):
+    """
+    The function returns the format of an archive by its name (in any case).
+
+    :param file_name: name of (or path to) the archive
+    :type file_name: str
+    :return: "zip", "tar", "gz", "bz2", "xz" or None if the file is not a supported archive
+    :rtype: str
+    """
+    file_name = file_name.lower()
+    for suffix, name in ARCHIVE_FORMATS:
+        if file_name.endswith(suffix):
+            return name
+    return None
+
+
+def archive_stem(file_name: str) -> str:
+    # name of the archive without its (possibly double, e.g. .tar.gz) extension
+    lower_name = file_name.lower()
+    for suffix, _ in ARCHIVE_FORMATS:
+        if lower_name.endswith(suffix):
+            return file_name[: -len(suffix)]
+    return os.path.splitext(file_name)[0]
+
+
+class _Guard:
+    # checks the limits while the members are written
+    def __init__(self, archive_size: int, limits: dict) -> None:
+        self.archive_size = max(archive_size, 1)
+        self.limits = limits
+        self.members = 0
+        self.size = 0
+
+    def member(self, declared_size=0, compressed_size=None):
+        self.members += 1
+        if self.members > self.limits["max_members"]:
+            raise ArchiveError(f"more than {self.limits['max_members']} members")
+        if (
+            compressed_size is not None
+            and declared_size > self.limits["min_ratio_size"]
+            and declared_size / max(compressed_size, 1) > self.limits["max_ratio"]
+        ):
+            raise ArchiveError(
+                f"member compression ratio above {self.limits['max_ratio']}"
+            )
+
+    def written(self, size: int):
+        # sizes declared in archives can lie, so the actually written bytes are checked
+        self.size += size
+        if self.size > self.limits["max_size"]:
+            raise ArchiveError(
+                f"more than {self.limits['max_size']} bytes after extraction"
+            )
+        if (
+            self.size > self.limits["min_ratio_size"]
+            and self.size / self.archive_size > self.limits["max_ratio"]
+        ):
+            raise ArchiveError(f"compression ratio above {self.limits['max_ratio']}")
+
+
+def _target(destination: str, name: str) -> str:
+    # path of a member in the destination directory, members which would land outside of it are rejected
+    name = name.replace("\\", "/")
+    parts = [part for part in name.split("/") if part not in ("", ".")]
+    if name.startswith("/") or ".." in parts or (parts and ":" in parts[0]):
+        raise ArchiveError(f"member outside the destination directory: {name}")
+    target = os.path.join(destination, *parts)
+    if os.path.commonpath(
+        [os.path.realpath(destination), os.path.realpath(target)]
+    ) != os.path.realpath(destination):
+        raise ArchiveError(f"member outside the destination directory: {name}")
+    return target
+
+
+def _copy(source, target: str, guard: _Guard):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, "wb") as fo:
+        while chunk := source.read(CHUNK_SIZE):
+            guard.written(len(chunk))
+            fo.write(chunk)
+
+
+def _extract_zip(source: str, destination: str, guard: _Guard):
+    with zipfile.ZipFile(source) as archive:
+        for member in archive.infolist():
+            guard.member(member.file_size, member.compress_size)
+            target = _target(destination, member.filename)
+            if member.is_dir():
+                os.makedirs(target, exist_ok=True)
+                continue
+            with archive.open(member) as fh:
+                _copy(fh, target, guard)
+
+
+def _extract_tar(source: str, destination: str, guard: _Guard):
+    # members are read one by one from the (possibly compressed) stream, in stream mode without seeking back
+    with tarfile.open(source, "r|*") as archive:
+        while (member := archive.next()) is not None:
+            guard.member(member.size)
+            target = _target(destination, member.name)
+            if member.isdir():
+                os.makedirs(target, exist_ok=True)
+            elif member.isfile():
+                with archive.extractfile(member) as fh:
+                    _copy(fh, target, guard)
+            # links, devices and fifos are not extracted
+
+
+def _extract_compressed(source: str, destination: str, guard: _Guard, module):
+    # a single compressed file is extracted under its name without the extension
+    guard.member()
+    target = _target(
+        destination, os.path.splitext(os.path.basename(source))[0] or "file"
+    )
+    with module.open(source, "rb") as fh:
+        _copy(fh, target, guard)
+
+
+def extract_archive(source: str, destination: str, limits: dict) -> dict:
+    """
+    Worker function - extracts an archive member by member, checking the limits during extraction.
+    If the archive breaks a limit or cannot be read, the destination directory is removed (if it did not exist before).
+
+    :param source: path to the archive
+    :type source: str
+    :param destination: path to the destination directory
+    :type destination: str
+    :param limits: dict with max_size, max_members, max_ratio and min_ratio_size
+    :type limits: dict
+    :return: dict with the number of members, extracted bytes, size of the archive, extraction time and error (or None)
+    :rtype: dict
+    """
+    start_time = time.perf_counter()
+    guard = _Guard(0, limits)
+    existed = os.path.exists(destination)
+    error = None
+    try:
+        guard.archive_size = max(os.path.getsize(source), 1)
+        os.makedirs(destination, exist_ok=True)
+        kind = archive_format(source)
+        # a compressed tar archive whose name has lost its .tar (x.tar.gz is moved as x_tar.gz) is recognized by its content
+        if kind in COMPRESSED_FILES and tarfile.is_tarfile(source):
+            kind = "tar"
+        if kind == "zip":
+            _extract_zip(source, destination, guard)
+        elif kind == "tar":
+            _extract_tar(source, destination, guard)
+        elif kind in COMPRESSED_FILES:
+            _extract_compressed(source, destination, guard, COMPRESSED_FILES[kind])
+        else:
+            raise ArchiveError("unsupported archive format")
+    except (
+        ArchiveError,
+        zipfile.BadZipFile,
+        tarfile.TarError,
+        EOFError,
+        lzma.LZMAError,
+        OSError,
+    ) as e:
+        error = f"{type(e).__name__}: {e}"
+        if not existed:
+            shutil.rmtree(destination, ignore_errors=True)
+    return {
+        "members": guard.members,
+        "bytes": guard.size,
+        "archive_size": guard.archive_size,
+        "seconds": time.perf_counter() - start_time,
+        "error": error,
+    }
+
+
+class ArchiveExtractor:
+    """
+    Class for the extraction of archives in a pool of worker processes, so a big archive does not stall sorting.
+
+    Archives are submitted to the pool (its queue) as soon as they are in place and extracted member by member,
+    with limits against decompression bombs: total size after extraction, number of members and compression ratio
+    (checked for archives bigger than min_ratio_size after extraction). Members with absolute paths or with ".."
+    are rejected, as well as links and special files in tar archives, which are not extracted.
+
+    Supported formats: .zip, .tar, .tar.gz / .tgz, .tar.bz2 / .tbz2, .tar.xz / .txz
+    and single compressed files: .gz, .bz2, .xz.
+
+    Args:
+        workers (int): number of worker processes (default: number of CPUs, at most 4)
+        max_size (int): maximum total size of an extracted archive in bytes
+        max_members (int): maximum number of members of an archive
+        max_ratio (float): maximum compression ratio
+        min_ratio_size (int): size after extraction in bytes from which the compression ratio is checked
+    """
+
+    def __init__(
+        self,
+        workers=None,
+        max_size=8 << 30,
+        max_members=100_000,
+        max_ratio=200,
+        min_ratio_size=16 << 20,
+    ) -> None:
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.limits = {
+            "max_size": max_size,
+            "max_members": max_members,
+            "max_ratio": max_ratio,
+            "min_ratio_size": min_ratio_size,
+        }
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=exc_type is not None)
+            self._executor = None
+
+    def submit(self, source: str, destination: str):
+        """
+        The method queues the extraction of an archive (the pool is started with the first archive).
+
+        :return: future with the result of extract_archive
+        :rtype: concurrent.futures.Future
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor.submit(extract_archive, source, destination, self.limits)
@@ -0,0 +1,389 @@
+import copy
+import asyncio
+import threading
+from pathlib import Path
+
+from utility.addressbook import AddressBook
+from utility.notes import Notes
+from utility.completion_index import CompletionIndex
+from utility.exit_interrupt import ExitInterrupt
+from utility.invalid_csv_file_structure import InvalidCSVFileStructure
+from utility.job_manager import JobManager
+from utility.lazy import fuzzy_completer
+
+
+class AsyncRepl:
+    """
+    Class for the interactive menus of PyAssist (main menu, addressbook and notes) on an asyncio event loop.
+
+    Commands are read with prompt_toolkit's prompt_async. Long operations run as background jobs (see JobManager),
+    so the user can keep searching and editing while e.g. a million-row import runs:
+    sort (with the folder paths given, not --watch), import, export and save in both menus and dupes in notes.
+    Imports read the file into a new addressbook / notes and build the completion index in the background,
+    the imported entries are merged when the job ends. Exports, saves and dupes work on a snapshot of the data
+    taken when the command is given - a deep copy, as the foreground commands change records and notes in place.
+    Other commands (and the questions of import and export) run in the foreground: in a thread, so the ends of jobs
+    are printed while e.g. add waits for the answers of the user. The results of jobs are applied after them.
+    sort --watch runs in the event loop thread, so Ctrl+C stops the watch.
+    The jobs are managed with the jobs, wait <job> and cancel <job> commands (in every menu).
+    On exit the program waits for the running jobs (Ctrl+C cancels the ones which can be stopped)
+    before the data is saved.
+
+    Args:
+        cli_pyassist (CliPyassist): assistant with the loaded addressbook and notes
+        max_jobs (int): maximum number of background jobs running at the same time
+    """
+
+    JOB_COMMANDS = ("jobs", "wait", "cancel")
+
+    def __init__(self, cli_pyassist, max_jobs=2) -> None:
+        self.cli_pyassist = cli_pyassist
+        self.jobs = JobManager(max_jobs)
+        self._session = None
+
+    async def _user_command_input(self, message: str, commands, parse_command):
+        from prompt_toolkit.patch_stdout import patch_stdout
+
+        # the ends of background jobs are printed above the prompt
+        with patch_stdout():
+            user_input = await self._session.prompt_async(
+                message,
+                completer=fuzzy_completer([*commands, *self.JOB_COMMANDS]),
+            )
+        user_input = user_input.strip()
+        if user_input:
+            return parse_command(user_input)
+        return "", ""
+
+    async def _job_command(self, cmd: str, argument: str) -> str:
+        if cmd == "jobs":
+            return self.jobs.jobs()
+        if cmd == "wait":
+            return await self.jobs.wait(argument)
+        return self.jobs.cancel(argument)
+
+    async def _foreground(self, function, *args):
+        """
+        The method runs a foreground command in a thread, while the event loop keeps printing the ends of jobs.
+        The results of jobs are not applied until it has finished (see JobManager.foreground).
+
+        :param function: command (it may ask the user for input)
+        :type function: callable
+        :return: result of the command
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def done(method, value):
+            # the menu is not waiting anymore when it has been interrupted (e.g. Ctrl+C closing the program)
+            if not future.done():
+                method(value)
+
+        def run():
+            try:
+                result = function(*args)
+            except BaseException as e:
+                outcome = (future.set_exception, e)
+            else:
+                outcome = (future.set_result, result)
+            try:
+                loop.call_soon_threadsafe(done, *outcome)
+            except RuntimeError:
+                # the event loop has been closed
+                pass
+
+        async with self.jobs.foreground:
+            # a daemon thread, not an executor - Ctrl+C closes the program also while a question waits for an answer
+            threading.Thread(
+                target=run, name="pyassist-foreground", daemon=True
+            ).start()
+            return await future
+
+    def _started(self, job) -> str:
+        return f"Job {job.number} started: {job.description} (see jobs, wait {job.number}, cancel {job.number})."
+
+    async def _import_job(
+        self, store: str, interaction, argument: str, index_name: str
+    ):
+        # the file is read into a new addressbook / notes and the completion index of the merged entries
+        # is built in the background, both replace the old ones in the event loop thread
+        full_path = await self._foreground(interaction._import_export_prepare, argument)
+        if not isinstance(full_path, Path):
+            # None when cancelled, otherwise the error message
+            return full_path or "Import cancelled."
+        data = interaction.addressbook if store == "addressbook" else interaction.notes
+        keys = list(data.keys())
+
+        def import_entries(cancel):
+            imported = AddressBook() if store == "addressbook" else Notes()
+            try:
+                imported.import_from_csv(full_path, cancel)
+            # the messages of the import of the menus (import_from_csv of the interactions)
+            except FileNotFoundError:
+                return (
+                    "Error: Unable to handle with the specified file. Please try again."
+                )
+            except InvalidCSVFileStructure:
+                return "Error: unable to import, invalid file structure."
+            index = CompletionIndex(keys)
+            for key in imported.keys():
+                index.add(key)
+            return imported, index
+
+        def merge(result):
+            if isinstance(result, str):
+                return result
+            imported, index = result
+            data = (
+                interaction.addressbook if store == "addressbook" else interaction.notes
+            )
+            if store == "addressbook":
+                # as in AddressBook.import_from_csv - imported records replace the ones with the same name
+                data.update(imported)
+            else:
+                # as in Notes.import_from_csv - notes with existing titles are not imported
+                for key, note in imported.items():
+                    if note.title.value not in data:
+                        data[key] = note
+            # the entries added or deleted while the job was running
+            for key in keys:
+                if key not in data:
+                    index.remove(key)
+            for key in data.keys():
+                index.add(key)
+            setattr(interaction, index_name, index)
+            if store == "notes":
+                interaction.related_index.resync(data)
+            return f"Data imported successfully from {full_path} ({len(imported)} entries)."
+
+        return self._started(
+            self.jobs.submit(
+                f"{store} import {full_path.name}",
+                import_entries,
+                key=f"{store} import",
+                stoppable=True,
+                on_done=merge,
+            )
+        )
+
+    async def _export_job(self, store: str, interaction, argument: str):
+        full_path = await self._foreground(interaction._import_export_prepare, argument)
+        if not isinstance(full_path, Path):
+            return full_path or "Export cancelled."
+        data = interaction.addressbook if store == "addressbook" else interaction.notes
+        snapshot = copy.deepcopy(data)
+
+        # the message is returned by the job (not by on_done), so it is not held up by a foreground command
+        def export(full_path):
+            snapshot.export_to_csv(full_path)
+            return f"Data exported successfully to {full_path}."
+
+        return self._started(
+            self.jobs.submit(
+                f"{store} export {full_path.name}",
+                export,
+                full_path,
+                key=f"{store} export {full_path}",
+            )
+        )
+
+    async def _save_job(self, store: str, interaction, argument: str):
+        # the file name is given as it is (not in the data folder), without it the data file is saved
+        addressbook_filename, notes_filename = self.cli_pyassist.data_files()
+        if argument:
+            full_path = Path(argument)
+        else:
+            full_path = (
+                addressbook_filename if store == "addressbook" else notes_filename
+            )
+        if store == "addressbook":
+            save_data = copy.deepcopy(interaction.addressbook).save_addresbook
+        else:
+            save_data = copy.deepcopy(interaction.notes).save_notes
+
+        def save(full_path):
+            save_data(full_path)
+            return f"{store.capitalize()} saved to {full_path}."
+
+        return self._started(
+            self.jobs.submit(
+                f"{store} save {full_path.name}",
+                save,
+                full_path,
+                key=f"{store} save {full_path}",
+            )
+        )
+
+    async def import_addressbook(self, argument):
+        interaction = self.cli_pyassist.cli_addressbook_interaction
+        return await self._import_job(
+            "addressbook", interaction, argument, "names_index"
+        )
+
+    async def export_addressbook(self, argument):
+        interaction = self.cli_pyassist.cli_addressbook_interaction
+        return await self._export_job("addressbook", interaction, argument)
+
+    async def save_addressbook(self, argument):
+        interaction = self.cli_pyassist.cli_addressbook_interaction
+        return await self._save_job("addressbook", interaction, argument)
+
+    async def import_notes(self, argument):
+        interaction = self.cli_pyassist.cli_notes_interaction
+        return await self._import_job("notes", interaction, argument, "titles_index")
+
+    async def export_notes(self, argument):
+        interaction = self.cli_pyassist.cli_notes_interaction
+        return await self._export_job("notes", interaction, argument)
+
+    async def save_notes(self, argument):
+        interaction = self.cli_pyassist.cli_notes_interaction
+        return await self._save_job("notes", interaction, argument)
+
+    async def find_duplicates(self, argument):
+        interaction = self.cli_pyassist.cli_notes_interaction
+        return self._started(
+            self.jobs.submit(
+                f"notes dupes {argument}".strip(),
+                interaction.find_duplicates,
+                argument,
+                copy.deepcopy(interaction.notes),
+                key="notes dupes",
+            )
+        )
+
+    async def sort(self, argument):
+        # a sort which asks for the folder path or watches the folder runs in the foreground
+        try:
+            arguments = self.cli_pyassist.parse_sort_arguments(argument)
+        except ValueError:
+            arguments = None
+        if arguments is not None and arguments.watch:
+            # until Ctrl+C, which interrupts only the event loop thread
+            return self.cli_pyassist.sort_init(argument)
+        if arguments is None or not (
+            arguments.paths or arguments.resume or arguments.undo
+        ):
+            return await self._foreground(self.cli_pyassist.sort_init, argument)
+        # the progress line would be mixed with the prompt
+        return self._started(
+            self.jobs.submit(
+                f"sort {argument}",
+                self.cli_pyassist.sort_init,
+                argument,
+                False,
+                key="sort",
+            )
+        )
+
+    # dicts for commands run as background jobs
+    ADDRESSBOOK_JOBS = {
+        "import": import_addressbook,
+        "export": export_addressbook,
+        "save": save_addressbook,
+    }
+
+    NOTES_JOBS = {
+        "import": import_notes,
+        "export": export_notes,
+        "save": save_notes,
+        "dupes": find_duplicates,
+    }
+
+    async def _menu(self, message: str, interaction, commands: dict, jobs: dict):
+        while True:
+            cmd, argument = await self._user_command_input(
+                message, commands, interaction._parse_command
+            )
+            if cmd == "up":
+                return
+            print(await self._execute(cmd, argument, commands, jobs, interaction))
+
+    async def _execute(
+        self, cmd: str, argument: str, commands: dict, jobs: dict, target
+    ):
+        try:
+            if cmd in self.JOB_COMMANDS:
+                return await self._job_command(cmd, argument)
+            if cmd in jobs:
+                return await jobs[cmd](self, argument)
+            if target is self.cli_pyassist:
+                return await self._foreground(target._execute_commands, cmd, argument)
+            return await self._foreground(
+                target._execute_command, commands, cmd, argument
+            )
+        except (ExitInterrupt, KeyboardInterrupt):
+            raise
+        except Exception as e:
+            return f"Error: {e}. Please try again."
+
+    async def _main_menu(self):
+        from prompt_toolkit import PromptSession
+
+        self._session = PromptSession()
+        addressbook = self.cli_pyassist.cli_addressbook_interaction
+        notes = self.cli_pyassist.cli_notes_interaction
+        while True:
+            cmd, argument = await self._user_command_input(
+                "main menu >>> ",
+                [*self.cli_pyassist.MENUS, *self.cli_pyassist.COMMANDS],
+                self.cli_pyassist._parse_command,
+            )
+            if cmd == "addressbook":
+                await self._menu(
+                    "PyAssist  addressbook >>> ",
+                    addressbook,
+                    addressbook.ADDRESSBOOK_MENU_COMMANDS,
+                    self.ADDRESSBOOK_JOBS,
+                )
+            elif cmd == "notes":
+                await self._menu(
+                    "PyAssist  notes >>> ",
+                    notes,
+                    notes.NOTES_MENU_COMMANDS,
+                    self.NOTES_JOBS,
+                )
+            elif cmd == "exit":
+                raise ExitInterrupt
+            else:
+                print(
+                    await self._execute(
+                        cmd,
+                        argument,
+                        self.cli_pyassist.COMMANDS,
+                        {"sort": AsyncRepl.sort},
+                        self.cli_pyassist,
+                    )
+                )
+
+    def _finish_jobs(self, loop):
+        # the data is saved when the background jobs have ended, Ctrl+C cancels the ones which can be stopped
+        while self.jobs.running():
+            print(
+                f"Waiting for {len(self.jobs.running())} background jobs to finish (Ctrl+C cancels the ones which can be stopped)..."
+            )
+            try:
+                loop.run_until_complete(self.jobs.wait())
+            except KeyboardInterrupt:
+                self.jobs.cancel_stoppable()
+        self.jobs.shutdown()
+
+    def run(self):
+        """
+        The method runs the REPL until the user exits, then saves the data and closes the program.
+        """
+        # a new event loop (not asyncio.run) - Ctrl+C raises KeyboardInterrupt also in foreground commands
+        loop = asyncio.new_event_loop()
+        try:
+            menu = loop.create_task(self._main_menu())
+            try:
+                loop.run_until_complete(menu)
+            except (ExitInterrupt, KeyboardInterrupt, EOFError):
+                pass
+            # a menu interrupted in a foreground command releases the foreground lock, so the jobs can finish
+            menu.cancel()
+            loop.run_until_complete(asyncio.wait([menu]))
+            self._finish_jobs(loop)
+        finally:
+            loop.close()
+        self.cli_pyassist.cli_pyassist_exit("")
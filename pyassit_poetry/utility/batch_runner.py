@@ -0,0 +1,554 @@
+import io
+import time
+import shlex
+import contextlib
+
+from utility.addressbook import AddressBook
+from utility.name import Name
+from utility.phone import Phone
+from utility.email import Email
+from utility.birthday import Birthday, FutureDateError
+from utility.record import Record
+from utility.content import Content
+from utility.prompt_not_allowed import PromptNotAllowed
+from utility.user_input import no_prompts
+
+
+class BatchError(Exception):
+    """
+    Exception raised when a command of a batch script fails.
+
+    Args:
+        Exception (class): parent class
+    """
+
+    pass
+
+
+class BatchRunner:
+    """
+    Class for running PyAssist commands without prompts - from a script file or from commands piped on stdin.
+
+    Every line of a script is one command, preceded by the menu it belongs to, e.g.:
+        addressbook add "John Smith" phone=123456789 email=john@example.com birthday=15-10-1985 city=Warsaw
+        addressbook edit "John Smith" phone=987654321 name="John Smith Jr"
+        notes add shopping content="milk, bread" tags="home weekly"
+        sort ~/Downloads --workers 4
+    Arguments are split like in a shell (quotes keep spaces). Blank lines and lines starting with # are skipped.
+    Everything the interactive menus ask for is given as field=value arguments: a command never prompts,
+    a command which lacks an argument fails instead (the commands run in no_prompts, so a question
+    of the menus is reported as an error instead of reading the next line of the script from stdin).
+    Records and notes are added and changed by the same code as in the menus (see CliAddressBookInteraction
+    and CliNotesInteraction), which also keeps the completion indexes up to date.
+    Every command is printed with its status and time. Changes are kept in memory: the changed addressbook / notes
+    are saved once, after the last command (also when the script is interrupted),
+    so a script with thousands of edits does not rewrite the data files after each of them.
+
+    Args:
+        cli_pyassist (CliPyassist): assistant with the loaded addressbook and notes
+        quiet (bool): print only the failed commands and the summary
+        stop_on_error (bool): stop at the first failed command
+    """
+
+    ADDRESS_FIELDS = ("street", "city", "zip_code", "country")
+    RECORD_FIELDS = ("name", "phone", "email", "birthday") + ADDRESS_FIELDS
+    NOTE_FIELDS = ("title", "content", "tags", "addtag", "deltag")
+
+    def __init__(self, cli_pyassist, quiet=False, stop_on_error=False) -> None:
+        self.cli_pyassist = cli_pyassist
+        self.quiet = quiet
+        self.stop_on_error = stop_on_error
+        # data changed by the commands, saved after the last one
+        self.changed = set()
+
+    @property
+    def addressbook(self) -> AddressBook:
+        return self.cli_pyassist.cli_addressbook_interaction.addressbook
+
+    @property
+    def notes(self):
+        return self.cli_pyassist.cli_notes_interaction.notes
+
+    @property
+    def addressbook_interaction(self):
+        return self.cli_pyassist.cli_addressbook_interaction
+
+    @property
+    def notes_interaction(self):
+        return self.cli_pyassist.cli_notes_interaction
+
+    @staticmethod
+    def _fields(tokens: list, allowed: tuple) -> dict:
+        # field=value arguments -> {field: [values]} (a field can be repeated, e.g. phone=... phone=...)
+        fields = {}
+        for token in tokens:
+            field, separator, value = token.partition("=")
+            if not separator or field not in allowed:
+                raise BatchError(
+                    f"unexpected argument {token!r} (expected field=value, fields: {', '.join(allowed)})"
+                )
+            fields.setdefault(field, []).append(value)
+        return fields
+
+    @staticmethod
+    def _field(field_class, value: str):
+        # fields validate their values with ValueError, which is reported with the value
+        try:
+            return field_class(value)
+        except FutureDateError:
+            raise BatchError(f"{value} is a future date")
+        except ValueError:
+            raise BatchError(f"invalid {field_class.__name__.lower()}: {value!r}")
+
+    @staticmethod
+    def _split(argument: str, usage: str) -> list:
+        try:
+            tokens = shlex.split(argument)
+        except ValueError as e:
+            raise BatchError(f"{e}, usage: {usage}")
+        if not tokens:
+            raise BatchError(f"missing argument, usage: {usage}")
+        return tokens
+
+    @staticmethod
+    def _required(argument: str, usage: str) -> str:
+        if not argument.strip():
+            raise BatchError(f"missing argument, usage: {usage}")
+        return argument.strip()
+
+    @staticmethod
+    def _checked(result: str) -> str:
+        # the interactions report errors with messages instead of exceptions
+        if result is None:
+            return ""
+        if result.startswith("Error"):
+            raise BatchError(
+                result.removeprefix("Error: ").removesuffix(" Please try again.")
+            )
+        return result
+
+    def _record_name(self, argument: str) -> str:
+        name = self.addressbook_interaction.record_name(argument)
+        if name not in self.addressbook:
+            raise BatchError(f"record {name} not found in the address book")
+        return name
+
+    def _note_title(self, argument: str) -> str:
+        title = self.notes_interaction.note_title(argument)
+        if title not in self.notes:
+            raise BatchError(f"note with title {title} doesn't exist")
+        return title
+
+    def _tags(self, fields: dict, field: str) -> set:
+        # tags of all the values of the field (tags="a b" tags=c)
+        tags = set()
+        for value in fields.get(field, []):
+            tags |= self.notes_interaction.split_tags(value)
+        return tags
+
+    def _address(self, fields: dict, address=None):
+        # the given address fields replace the ones of the address (if there is one)
+        values = {
+            field: (
+                fields[field][-1]
+                if field in fields
+                else (getattr(address, field).value if address else "")
+            )
+            for field in self.ADDRESS_FIELDS
+        }
+        if not any(values.values()):
+            return None
+        return self.addressbook_interaction.new_address(**values)
+
+    def add_record(self, argument):
+        usage = "addressbook add <name> [phone=...] [email=...] [birthday=...] [street=...] [city=...] [zip_code=...] [country=...]"
+        tokens = self._split(argument, usage)
+        name = self.addressbook_interaction.record_name(tokens[0])
+        fields = self._fields(tokens[1:], self.RECORD_FIELDS[1:])
+        if name in self.addressbook:
+            raise BatchError(f"contact {name} already exists")
+        birthday = fields.get("birthday", [""])[-1]
+        self.addressbook_interaction.insert_record(
+            Record(
+                self._field(Name, name),
+                [self._field(Phone, phone) for phone in fields.get("phone", [])],
+                [self._field(Email, email) for email in fields.get("email", [])],
+                self._field(Birthday, birthday) if birthday else None,
+                self._address(fields),
+            )
+        )
+        self.changed.add("addressbook")
+        return f"A record: {name} added to your address book."
+
+    def edit_record(self, argument):
+        usage = "addressbook edit <name> [name=...] [phone=...] [email=...] [birthday=...] [street=...] ..."
+        tokens = self._split(argument, usage)
+        name = self._record_name(tokens[0])
+        fields = self._fields(tokens[1:], self.RECORD_FIELDS)
+        if not fields:
+            raise BatchError(f"nothing to change, usage: {usage}")
+        record = self.addressbook[name]
+        # the given phones / emails replace all the previous ones (phone= removes them)
+        if "phone" in fields:
+            phones = [self._field(Phone, phone) for phone in fields["phone"] if phone]
+        if "email" in fields:
+            emails = [self._field(Email, email) for email in fields["email"] if email]
+        if "birthday" in fields:
+            birthday = fields["birthday"][-1]
+            birthday = self._field(Birthday, birthday) if birthday else None
+        new_name = None
+        if "name" in fields:
+            new_name = self.addressbook_interaction.record_name(fields["name"][-1])
+            if new_name != name and new_name in self.addressbook:
+                raise BatchError(f"contact {new_name} already exists")
+            new_name = self._field(Name, new_name)
+        # the record is changed only when all the values are valid
+        if "phone" in fields:
+            record.phones = phones
+        if "email" in fields:
+            record.emails = emails
+        if "birthday" in fields:
+            record.birthday = birthday
+        if any(field in fields for field in self.ADDRESS_FIELDS):
+            record.address = self._address(fields, record.address)
+        if new_name is not None:
+            self.addressbook_interaction.rename_record(record, new_name)
+        self.changed.add("addressbook")
+        return f"Record {record.name} changed: {', '.join(fields)}."
+
+    def del_record(self, argument):
+        name = self._record_name(self._required(argument, "addressbook delete <name>"))
+        self.addressbook_interaction.remove_record(name)
+        self.changed.add("addressbook")
+        return f"Record {name} deleted successfully."
+
+    def show(self, argument):
+        if argument:
+            argument = self._record_name(argument)
+        return self.cli_pyassist.cli_addressbook_interaction.show(argument)
+
+    def search(self, argument):
+        return self.cli_pyassist.cli_addressbook_interaction.search(
+            self._required(argument, "addressbook search <query>")
+        )
+
+    def show_upcoming_birthday(self, argument):
+        return self._checked(
+            self.cli_pyassist.cli_addressbook_interaction.show_upcoming_birthday(
+                argument
+            )
+        )
+
+    def export_addressbook(self, argument):
+        return self._checked(
+            self.cli_pyassist.cli_addressbook_interaction.export_to_csv(
+                self._required(argument, "addressbook export <file name>")
+            )
+        )
+
+    def import_addressbook(self, argument):
+        result = self._checked(
+            self.addressbook_interaction.import_from_csv(
+                self._required(argument, "addressbook import <file name>")
+            )
+        )
+        self.changed.add("addressbook")
+        return result
+
+    def save_addressbook(self, argument):
+        self.changed.add("addressbook")
+        return "The addressbook will be saved after the last command."
+
+    def add_note(self, argument):
+        usage = 'notes add <title> [content=...] [tags="tag1 tag2"]'
+        tokens = self._split(argument, usage)
+        title = self.notes_interaction.note_title(tokens[0])
+        fields = self._fields(tokens[1:], ("content", "tags"))
+        if title in self.notes:
+            raise BatchError(f"note with title {title} already exists")
+        self.notes_interaction.insert_note(
+            title, fields.get("content", [""])[-1], self._tags(fields, "tags")
+        )
+        self.changed.add("notes")
+        return f'Note with title: "{title}", created successfully.'
+
+    def edit_note(self, argument):
+        usage = 'notes edit <title> [title=...] [content=...] [tags="..."] [addtag=...] [deltag=...]'
+        tokens = self._split(argument, usage)
+        title = self._note_title(tokens[0])
+        fields = self._fields(tokens[1:], self.NOTE_FIELDS)
+        if not fields:
+            raise BatchError(f"nothing to change, usage: {usage}")
+        new_title = None
+        if "title" in fields:
+            new_title = self.notes_interaction.note_title(fields["title"][-1])
+            if not new_title:
+                raise BatchError("the title cannot be empty")
+            if new_title != title and new_title in self.notes:
+                raise BatchError(f"note with title {new_title} already exists")
+        note = self.notes[title]
+        if "content" in fields:
+            note.content = Content(fields["content"][-1])
+        if "tags" in fields:
+            # the given tags replace the previous ones
+            for tag in list(note.tags):
+                note.delete_tag(tag)
+            for tag in self._tags(fields, "tags"):
+                note.add_tag(tag)
+        for tag in self._tags(fields, "addtag"):
+            note.add_tag(tag)
+        for tag in self._tags(fields, "deltag"):
+            note.delete_tag(tag)
+        self.notes_interaction.note_changed(note)
+        if new_title is not None:
+            self.notes_interaction.rename_note(note, new_title)
+        self.changed.add("notes")
+        return f'Note "{note.title}" changed: {", ".join(fields)}.'
+
+    def delete_note(self, argument):
+        title = self._note_title(self._required(argument, "notes delete <title>"))
+        self.notes_interaction.remove_note(title)
+        self.changed.add("notes")
+        return f"Note with title: {title} deleted"
+
+    def show_notes(self, argument):
+        if argument:
+            argument = self._note_title(argument)
+        return self.cli_pyassist.cli_notes_interaction.show_notes(argument)
+
+    def search_notes(self, argument):
+        return self.cli_pyassist.cli_notes_interaction.search_notes(
+            self._required(argument, "notes search <query>")
+        )
+
+    def sort_notes_by_tag(self, argument):
+        return self.cli_pyassist.cli_notes_interaction.sort_notes_by_tag(argument)
+
+    def related_notes(self, argument):
+        title = self._note_title(self._required(argument, "notes related <title>"))
+        return self.cli_pyassist.cli_notes_interaction.related_notes(title)
+
+    def grep_notes(self, argument):
+        return self._checked(
+            self.cli_pyassist.cli_notes_interaction.grep_notes(
+                self._required(argument, "notes grep [-i] <pattern>")
+            )
+        )
+
+    def find_duplicates(self, argument):
+        return self._checked(
+            self.cli_pyassist.cli_notes_interaction.find_duplicates(argument)
+        )
+
+    def export_notes(self, argument):
+        return self._checked(
+            self.cli_pyassist.cli_notes_interaction.export_to_csv(
+                self._required(argument, "notes export <file name>")
+            )
+        )
+
+    def import_notes(self, argument):
+        result = self._checked(
+            self.notes_interaction.import_from_csv(
+                self._required(argument, "notes import <file name>")
+            )
+        )
+        self.changed.add("notes")
+        return result
+
+    def save_notes(self, argument):
+        self.changed.add("notes")
+        return "The notes will be saved after the last command."
+
+    def sort(self, argument):
+        usage = "sort <folder path> [options]"
+        try:
+            arguments = self.cli_pyassist.parse_sort_arguments(
+                self._required(argument, usage)
+            )
+        except ValueError as e:
+            raise BatchError(f"{e}, usage: {usage}")
+        # without a folder path the sort would ask for it, in watch mode it would never end
+        if not (arguments.paths or arguments.resume or arguments.undo):
+            raise BatchError(f"missing folder path, usage: {usage}")
+        if arguments.watch:
+            raise BatchError("--watch cannot be used in a script")
+        return self._checked(self.cli_pyassist.sort_init(argument))
+
+    def help(self, argument):
+        width = 112
+        help = f'╔{"═"*width}╗\n'
+        for command, description in self.COMMANDS_HELP.items():
+            help += "║ {:>44} - {:<63} ║\n".format(command, description)
+        help += f'╚{"═"*width}╝'
+        return help
+
+    # dicts for commands of the menus
+    ADDRESSBOOK_COMMANDS = {
+        "add": add_record,
+        "edit": edit_record,
+        "delete": del_record,
+        "show": show,
+        "search": search,
+        "birthday": show_upcoming_birthday,
+        "export": export_addressbook,
+        "import": import_addressbook,
+        "save": save_addressbook,
+    }
+
+    NOTES_COMMANDS = {
+        "add": add_note,
+        "edit": edit_note,
+        "delete": delete_note,
+        "show": show_notes,
+        "search": search_notes,
+        "sort": sort_notes_by_tag,
+        "related": related_notes,
+        "grep": grep_notes,
+        "dupes": find_duplicates,
+        "export": export_notes,
+        "import": import_notes,
+        "save": save_notes,
+    }
+
+    COMMANDS = {
+        "addressbook": ADDRESSBOOK_COMMANDS,
+        "notes": NOTES_COMMANDS,
+        "sort": sort,
+        "help": help,
+    }
+
+    COMMANDS_HELP = {
+        "addressbook add <name> [field=value ...]": "fields: phone, email, birthday, street, city, zip_code, country",
+        "addressbook edit <name> [field=value ...]": "the same fields and name (phones / emails are replaced)",
+        "addressbook delete|show <name>": "delete / show the record",
+        "addressbook show": "show all records",
+        "addressbook birthday <days>": "show birthdays in upcoming days <days>",
+        "addressbook search <query>": "search in addressbook <query>",
+        "addressbook import|export <file name>": "import / export csv file <file name>",
+        'notes add <title> [content=...] [tags="..."]': "add new note <title>",
+        "notes edit <title> [field=value ...]": "fields: title, content, tags, addtag, deltag",
+        "notes delete|show|related <title>": "delete / show the note / show similar notes",
+        "notes show": "show all notes",
+        "notes search <query>": "search in notes <query>",
+        "notes grep <-i> <pattern>": "regex search in notes contents <ignore case>",
+        "notes sort <tag>": "sort notes by tags or show notes with <tag>",
+        "notes dupes <threshold>": "find near-duplicate notes <similarity 0-1>",
+        "notes import|export <file name>": "import / export csv file <file name>",
+        "sort <folder path> [options]": "sort files (options as in the main menu)",
+        "help": "show this menu",
+    }
+
+    def execute(self, line: str) -> str:
+        """
+        The method executes one command of a script.
+
+        :param line: command with its menu and arguments, e.g. "notes show shopping"
+        :type line: str
+        :raise BatchError: if the command fails
+        :return: output of the command
+        :rtype: str
+        """
+        menu, _, rest = line.strip().partition(" ")
+        commands = self.COMMANDS.get(menu.lower())
+        if commands is None:
+            raise BatchError(
+                f"command {menu} is not recognized (commands: {', '.join(self.COMMANDS)})"
+            )
+        if callable(commands):
+            return commands(self, rest.strip())
+        command, _, argument = rest.strip().partition(" ")
+        function = commands.get(command.lower())
+        if function is None:
+            raise BatchError(
+                f"command {menu} {command} is not recognized ({menu} commands: {', '.join(commands)})"
+            )
+        return function(self, argument.strip())
+
+    def flush(self) -> list:
+        """
+        The method saves the changed data (once, after the last command).
+
+        :raise BatchError: if the data cannot be saved
+        :return: names of the saved data
+        :rtype: list
+        """
+        addressbook_filename, notes_filename = self.cli_pyassist.data_files()
+        saved = []
+        if "addressbook" in self.changed:
+            self._checked(
+                self.addressbook_interaction.save_addressbook(addressbook_filename)
+            )
+            saved.append("addressbook")
+        if "notes" in self.changed:
+            self._checked(self.notes_interaction.save_notes(notes_filename))
+            saved.append("notes")
+        self.changed.clear()
+        return saved
+
+    def run(self, lines) -> int:
+        """
+        The method executes the commands of a script, saves the changes and prints the summary.
+
+        :param lines: lines of the script (e.g. an open file)
+        :type lines: iterable
+        :return: exit status - 0 if all the commands succeeded, 1 if any failed, 130 if interrupted
+        :rtype: int
+        """
+        succeeded = failed = 0
+        status = 0
+        start_time = time.perf_counter()
+        try:
+            for number, line in enumerate(lines, start=1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                command_start = time.perf_counter()
+                # what the command prints (e.g. grep matches) is shown with its output, after the status line
+                printed = io.StringIO()
+                try:
+                    with contextlib.redirect_stdout(printed), no_prompts():
+                        output = self.execute(line)
+                    error = None
+                except (BatchError, PromptNotAllowed) as e:
+                    output, error = None, str(e)
+                except Exception as e:
+                    output, error = None, f"{type(e).__name__}: {e}"
+                elapsed = (time.perf_counter() - command_start) * 1000
+                if error is None:
+                    succeeded += 1
+                    if not self.quiet:
+                        print(f"#{number} ok {elapsed:.2f} ms | {line}")
+                        print(printed.getvalue(), end="")
+                        if output:
+                            print(output)
+                    continue
+                failed += 1
+                status = 1
+                print(f"#{number} FAILED {elapsed:.2f} ms | {line}")
+                print(printed.getvalue(), end="")
+                print(f"Error: {error}")
+                if self.stop_on_error:
+                    break
+        except KeyboardInterrupt:
+            status = 130
+            print("Interrupted, the changes made so far are saved.")
+        finally:
+            elapsed = time.perf_counter() - start_time
+            flush_start = time.perf_counter()
+            try:
+                saved = self.flush()
+            except BatchError as e:
+                print(f"Error: unable to save the data: {e}")
+                saved = []
+                status = 1
+            flush_time = (time.perf_counter() - flush_start) * 1000
+        commands = succeeded + failed
+        print(
+            f"{commands} commands: {succeeded} ok, {failed} failed in {elapsed:.3f} s "
+            f"({commands / max(elapsed, 1e-9):.0f} commands/s)"
+        )
+        if saved:
+            print(f"Saved: {', '.join(saved)} ({flush_time:.2f} ms)")
+        print(f"Exit status: {status}")
+        return status
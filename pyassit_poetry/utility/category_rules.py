@@ -0,0 +1,118 @@
+import json
+import hashlib
+from pathlib import Path
+
+
+class CategoryRules:
+    """
+    Class for the rules which assign files to categories (images, documents, ...) - loaded from a JSON config file.
+
+    The config file has two sections:
+        categories - dict where keys are categories and values are lists of extensions
+        signatures - list of magic numbers {"category", "offset", "magic" (hex)} used to sniff files
+            with unknown or missing extensions, with optional "also" - list of {"offset", "magic"} which must match too
+            (a short magic number, e.g. "BM" of BMP images, matches many other files on its own)
+    Extensions are looked up in one precompiled, case-insensitive dict (.JPG is an image as well as .jpg).
+    Sniffing is optional: only the first few bytes of a file are read and the result is cached per (device, inode, mtime),
+    so a file which has not changed is never read again by the same rules.
+
+    Args:
+        file_path (Path): path to the config file (default: ~/PyAssist/sort_categories.json if it exists,
+            data/sort_categories.json otherwise)
+        sniff (bool): sniff the category of files with unknown extensions from their content
+        cache_size (int): maximum number of cached sniffing results
+    """
+
+    DEFAULT_CATEGORY = "unsorted"
+
+    def __init__(self, file_path=None, sniff=False, cache_size=100_000) -> None:
+        if file_path is None:
+            file_path = Path.home().joinpath("PyAssist/sort_categories.json")
+            if not file_path.exists():
+                file_path = Path(__file__).parent.parent.joinpath(
+                    "data/sort_categories.json"
+                )
+        self.file_path = Path(file_path)
+        self.sniff = sniff
+        self.cache_size = cache_size
+        with open(self.file_path, "rb") as fh:
+            config = fh.read()
+        # the rules are a part of the sort index fingerprint (the index is dropped when they change)
+        self.fingerprint = (
+            f"{hashlib.blake2b(config, digest_size=8).hexdigest()}:{int(sniff)}"
+        )
+        config = json.loads(config)
+        self.categories = list(
+            dict.fromkeys(
+                [*config["categories"]]
+                + [signature["category"] for signature in config.get("signatures", ())]
+            )
+        )
+        self._extensions = {}
+        for category, extensions in config["categories"].items():
+            for extension in extensions:
+                extension = extension.lower()
+                if not extension.startswith("."):
+                    extension = f".{extension}"
+                self._extensions[extension] = category
+        # signatures are (tuple of (offset, magic) parts, category),
+        # the longest magic numbers are checked first (e.g. ftypheic before ftyp)
+        self._signatures = sorted(
+            (
+                (
+                    tuple(
+                        (part["offset"], bytes.fromhex(part["magic"]))
+                        for part in [signature, *signature.get("also", ())]
+                    ),
+                    signature["category"],
+                )
+                for signature in config.get("signatures", ())
+            ),
+            key=lambda signature: -sum(len(magic) for _, magic in signature[0]),
+        )
+        self.header_size = max(
+            (
+                offset + len(magic)
+                for parts, _ in self._signatures
+                for offset, magic in parts
+            ),
+            default=0,
+        )
+        self._cache = {}
+
+    def category(self, ext: str, path=None, stat=None) -> str:
+        """
+        The method returns the category of a file.
+
+        :param ext: file extension (with the dot, any case)
+        :type ext: str
+        :param path: path to the file, needed only to sniff its content
+        :type path: str
+        :param stat: stat of the file, needed only to sniff its content
+        :type stat: os.stat_result
+        :rtype: str
+        """
+        category = self._extensions.get(ext.lower())
+        if category is not None:
+            return category
+        if not self.sniff or path is None or stat is None or not self._signatures:
+            return self.DEFAULT_CATEGORY
+        key = (stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+        category = self._cache.get(key)
+        if category is None:
+            category = self._sniff(path)
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[key] = category
+        return category
+
+    def _sniff(self, path: str) -> str:
+        try:
+            with open(path, "rb") as fh:
+                header = fh.read(self.header_size)
+        except OSError:
+            return self.DEFAULT_CATEGORY
+        for parts, category in self._signatures:
+            if all(header.startswith(magic, offset) for offset, magic in parts):
+                return category
+        return self.DEFAULT_CATEGORY
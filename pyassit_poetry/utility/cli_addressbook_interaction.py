@@ -1,9 +1,7 @@
-import difflib
 from pathlib import Path
 from datetime import datetime, timedelta
-from prompt_toolkit import prompt
-from prompt_toolkit.completion import FuzzyWordCompleter
 
+from utility.completion_index import CompletionIndex
 from utility.abstract_addressbook_interaction import AbstractAddressbookInteraction
 from utility.addressbook import AddressBook
 from utility.name import Name
@@ -18,6 +16,8 @@ from utility.country import Country
 from utility.record import Record
 from utility.exit_interrupt import ExitInterrupt
 from utility.invalid_csv_file_structure import InvalidCSVFileStructure
+from utility.lazy import fuzzy_completer, index_completer, close_matches
+from utility.user_input import ask
 
 
 class CliAddressBookInteraction(AbstractAddressbookInteraction):
@@ -37,7 +37,7 @@ class CliAddressBookInteraction(AbstractAddressbookInteraction):
                     if func.__name__ == "add_birthday":
                         print("Invalid date format, try again.")
                     if func.__name__ == "import_from_csv":
-                        return "I can't import from this source. Check the file."
+                        return "Error: I can't import from this source. Check the file."
                     if func.__name__ == "show_upcoming_birthday":
                         return "Wrong number of days to show. Please try again."
                     if func.__name__ == "_item_selection":
@@ -55,17 +55,40 @@ class CliAddressBookInteraction(AbstractAddressbookInteraction):
 
     def __init__(self, addressbook: AddressBook) -> None:
         self.addressbook = addressbook
+        self.names_index = CompletionIndex(self.addressbook.keys())
+
+    # the non-interactive core of the commands (also used by BatchRunner): field values are validated by the fields
+    # (ValueError, FutureDateError) and the completion index is kept up to date with the addressbook
+    @staticmethod
+    def record_name(text: str) -> str:
+        return text.strip().title()
+
+    @staticmethod
+    def new_address(street="", city="", zip_code="", country="") -> Address:
+        return Address(Street(street), City(city), ZipCode(zip_code), Country(country))
+
+    def insert_record(self, record: Record):
+        self.addressbook.add_record(record)
+        self.names_index.add(record.name.value)
+
+    def rename_record(self, record: Record, name: Name):
+        del self.addressbook[record.name.value]
+        self.names_index.remove(record.name.value)
+        record.name = name
+        self.insert_record(record)
+
+    def remove_record(self, name: str):
+        del self.addressbook[name]
+        self.names_index.remove(name)
 
     def _set_str_name(self, argument):
         if argument:
-            return argument.strip().title()
-        names_completer = FuzzyWordCompleter(self.addressbook.keys())
-        return (
-            prompt(
-                "Type name or <<< if you want to cancel: ", completer=names_completer
+            return self.record_name(argument)
+        return self.record_name(
+            ask(
+                "Type name or <<< if you want to cancel: ",
+                completer=index_completer(self.names_index),
             )
-            .strip()
-            .title()
         )
 
     @_error_handler
@@ -82,21 +105,21 @@ class CliAddressBookInteraction(AbstractAddressbookInteraction):
 
     @_error_handler
     def add_phone(self) -> Phone:
-        phone = input("Type phone or <<< if you want to cancel: ")
+        phone = ask("Type phone or <<< if you want to cancel: ")
         if phone == "<<<":
             return None
         return Phone(phone)
 
     @_error_handler
     def add_email(self) -> Email:
-        email = input("Type email or <<< if you want to cancel: ")
+        email = ask("Type email or <<< if you want to cancel: ")
         if email == "<<<":
             return None
         return Email(email)
 
     @_error_handler
     def add_birthday(self) -> Birthday:
-        birthday = input(
+        birthday = ask(
             "Input the date of birth as day month year (e.g. 15-10-1985 or 15 10 1985) or <<< if you want to cancel: "
         )
         if birthday == "<<<" or birthday == "":
@@ -105,11 +128,11 @@ class CliAddressBookInteraction(AbstractAddressbookInteraction):
 
     @_error_handler
     def add_address(self) -> Address:
-        street = input("street: ")
-        city = input("city: ")
-        zip_code = input("zip code: ")
-        country = input("country: ")
-        return Address(Street(street), City(city), ZipCode(zip_code), Country(country))
+        street = ask("street: ")
+        city = ask("city: ")
+        zip_code = ask("zip code: ")
+        country = ask("country: ")
+        return self.new_address(street, city, zip_code, country)
 
     # dict for create_record commands
     CREATE_RECORD_COMMANDS = {
@@ -121,7 +144,7 @@ class CliAddressBookInteraction(AbstractAddressbookInteraction):
 
     def _add_data(self, arg):
         datas = []
-        answer = input(f"Type y (yes) if you want to add {arg}: ").strip().lower()
+        answer = ask(f"Type y (yes) if you want to add {arg}: ").strip().lower()
         if answer == "y" or answer == "yes":
             data = self.CREATE_RECORD_COMMANDS[arg](self)
             if isinstance(data, Phone | Email):
@@ -129,7 +152,7 @@ class CliAddressBookInteraction(AbstractAddressbookInteraction):
                     if data:
                         datas.append(data)
                         answer = (
-                            input(f"Type y (yes) if you want to add more {arg}: ")
+                            ask(f"Type y (yes) if you want to add more {arg}: ")
                             .strip()
                             .lower()
                         )
@@ -154,7 +177,7 @@ class CliAddressBookInteraction(AbstractAddressbookInteraction):
     def add_record(self, argument):
         name = self.add_name(argument)
         if name:
-            self.addressbook.add_record(self._create_record(name))
+            self.insert_record(self._create_record(name))
             return f"A record: {name} added to your address book."
         return "Operation cancelled"
 
@@ -163,7 +186,7 @@ class CliAddressBookInteraction(AbstractAddressbookInteraction):
         if name == "<<<":
             return "Operation cancelled"
         elif name in self.addressbook:
-            del self.addressbook[name]
+            self.remove_record(name)
             return f"Record {name} deleted successfully."
         else:
             return f"Record {name} not found in the address book."
@@ -212,20 +235,17 @@ class CliAddressBookInteraction(AbstractAddressbookInteraction):
         return f"No upcoming birthdays in the next {number_of_days} days."
 
     def edit_name(self, record):
-        name = self.add_name(self)
+        name = self.add_name("")
         if name:
-            self.addressbook.add_record(
-                Record(
-                    name, record.phones, record.emails, record.birthday, record.address
-                )
-            )
-            return f"Name changed from {self.addressbook.pop(record.name.value).name} to {name}"
+            old_name = record.name
+            self.rename_record(record, name)
+            return f"Name changed from {old_name} to {name}"
         return "Operation canceled."
 
     def edit_birthday(self, record):
         birthday = self.add_birthday()
         if birthday:
-            self.addresbook[record.name.value].birthday = birthday
+            record.birthday = birthday
             return f"{record.name} birthday set to: {birthday}"
         return "Operation canceled."
 
@@ -246,7 +266,7 @@ class CliAddressBookInteraction(AbstractAddressbookInteraction):
     def _item_selection(self, record, data_list, show, type):
         while True:
             print(f"Contact {record.name} {type}s:{show}", end="")
-            number_to_change = input(
+            number_to_change = ask(
                 "\nSelect by typing a number (for example 1 or 2) or <<< if you want to cancel: "
             )
             if number_to_change == "<<<" or number_to_change == "":
@@ -278,7 +298,7 @@ class CliAddressBookInteraction(AbstractAddressbookInteraction):
         while True:
             if data_list:
                 while True:
-                    answer = input(
+                    answer = ask(
                         f"Contact {record.name} {type}s:{show}\nDo you want to change it, add another or delete? 1 chanege, 2 add, 3 delete: "
                     )
                     if answer == "1" or answer.strip().lower() == "change":
@@ -351,10 +371,9 @@ class CliAddressBookInteraction(AbstractAddressbookInteraction):
         name = self._set_str_name(argument)
         if name in self.addressbook:
             record = self.addressbook[name]
-            command_completer = FuzzyWordCompleter(self.RECORD_EDIT_COMMANDS)
-            command = prompt(
+            command = ask(
                 f"Type what you want to change in {name} contact: ",
-                completer=command_completer,
+                completer=fuzzy_completer(self.RECORD_EDIT_COMMANDS),
             )
             return self._execute_command(self.RECORD_EDIT_COMMANDS, command, record)
         return f"Record {name} not found in the address book."
@@ -363,7 +382,7 @@ class CliAddressBookInteraction(AbstractAddressbookInteraction):
         if argument:
             search_query = argument
         else:
-            search_query = input(
+            search_query = ask(
                 "Enter the search query (or type '<<<' to exit): "
             ).strip()
             if search_query == "<<<" or "":
@@ -378,7 +397,7 @@ class CliAddressBookInteraction(AbstractAddressbookInteraction):
     @_error_handler
     def _import_export_prepare(self, file_name):
         if not file_name:
-            file_name = input(
+            file_name = ask(
                 "Type the filename (e.g., output.csv) or <<< to cancel: "
             ).strip()
         if file_name == "<<<" or file_name == "":
@@ -399,6 +418,7 @@ class CliAddressBookInteraction(AbstractAddressbookInteraction):
         full_path = self._import_export_prepare(argument)
         if full_path:
             self.addressbook.import_from_csv(full_path)
+            self.names_index.rebuild(self.addressbook.keys())
             return f"Data imported successfully from {full_path}."
         return "Import cancelled."
 
@@ -410,6 +430,7 @@ class CliAddressBookInteraction(AbstractAddressbookInteraction):
     @_error_handler
     def load_addressbook(self, filename):
         self.addressbook = self.addressbook.load_addresbook(filename)
+        self.names_index.rebuild(self.addressbook.keys())
         return f"Addressbook loaded from file {filename}"
 
     def exit_program(self, argument):
@@ -454,6 +475,9 @@ class CliAddressBookInteraction(AbstractAddressbookInteraction):
         "birthday <days>": "show birthdays in upcoming days <days>",
         "search <query>": "search in addressbook <query>",
         "save": "save addresbook",
+        "jobs": "show background jobs and their state",
+        "wait <job>": "wait for background job <job> (or all of them)",
+        "cancel <job>": "cancel background job <job>",
         "up": "back tu main menu",
         "exit": "exit from the program",
         "help": "show this menu",
@@ -467,7 +491,7 @@ class CliAddressBookInteraction(AbstractAddressbookInteraction):
             argument: argument to process
         """
         if cmd not in commands_dict:
-            matches = difflib.get_close_matches(cmd, commands_dict)
+            matches = close_matches(cmd, commands_dict)
             info = f"\nmaybe you meant: {' or '.join(matches)}" if matches else ""
             return f"Command {cmd} is not recognized" + info
         cmd = commands_dict[cmd]
@@ -489,21 +513,3 @@ class CliAddressBookInteraction(AbstractAddressbookInteraction):
         command = tokens[0].lower()
         argument = "".join(tokens[1:])
         return command, argument
-
-    # receiving a command from a user
-    def _user_command_input(self):
-        commands_completer = FuzzyWordCompleter(self.ADDRESSBOOK_MENU_COMMANDS.keys())
-        user_input = prompt(
-            f"PyAssist  addressbook >>> ", completer=commands_completer
-        ).strip()
-        if user_input:
-            return self._parse_command(user_input)
-        return "", ""
-
-    def cli_addressbook_menu(self):
-        while True:
-            # cmd, arguments = user_command_input(completer, "address book")
-            cmd, argument = self._user_command_input()
-            if cmd == "up":
-                return "back to main menu"
-            print(self._execute_command(self.ADDRESSBOOK_MENU_COMMANDS, cmd, argument))
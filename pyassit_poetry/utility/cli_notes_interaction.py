@@ -1,15 +1,18 @@
-import difflib
-from prompt_toolkit import prompt
-from prompt_toolkit.completion import FuzzyWordCompleter
 from pathlib import Path
 
+from utility.completion_index import CompletionIndex
+
 from utility.abstract_notes_interaction import AbstractNotesInteraction
 from utility.notes import Notes
 from utility.note import Note
 from utility.title import Title
 from utility.content import Content
+from utility.note_duplicates import NoteDuplicateFinder
+from utility.related_notes import RelatedNotesIndex
 from utility.exit_interrupt import ExitInterrupt
 from utility.invalid_csv_file_structure import InvalidCSVFileStructure
+from utility.lazy import fuzzy_completer, index_completer, close_matches
+from utility.user_input import ask
 
 
 class CliNotesInteraction(AbstractNotesInteraction):
@@ -30,8 +33,16 @@ class CliNotesInteraction(AbstractNotesInteraction):
 
     def __init__(self, notes: Notes) -> None:
         self.notes = notes
+        self.duplicate_finder = NoteDuplicateFinder()
+        self.related_index = RelatedNotesIndex(self.notes)
+        self.titles_index = CompletionIndex(self.notes.keys())
 
     def show_notes(self, arg):
+        if arg:
+            title = arg.strip().lower()
+            if title not in self.notes.keys():
+                return f"Note with title {title} dosen't exist."
+            return f"{self.notes[title]}\n{self._related_notes_str(title)}"
         return self._display_notes(self.notes, "Your notes:")
 
     def _display_notes(self, notes: Notes, arg: str) -> str:
@@ -44,17 +55,51 @@ class CliNotesInteraction(AbstractNotesInteraction):
             return notes_to_show
         return "Nothing to show."
 
+    # the non-interactive core of the commands (also used by BatchRunner),
+    # the completion index and the index of related notes are kept up to date with the notes
+    @staticmethod
+    def note_title(text: str) -> str:
+        return text.strip().lower()
+
+    @staticmethod
+    def split_tags(text: str) -> set:
+        return set(text.split())
+
+    def insert_note(self, title: str, content: str, tags: set):
+        note = Note(Title(title), Content(content), tags)
+        self.notes.add_note(note)
+        self.titles_index.add(title)
+        self.related_index.update(title, note)
+
+    def note_changed(self, note: Note):
+        # called after the content or the tags of the note are changed
+        self.related_index.update(self.note_title(note.title.value), note)
+
+    def rename_note(self, note: Note, title: str):
+        old_title = note.title.value
+        if title == old_title:
+            return
+        note.title = Title(title)
+        del self.notes[old_title]
+        self.titles_index.remove(old_title)
+        self.related_index.remove(old_title)
+        self.notes.add_note(note)
+        self.titles_index.add(title)
+        self.related_index.update(title, note)
+
+    def remove_note(self, title: str):
+        del self.notes[title]
+        self.titles_index.remove(title)
+        self.related_index.remove(title)
+
     def _set_title_str(self, arg: str) -> str:
-        title_completer = FuzzyWordCompleter(self.notes.keys())
         if arg:
-            return arg.strip().lower()
-        return (
-            prompt(
+            return self.note_title(arg)
+        return self.note_title(
+            ask(
                 "Type note title or <<< if you want to cancel: ",
-                completer=title_completer,
+                completer=index_completer(self.titles_index),
             )
-            .strip()
-            .lower()
         )
 
     def _add_title(self, arg):
@@ -69,9 +114,9 @@ class CliNotesInteraction(AbstractNotesInteraction):
         title = self._add_title(arg)
         if title == "" or title == "<<<":
             return "Operation canceled."
-        content = input("Enter note content: ")
-        tags = set(input("Tags (separated by space): ").strip().split())
-        self.notes.add_note(Note(Title(title), Content(content), tags))
+        content = ask("Enter note content: ")
+        tags = self.split_tags(ask("Tags (separated by space): "))
+        self.insert_note(title, content, tags)
         return f'Note with title: "{title}", created successfully.'
 
     def _edit_title(self, note: Note):
@@ -79,33 +124,31 @@ class CliNotesInteraction(AbstractNotesInteraction):
         if title == "" or title == "<<<":
             return "Operation canceled."
         old_note_title = note.title.value
-        note.title = Title(title)
-        self.notes[note.title.value] = note
-        self.notes.pop(old_note_title)
+        self.rename_note(note, title)
         return f'Note title chcanged from" "{old_note_title} to "{note.title}'
 
     def _edit_content(self, note: Note):
-        note.content = input("Type new content: ")
+        note.content = Content(ask("Type new content: "))
+        self.note_changed(note)
         return f"Note content changed"
 
     def _add_tag(self, note: Note):
-        new_tags = set(input("Type new tags (separated by space): ").strip().split())
+        new_tags = self.split_tags(ask("Type new tags (separated by space): "))
         for tag in new_tags:
             note.add_tag(tag)
+        self.note_changed(note)
         return f"Tags: {', '.join(new_tags)} added to the note."
 
     def _del_tag(self, note: Note):
-        tag_completer = FuzzyWordCompleter(note.tags)
-        tags_to_delete = set(
-            prompt(
+        tags_to_delete = self.split_tags(
+            ask(
                 "Type tags you want to delete (separated by space): ",
-                completer=tag_completer,
+                completer=fuzzy_completer(note.tags),
             )
-            .strip()
-            .split()
         )
         for tag in tags_to_delete:
             note.delete_tag(tag)
+        self.note_changed(note)
         return f"Tags: {', '.join(tags_to_delete)} deleted from the note."
 
     NOTE_EDIT_COMMANDS = {
@@ -121,10 +164,9 @@ class CliNotesInteraction(AbstractNotesInteraction):
             return "Operation canceled."
         if title in self.notes.keys():
             note = self.notes[title]
-            command_completer = FuzzyWordCompleter(self.NOTE_EDIT_COMMANDS)
-            command = prompt(
+            command = ask(
                 f"Type what you want to change in note (title, content, add tag, delete tag): ",
-                completer=command_completer,
+                completer=fuzzy_completer(self.NOTE_EDIT_COMMANDS),
             )
             return self._execute_command(self.NOTE_EDIT_COMMANDS, command, note)
         return f"Note with title {title} dosen't exist, operation canceled."
@@ -134,7 +176,7 @@ class CliNotesInteraction(AbstractNotesInteraction):
         if title == "" or title == "<<<":
             return "Operation canceled."
         if title in self.notes.keys():
-            self.notes.pop(title)
+            self.remove_note(title)
             return f"Note with title: {title} deleted"
         return f"Note with title {title} dosen't exist, operation canceled."
 
@@ -161,15 +203,73 @@ class CliNotesInteraction(AbstractNotesInteraction):
         if query:
             query = query.strip().lower()
         else:
-            query = input("Type a query to search for in note: ")
+            query = ask("Type a query to search for in note: ")
         return self._display_notes(
             self.notes.search(query), f'Notes containing: "{query}":'
         )
 
+    def _related_notes_str(self, title: str) -> str:
+        related = self.related_index.related(title)
+        if not related:
+            return "No related notes."
+        related_str = "Related notes:"
+        for key, score in related:
+            related_str += f"\n    - {key} ({score:.2f})"
+        return related_str
+
+    def related_notes(self, arg):
+        title = self._set_title_str(arg)
+        if title == "" or title == "<<<":
+            return "Operation canceled."
+        if title in self.notes.keys():
+            return self._related_notes_str(title)
+        return f"Note with title {title} dosen't exist, operation canceled."
+
+    @_error_handler
+    def grep_notes(self, pattern: str):
+        ignore_case = False
+        if pattern.startswith("-i "):
+            ignore_case = True
+            pattern = pattern[3:].strip()
+        if not pattern:
+            pattern = ask("Type a regular expression to search for in notes: ")
+        if not pattern:
+            return "Operation canceled."
+        # the process pool and shared memory are needed only by grep
+        from utility.notes_grep import NotesGrep
+
+        matched_notes = 0
+        timings = ""
+        for number, matches, size, elapsed, pid in NotesGrep().grep(
+            self.notes, pattern, ignore_case
+        ):
+            for title, snippets in matches:
+                matched_notes += 1
+                print(f"{title}:")
+                for snippet in snippets:
+                    print(f"    {snippet}")
+            timings += f"\nchunk {number:>3}: {size:>6} notes, {elapsed*1000:8.2f} ms (pid {pid})"
+        return f"Notes matching /{pattern}/: {matched_notes}{timings}"
+
+    @_error_handler
+    def find_duplicates(self, threshold: str, notes=None):
+        # notes - a snapshot of the notes when the duplicates are searched for in a background job
+        notes = self.notes if notes is None else notes
+        threshold = float(threshold) if threshold else 0.8
+        if not 0 < threshold <= 1:
+            raise ValueError("similarity threshold must be between 0 and 1")
+        clusters = self.duplicate_finder.find_duplicates(notes, threshold)
+        if not clusters:
+            return "No near-duplicate notes found."
+        duplicates = f"Near-duplicate notes (similarity >= {threshold}):"
+        for i, cluster in enumerate(clusters, start=1):
+            duplicates += f"\n{i}. {' | '.join(cluster)}"
+        return duplicates
+
     @_error_handler
     def _import_export_prepare(self, file_name):
         if not file_name:
-            file_name = input(
+            file_name = ask(
                 "Type the filename (e.g., output.csv) or <<< to cancel: "
             ).strip()
         if file_name == "<<<" or file_name == "":
@@ -190,6 +290,8 @@ class CliNotesInteraction(AbstractNotesInteraction):
         full_path = self._import_export_prepare(file_name)
         if full_path:
             self.notes.import_from_csv(full_path)
+            self.titles_index.rebuild(self.notes.keys())
+            self.related_index.resync(self.notes)
             return f"Data imported successfully from {full_path}."
         return "Import cancelled."
 
@@ -201,6 +303,8 @@ class CliNotesInteraction(AbstractNotesInteraction):
     @_error_handler
     def load_notes(self, filename):
         self.notes = self.notes.load_notes(filename)
+        self.titles_index.rebuild(self.notes.keys())
+        self.related_index.resync(self.notes)
         return f"Notes loaded from file {filename}"
 
     def exit_program(self, argument):
@@ -228,6 +332,9 @@ class CliNotesInteraction(AbstractNotesInteraction):
         "export": export_to_csv,
         "import": import_from_csv,
         "search": search_notes,
+        "related": related_notes,
+        "grep": grep_notes,
+        "dupes": find_duplicates,
         "save": save_notes,
         "up": "up",
         "exit": exit_program,
@@ -244,7 +351,13 @@ class CliNotesInteraction(AbstractNotesInteraction):
         "export <file name>": "export notes to csv file <file name>",
         "import <file name>": "import notes from csv file <file name>",
         "search <query>": "search in notes <query>",
+        "related <title>": "show notes similar to note <title>",
+        "grep <-i> <pattern>": "regex search in notes contents <ignore case>",
+        "dupes <threshold>": "find near-duplicate notes <similarity 0-1>",
         "save": "save notes",
+        "jobs": "show background jobs and their state",
+        "wait <job>": "wait for background job <job> (or all of them)",
+        "cancel <job>": "cancel background job <job>",
         "up": "back tu main menu",
         "exit": "exit from the program",
         "help": "show this menu",
@@ -258,7 +371,7 @@ class CliNotesInteraction(AbstractNotesInteraction):
             argument: argument to process
         """
         if cmd not in commands_dict:
-            matches = difflib.get_close_matches(cmd, commands_dict)
+            matches = close_matches(cmd, commands_dict)
             info = f'\nmaybe you meant: {" or ".join(matches)}' if matches else ""
             return f"Command {cmd} is not recognized" + info
         cmd = commands_dict[cmd]
@@ -276,24 +389,8 @@ class CliNotesInteraction(AbstractNotesInteraction):
             str: command
             str: argument
         """
-        tokens = user_input.split()
+        tokens = user_input.split(maxsplit=1)
         command = tokens[0].lower()
-        argument = "".join(tokens[1:])
+        # the argument keeps its inner spaces (e.g. grep patterns)
+        argument = tokens[1].strip() if len(tokens) > 1 else ""
         return command, argument
-
-    # receiving a command from a user
-    def _user_command_input(self):
-        commands_completer = FuzzyWordCompleter(self.NOTES_MENU_COMMANDS.keys())
-        user_input = prompt(
-            f"PyAssist  notes >>> ", completer=commands_completer
-        ).strip()
-        if user_input:
-            return self._parse_command(user_input)
-        return "", ""
-
-    def cli_notes_menu(self):
-        while True:
-            cmd, argument = self._user_command_input()
-            if cmd == "up":
-                return "back to main menu"
-            print(self._execute_command(self.NOTES_MENU_COMMANDS, cmd, argument))
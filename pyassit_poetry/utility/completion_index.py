@@ -0,0 +1,127 @@
+import re
+
+
+class CompletionIndex:
+    """
+    Class for a persistent completion index (prefix trie) of note titles / contact names.
+
+    Every entry is inserted into the trie under its full (lowercased) text and under the start of each of its words,
+    so typing "smi" completes "John Smith". Each trie node keeps the entries ending in it,
+    so a completion walks the trie only until the requested number of entries is found.
+
+    Args:
+        entries (iterable): initial entries of the index
+    """
+
+    _ENTRIES = ""  # key of the trie node item with the entries ending in the node
+
+    def __init__(self, entries=()) -> None:
+        self.rebuild(entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, entry: str) -> bool:
+        return entry in self._entries
+
+    def _keys(self, entry: str):
+        text = entry.lower()
+        yield text
+        for match in re.finditer(r"[\s_\-.]+(?=\S)", text):
+            yield text[match.end() :]
+
+    def add(self, entry: str):
+        if entry in self._entries:
+            return
+        self._entries.add(entry)
+        for key in self._keys(entry):
+            node = self._root
+            for char in key:
+                node = node.setdefault(char, {})
+            node.setdefault(self._ENTRIES, set()).add(entry)
+
+    def remove(self, entry: str):
+        if entry not in self._entries:
+            return
+        self._entries.discard(entry)
+        for key in self._keys(entry):
+            path = [self._root]
+            for char in key:
+                path.append(path[-1][char])
+            path[-1][self._ENTRIES].discard(entry)
+            # prune the branches which no longer lead to any entry
+            if not path[-1][self._ENTRIES]:
+                del path[-1][self._ENTRIES]
+            for i in range(len(key), 0, -1):
+                if path[i]:
+                    break
+                del path[i - 1][key[i - 1]]
+
+    def rebuild(self, entries):
+        self._root = {}
+        self._entries = set()
+        for entry in entries:
+            self.add(entry)
+
+    def complete(self, text: str, limit=10) -> list:
+        """
+        The method returns up to limit entries starting with text (or with one of its words starting with text),
+        in alphabetical order.
+
+        :param text: text typed by the user
+        :type text: str
+        :param limit: maximal number of returned entries
+        :type limit: int
+        :rtype: list
+        """
+        node = self._root
+        for char in text.lower():
+            node = node.get(char)
+            if node is None:
+                return []
+        found = []
+        # depth-first walk in alphabetical order, stopped as soon as enough entries are found
+        stack = [node]
+        while stack and len(found) < limit:
+            node = stack.pop()
+            for entry in sorted(node.get(self._ENTRIES, ())):
+                if entry not in found:
+                    found.append(entry)
+            stack.extend(
+                node[char]
+                for char in sorted(node, reverse=True)
+                if char != self._ENTRIES
+            )
+        return found[:limit]
+
+    def fuzzy_complete(self, text: str, limit=10, max_scan=5000) -> list:
+        """
+        Fuzzy fallback - returns entries which contain all characters of text in the same order.
+        Only entries starting with the same letter as text are checked, no more than max_scan of them.
+
+        :rtype: list
+        """
+        text = text.lower()
+        if not text:
+            return []
+        pattern = re.compile(".*?".join(map(re.escape, text)))
+        node = self._root.get(text[0])
+        if node is None:
+            return []
+        found = []
+        seen = set()
+        stack = [node]
+        scanned = 0
+        while stack and scanned < max_scan:
+            node = stack.pop()
+            for char, child in node.items():
+                if char != self._ENTRIES:
+                    stack.append(child)
+                    continue
+                for entry in child:
+                    scanned += 1
+                    match = pattern.search(entry.lower())
+                    if match and entry not in seen:
+                        seen.add(entry)
+                        found.append((match.end() - match.start(), entry))
+        return [entry for _, entry in sorted(found)[:limit]]
@@ -0,0 +1,31 @@
+from prompt_toolkit.completion import Completer, Completion
+
+from utility.completion_index import CompletionIndex
+
+
+class CompletionIndexCompleter(Completer):
+    """
+    prompt_toolkit completer yielding at most limit entries from CompletionIndex on every keystroke.
+
+    Args:
+        index (CompletionIndex): index with the entries to complete
+        limit (int): maximal number of completions shown
+        fuzzy (bool): use fuzzy matching if prefix matching gives fewer than limit completions
+    """
+
+    def __init__(self, index: CompletionIndex, limit=10, fuzzy=True) -> None:
+        self.index = index
+        self.limit = limit
+        self.fuzzy = fuzzy
+
+    def get_completions(self, document, complete_event):
+        text = document.text_before_cursor.lstrip()
+        completions = self.index.complete(text, self.limit)
+        if self.fuzzy and len(completions) < self.limit:
+            for entry in self.index.fuzzy_complete(text, self.limit):
+                if len(completions) >= self.limit:
+                    break
+                if entry not in completions:
+                    completions.append(entry)
+        for entry in completions:
+            yield Completion(entry, start_position=-len(text))
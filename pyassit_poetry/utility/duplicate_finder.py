@@ -0,0 +1,92 @@
+import os
+import mmap
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+
+class DuplicateFinder:
+    """
+    Class for finding identical files.
+
+    Files are compared in stages, each stage only for the candidates left by the previous one:
+    files are grouped by size, then by the hash of their first and last few KB,
+    and finally by the hash of the whole content (read via mmap).
+    Every file is read by each stage at most once (hashes are cached by path).
+
+    Args:
+        workers (int): number of threads used to hash files
+        edge_size (int): number of bytes hashed from the beginning and from the end of a file in the second stage
+    """
+
+    def __init__(self, workers=1, edge_size=4096) -> None:
+        self.workers = workers
+        self.edge_size = edge_size
+        self._edge_hashes = {}
+        self._full_hashes = {}
+
+    def _edge_hash(self, path: str, size: int) -> bytes:
+        digest = self._edge_hashes.get(path)
+        if digest is None:
+            with open(path, "rb") as fh:
+                data = fh.read(self.edge_size)
+                if size > 2 * self.edge_size:
+                    fh.seek(-self.edge_size, os.SEEK_END)
+                elif size > self.edge_size:
+                    fh.seek(self.edge_size)
+                data += fh.read(self.edge_size)
+            digest = self._edge_hashes[path] = hashlib.blake2b(data).digest()
+        return digest
+
+    def _full_hash(self, path: str, size: int) -> bytes:
+        # small files have been hashed whole in the previous stage
+        if size <= 2 * self.edge_size:
+            return self._edge_hash(path, size)
+        digest = self._full_hashes.get(path)
+        if digest is None:
+            with open(path, "rb") as fh:
+                with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    digest = hashlib.blake2b(data).digest()
+            self._full_hashes[path] = digest
+        return digest
+
+    def _group(self, groups: list, hash_function) -> list:
+        # splits every group of candidates into groups of files with the same hash
+        candidates = [file for group in groups for file in group]
+        if self.workers > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                hashes = list(
+                    executor.map(
+                        lambda file: hash_function(file[1], file[2]), candidates
+                    )
+                )
+        else:
+            hashes = [hash_function(path, size) for _, path, size in candidates]
+        split_groups = {}
+        for file, digest in zip(candidates, hashes):
+            split_groups.setdefault((file[2], digest), []).append(file)
+        return [group for group in split_groups.values() if len(group) > 1]
+
+    def find(self, files: list) -> dict:
+        """
+        The method finds duplicates among the files.
+
+        :param files: list of (key, path, size) tuples, the first file of every set of identical files is treated as the original
+        :type files: list
+        :return: dict where keys are the keys of duplicates and values are the keys of their originals
+        :rtype: dict
+        """
+        by_size = {}
+        for file in files:
+            # empty files are not treated as duplicates
+            if file[2] > 0:
+                by_size.setdefault(file[2], []).append(file)
+        groups = [group for group in by_size.values() if len(group) > 1]
+        groups = self._group(groups, self._edge_hash)
+        groups = self._group(groups, self._full_hash)
+        duplicates = {}
+        order = {file[0]: i for i, file in enumerate(files)}
+        for group in groups:
+            group.sort(key=lambda file: order[file[0]])
+            for key, _, _ in group[1:]:
+                duplicates[key] = group[0][0]
+        return duplicates
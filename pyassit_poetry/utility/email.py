@@ -1,4 +1,3 @@
-from validator_collection import validators  # pip install validator-collection
 from utility.field import Field
 
 
@@ -13,4 +12,7 @@ class Email(Field):
     """
 
     def __init__(self, value: str) -> None:
+        # validator_collection takes most of the startup time, so it is imported on the first validation
+        from validator_collection import validators  # pip install validator-collection
+
         self.value = validators.email(value, allow_empty=True)
@@ -0,0 +1,137 @@
+import os
+import errno
+import shutil
+
+
+class FileMover:
+    """
+    Class for moving files between directories which may be on different file systems (e.g. a category folder
+    which is a mount point or a symlink to another disk).
+
+    The device of a directory is read from st_dev once and cached, so a batch of files moved from one directory
+    to another costs one comparison: on the same device files are moved with an atomic os.rename,
+    across devices they are copied in the kernel (os.copy_file_range, os.sendfile as a fallback)
+    to a temporary file, which is verified, fsynced and renamed to the destination before the source is unlinked.
+    A rename which fails with EXDEV (e.g. between bind mounts of one file system) falls back to the copy.
+    Destination directories are created once and cached as well.
+    The caches are cleared with reset (the directories may change between the runs).
+    """
+
+    # errors of copy_file_range which mean that it cannot copy between the given files
+    _COPY_RANGE_ERRORS = (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP)
+
+    def __init__(self) -> None:
+        self._devices = {}
+        self._directories = set()
+
+    def reset(self):
+        self._devices.clear()
+        self._directories.clear()
+
+    def make_dirs(self, directory: str):
+        # creates the directory (with its parents) unless it has already been created
+        if directory not in self._directories:
+            os.makedirs(directory, exist_ok=True)
+            self._directories.add(directory)
+
+    def device(self, directory: str) -> int:
+        device = self._devices.get(directory)
+        if device is None:
+            device = self._devices[directory] = os.stat(directory).st_dev
+        return device
+
+    def same_device(self, source_directory: str, destination_directory: str) -> bool:
+        return self.device(source_directory) == self.device(destination_directory)
+
+    def move(self, source: str, destination: str, same_device=True) -> bool:
+        """
+        The method moves a file (the destination directory must exist).
+
+        :param source: path to the file
+        :type source: str
+        :param destination: new path to the file
+        :type destination: str
+        :param same_device: whether the source and destination directories are on the same device (see same_device)
+        :type same_device: bool
+        :return: True if the file has been copied across devices, False if it has been renamed
+        :rtype: bool
+        """
+        if same_device:
+            try:
+                os.rename(source, destination)
+                return False
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+        if os.path.islink(source):
+            os.symlink(os.readlink(source), destination)
+        else:
+            self.copy(source, destination)
+        os.unlink(source)
+        return True
+
+    @classmethod
+    def copy(cls, source: str, destination: str):
+        """
+        The method copies a file through a temporary file in the destination directory,
+        which gets the destination name only when the copy is complete and on disk.
+
+        :param source: path to the file
+        :type source: str
+        :param destination: path to the copy
+        :type destination: str
+        :raise OSError: if the copy is incomplete
+        """
+        temp_path = os.path.join(
+            os.path.dirname(destination), f".{os.path.basename(destination)}.part"
+        )
+        try:
+            with open(source, "rb") as fsrc, open(temp_path, "wb") as fdst:
+                size = os.fstat(fsrc.fileno()).st_size
+                copied = cls._copy_range(fsrc, fdst, size)
+                fdst.flush()
+                os.fsync(fdst.fileno())
+                if copied != size or os.fstat(fdst.fileno()).st_size != size:
+                    raise OSError(
+                        errno.EIO, f"incomplete copy ({copied} of {size} bytes)", source
+                    )
+            shutil.copystat(source, temp_path)
+            os.rename(temp_path, destination)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    @classmethod
+    def _copy_range(cls, fsrc, fdst, size: int) -> int:
+        # copies size bytes in the kernel if possible, in userspace otherwise, returns the number of copied bytes
+        source_fd, destination_fd = fsrc.fileno(), fdst.fileno()
+        copy_file_range = getattr(os, "copy_file_range", None)
+        copied = 0
+        while copied < size:
+            if copy_file_range is not None:
+                try:
+                    count = copy_file_range(source_fd, destination_fd, size - copied)
+                except OSError as e:
+                    # e.g. copies between file systems are not supported by older kernels
+                    if e.errno not in cls._COPY_RANGE_ERRORS:
+                        raise
+                    copy_file_range = None
+                    continue
+            else:
+                try:
+                    count = os.sendfile(
+                        destination_fd, source_fd, copied, size - copied
+                    )
+                except (AttributeError, OSError):
+                    # sendfile cannot write to files on every system
+                    fsrc.seek(copied)
+                    fdst.seek(copied)
+                    shutil.copyfileobj(fsrc, fdst)
+                    return fdst.tell()
+            if count == 0:
+                break
+            copied += count
+        return copied
@@ -0,0 +1,256 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+
+from utility.ignore_rules import IgnoreRules
+
+# inotify event masks (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_inotify():
+    # libc functions used by the watcher, None if inotify is not available (e.g. not Linux)
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_uint32,
+        ]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class FolderWatcher:
+    """
+    Class for watching a directory tree for new files to sort.
+
+    On Linux the tree is watched with inotify (called via ctypes), elsewhere (or if inotify cannot be used)
+    the tree is polled every poll_interval seconds.
+    A file is ready to sort when it is closed after writing (inotify) or when its size and mtime
+    have not changed between two polls (polling). Until then it is busy and must not be touched.
+    Directories with ready files (or new subdirectories) are collected into batches: a batch is yielded
+    when there have been no new events for debounce seconds, or when the oldest change in it is max_delay seconds old.
+    Directories named as one of the excluded folders or excluded by the ignore rules (and their subtrees) are not watched.
+
+    Args:
+        path (str): path to the watched directory
+        excluded_folders (list): names of directories which are not watched
+        debounce (float): seconds without events after which a batch is yielded
+        max_delay (float): maximum age of a change in seconds before its batch is yielded
+        polling (bool): use polling even if inotify is available
+        poll_interval (float): seconds between polls
+        ignore (IgnoreRules): rules of the sorted directory (excluded directories are not watched)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        excluded_folders: list,
+        debounce=1.0,
+        max_delay=5.0,
+        polling=False,
+        poll_interval=1.0,
+        ignore=None,
+    ) -> None:
+        self.path = os.path.abspath(path)
+        self.excluded_folders = excluded_folders
+        self.ignore = ignore
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        # directories to sort in the next batch and files which are still being written
+        self.ready = set()
+        self.busy = set()
+        self._libc = None if polling else _load_inotify()
+        self._fd = None
+        self._watches = {}
+        # polling state: path: (size, mtime_ns) of files seen in the last poll and of files which are changing
+        self._files = None
+        self._directories = set()
+        self._pending = {}
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self._fd is not None
+
+    def __enter__(self):
+        if self._libc is not None:
+            fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0:
+                self._fd = fd
+                self._add_watches(self.path)
+        if self._fd is None:
+            # the current state of the tree is the starting point of polling
+            self._poll()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _walk(self, path: str):
+        # yields directories of the subtree (excluding excluded folders) without recursion
+        stack = [path]
+        while stack:
+            folder_path = stack.pop()
+            try:
+                with os.scandir(folder_path) as entries:
+                    entries = list(entries)
+            except (FileNotFoundError, NotADirectoryError, PermissionError):
+                continue
+            yield folder_path, entries
+            stack.extend(
+                entry.path
+                for entry in entries
+                if entry.is_dir(follow_symlinks=False)
+                and not self._excluded(entry.path, entry.name)
+            )
+
+    def _excluded(self, path: str, name: str) -> bool:
+        # directories which are not sorted, so they are not watched
+        if name in self.excluded_folders:
+            return True
+        return self.ignore is not None and self.ignore.excluded(
+            IgnoreRules.relative_path(self.path, path), True
+        )
+
+    def _add_watches(self, path: str):
+        for folder_path, _ in self._walk(path):
+            wd = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(folder_path), WATCH_MASK
+            )
+            if wd < 0:
+                err = ctypes.get_errno()
+                # the directory disappeared in the meantime
+                if err == errno.ENOENT:
+                    continue
+                raise OSError(err, os.strerror(err), folder_path)
+            # a directory which is already watched (e.g. moved within the tree) keeps its descriptor
+            self._watches[wd] = folder_path
+
+    def _remove_watches(self, path: str):
+        prefix = path + os.sep
+        for wd, folder_path in list(self._watches.items()):
+            if folder_path == path or folder_path.startswith(prefix):
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._watches[wd]
+
+    def _read_events(self):
+        try:
+            data = os.read(self._fd, 1 << 16)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # events were lost - the whole tree is sorted again (unchanged directories are skipped by the index)
+                self.ready.add(self.path)
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            folder_path = self._watches.get(wd)
+            if folder_path is None:
+                continue
+            path = os.path.join(folder_path, name)
+            if mask & IN_ISDIR:
+                if self._excluded(path, name):
+                    continue
+                if mask & IN_MOVED_FROM:
+                    self._remove_watches(path)
+                    continue
+                # new (or moved in) directory: its name is normalized by the sort of its parent
+                self._add_watches(path)
+                self.ready.add(folder_path)
+            elif mask & IN_MOVED_FROM:
+                self.busy.discard(path)
+            elif mask & (IN_CREATE | IN_MODIFY):
+                self.busy.add(path)
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                self.busy.discard(path)
+                self.ready.add(folder_path)
+
+    def _poll(self):
+        files = {}
+        directories = set()
+        for folder_path, entries in self._walk(self.path):
+            directories.add(folder_path)
+            for entry in entries:
+                if not entry.is_dir(follow_symlinks=False):
+                    try:
+                        stat = entry.stat(follow_symlinks=False)
+                    except FileNotFoundError:
+                        continue
+                    files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        if self._files is not None:
+            for path, stat in files.items():
+                if self._files.get(path) != stat:
+                    self._pending[path] = stat
+                elif self._pending.get(path) == stat:
+                    # the file has not changed since the last poll
+                    del self._pending[path]
+                    self.ready.add(os.path.dirname(path))
+            for path in directories - self._directories:
+                self.ready.add(os.path.dirname(path))
+        for path in list(self._pending):
+            if path not in files:
+                del self._pending[path]
+        self.busy = set(self._pending)
+        self._files = files
+        self._directories = directories
+
+    def batches(self):
+        """
+        Generator yielding batches of directories to sort, until it is closed (or interrupted).
+
+        :return: tuples (set of directories to sort, set of paths to files which are still being written)
+        """
+        first_change = None
+        last_event = time.monotonic()
+        while True:
+            if self._fd is not None:
+                readable, _, _ = select.select([self._fd], [], [], self.debounce)
+                if readable:
+                    self._read_events()
+                    last_event = time.monotonic()
+            else:
+                time.sleep(self.poll_interval)
+                ready_count = len(self.ready)
+                self._poll()
+                if len(self.ready) != ready_count or self._pending:
+                    last_event = time.monotonic()
+            if self.ready and first_change is None:
+                first_change = time.monotonic()
+            now = time.monotonic()
+            if self.ready and (
+                now - last_event >= self.debounce
+                or now - first_change >= self.max_delay
+            ):
+                batch, self.ready = self.ready, set()
+                first_change = None
+                yield batch, set(self.busy)
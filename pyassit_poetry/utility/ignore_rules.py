@@ -0,0 +1,167 @@
+import os
+import re
+import hashlib
+from pathlib import Path
+
+
+class IgnoreRules:
+    """
+    Class for the rules which exclude files and directories from sorting - gitignore-style patterns
+    from the .sortignore file of the sorted directory and from the command line (--exclude).
+
+    Supported syntax (as in .gitignore): blank lines and lines starting with # are skipped,
+    * matches anything but /, ? matches one character but /, [abc] matches one of the characters,
+    ** matches any number of directories, a pattern ending with / matches only directories,
+    a pattern with a / at the start or in the middle is matched against the path relative to the sorted directory,
+    other patterns against the name only, ! negates a pattern (the last matching pattern wins).
+    Excluded directories are pruned: they are never scanned, so nothing below them can be included again.
+
+    All the patterns are compiled once: plain names (node_modules, .git) are looked up in sets
+    and without negations the other patterns are joined into one regex per kind (matched against names or paths,
+    of files and directories or of directories only), so the cost of a match does not grow with the number of patterns.
+
+    Args:
+        patterns (iterable): patterns in the order of precedence (the later ones win)
+    """
+
+    FILE_NAME = ".sortignore"
+
+    def __init__(self, patterns=()) -> None:
+        self.patterns = []
+        for pattern in patterns:
+            pattern = pattern.rstrip("\n")
+            if not pattern.endswith("\\ "):
+                pattern = pattern.rstrip()
+            if pattern and not pattern.startswith("#"):
+                self.patterns.append(pattern)
+        self.fingerprint = hashlib.blake2b(
+            "\n".join(self.patterns).encode(), digest_size=8
+        ).hexdigest()
+        # (negated, directories only, matched against the path, compiled pattern, plain name or None)
+        # in the order of precedence
+        self._rules = [self._compile(pattern) for pattern in self.patterns]
+        self._negations = any(rule[0] for rule in self._rules)
+        # names of files and directories / of directories only
+        self._names = set()
+        self._directory_names = set()
+        # joined regexes: for files and directories, for directories only (matched against names and paths)
+        self._regexes = {}
+        if not self._negations:
+            joined = {}
+            for _, directories_only, anchored, regex, name in self._rules:
+                if name is not None:
+                    (self._directory_names if directories_only else self._names).add(
+                        name
+                    )
+                    continue
+                joined.setdefault((directories_only, anchored), []).append(
+                    regex.pattern
+                )
+            self._regexes = {
+                key: re.compile("|".join(f"(?:{pattern})" for pattern in patterns))
+                for key, patterns in joined.items()
+            }
+
+    @classmethod
+    def for_directory(cls, path: str, patterns=()):
+        """
+        The method reads the rules of a sorted directory: its .sortignore file (if it exists) and the given patterns.
+
+        :param path: path to the sorted directory
+        :type path: str
+        :param patterns: additional patterns (e.g. from the command line), they take precedence over the file
+        :type patterns: iterable
+        :rtype: IgnoreRules
+        """
+        try:
+            with open(Path(path).joinpath(cls.FILE_NAME), encoding="utf-8") as fh:
+                file_patterns = fh.readlines()
+        except (FileNotFoundError, NotADirectoryError):
+            file_patterns = []
+        # the rules file is not sorted itself
+        return cls([f"/{cls.FILE_NAME}", *file_patterns, *patterns])
+
+    @staticmethod
+    def _compile(pattern: str) -> tuple:
+        negated = pattern.startswith("!")
+        if negated:
+            pattern = pattern[1:]
+        elif pattern.startswith("\\"):
+            # \# and \! - a pattern starting with a literal # or !
+            pattern = pattern[1:]
+        directories_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+        # a name without wildcards is looked up in a set instead of being matched
+        name = None if anchored or any(char in pattern for char in "*?[\\") else pattern
+        regex = ""
+        i = 0
+        while i < len(pattern):
+            char = pattern[i]
+            if pattern.startswith("**/", i):
+                regex += "(?:.*/)?"
+                i += 3
+                continue
+            if pattern.startswith("/**", i) and i + 3 == len(pattern):
+                regex += "/.*"
+                i += 3
+                continue
+            if pattern.startswith("**", i):
+                regex += ".*"
+                i += 2
+                continue
+            if char == "*":
+                regex += "[^/]*"
+            elif char == "?":
+                regex += "[^/]"
+            elif char == "[" and "]" in pattern[i + 2 :]:
+                end = pattern.index("]", i + 2)
+                characters = pattern[i + 1 : end]
+                if characters.startswith("!"):
+                    characters = "^" + characters[1:]
+                regex += f"[{characters.replace(chr(92), chr(92) * 2)}]"
+                i = end
+            elif char == "\\" and i + 1 < len(pattern):
+                i += 1
+                regex += re.escape(pattern[i])
+            else:
+                regex += re.escape(char)
+            i += 1
+        return negated, directories_only, anchored, re.compile(regex + r"\Z"), name
+
+    def __bool__(self) -> bool:
+        return bool(self._rules)
+
+    def excluded(self, relative_path: str, is_dir=False) -> bool:
+        """
+        The method checks if a file or directory is excluded.
+
+        :param relative_path: path relative to the sorted directory (with / as the separator)
+        :type relative_path: str
+        :param is_dir: whether the path is a directory
+        :type is_dir: bool
+        :rtype: bool
+        """
+        name = relative_path.rpartition("/")[2]
+        if not self._negations:
+            if name in self._names or (is_dir and name in self._directory_names):
+                return True
+            for (directories_only, anchored), regex in self._regexes.items():
+                if (is_dir or not directories_only) and regex.match(
+                    relative_path if anchored else name
+                ):
+                    return True
+            return False
+        for negated, directories_only, anchored, regex, _ in reversed(self._rules):
+            if (is_dir or not directories_only) and regex.match(
+                relative_path if anchored else name
+            ):
+                return not negated
+        return False
+
+    @staticmethod
+    def relative_path(root: str, path: str) -> str:
+        # path relative to the sorted directory, with / as the separator ("" for the directory itself)
+        relative_path = path[len(root) + 1 :] if path != root else ""
+        return relative_path.replace(os.sep, "/") if os.sep != "/" else relative_path
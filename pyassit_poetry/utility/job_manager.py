@@ -0,0 +1,218 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utility.job_cancelled import JobCancelled
+
+
+class Job:
+    """
+    Class for a background job of the REPL.
+
+    Args:
+        number (int): number of the job (used by the wait and cancel commands)
+        description (str): what the job does, e.g. "addressbook import contacts.csv"
+        key (str): jobs with the same key are not run at the same time (e.g. two saves of one file)
+        stoppable (bool): whether the job stops when it is cancelled while running
+    """
+
+    def __init__(self, number: int, description: str, key=None, stoppable=False):
+        self.number = number
+        self.description = description
+        self.key = key
+        self.stoppable = stoppable
+        self.cancel_event = threading.Event()
+        self.future = None
+        # task which applies the result of the job and prints its end
+        self.task = None
+        self.state = "queued"
+        self.message = ""
+        self.submit_time = time.monotonic()
+        self.start_time = None
+        self.end_time = None
+
+    @property
+    def finished(self) -> bool:
+        return self.end_time is not None
+
+    @property
+    def elapsed(self) -> float:
+        if self.start_time is None:
+            return 0.0
+        return (self.end_time or time.monotonic()) - self.start_time
+
+    def __repr__(self) -> str:
+        return f"{self.number:>4}  {self.state:<10}{self.elapsed:>8.1f} s  {self.description}"
+
+
+class JobManager:
+    """
+    Class for the background jobs of the asyncio REPL - long operations (imports, exports, saves, sorts)
+    run in a thread pool while the REPL keeps reading commands.
+
+    A job function works only on data which nobody else changes: a snapshot of the addressbook / notes
+    or a new object it builds (e.g. an addressbook imported from a file). Its result is applied by on_done
+    in the thread of the event loop, but not while a foreground command of the REPL runs (in its own thread,
+    holding the foreground lock), so the data is never changed by two threads at the same time.
+    The end of every job is printed with its result.
+    A job can be cancelled before it starts. A running job can be cancelled only if it is stoppable:
+    it gets the cancel event (as the cancel keyword argument) and raises JobCancelled when it is set.
+
+    Args:
+        max_workers (int): maximum number of jobs running at the same time
+    """
+
+    def __init__(self, max_workers=2) -> None:
+        self.max_workers = max_workers
+        self._executor = None
+        self._jobs = {}
+        self._number = 0
+        # held by the REPL while a foreground command runs, on_done waits for it
+        self.foreground = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def running(self) -> list:
+        return [job for job in self._jobs.values() if not job.finished]
+
+    def submit(
+        self, description: str, function, *args, key=None, stoppable=False, on_done=None
+    ) -> Job:
+        """
+        The method starts a background job (it must be called in the thread of the running event loop).
+
+        :param description: what the job does
+        :type description: str
+        :param function: function run in the thread pool with args (and cancel if the job is stoppable)
+        :type function: callable
+        :param key: jobs with the same key are not run at the same time
+        :type key: str
+        :param stoppable: whether function stops (raises JobCancelled) when its cancel event is set
+        :type stoppable: bool
+        :param on_done: function applying the result of function in the event loop thread
+            (when no foreground command runs), returns the message
+        :type on_done: callable
+        :raise ValueError: if a job with the same key is running
+        :rtype: Job
+        """
+        for job in self.running():
+            if key is not None and job.key == key:
+                raise ValueError(
+                    f"{job.description} is already running as job {job.number}"
+                )
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self.max_workers, thread_name_prefix="pyassist-job"
+            )
+        self._number += 1
+        job = Job(self._number, description, key, stoppable)
+
+        def run():
+            # a job cancelled before it has started is not run at all
+            if job.cancel_event.is_set():
+                raise JobCancelled
+            job.start_time = time.monotonic()
+            job.state = "running"
+            if stoppable:
+                return function(*args, cancel=job.cancel_event)
+            return function(*args)
+
+        job.future = asyncio.get_running_loop().run_in_executor(self._executor, run)
+        job.task = asyncio.ensure_future(self._finish(job, on_done))
+        self._jobs[job.number] = job
+        return job
+
+    async def _finish(self, job: Job, on_done):
+        # runs in the event loop thread
+        try:
+            try:
+                result = await job.future
+            finally:
+                end_time = time.monotonic()
+            if on_done is None:
+                job.message = result
+            else:
+                async with self.foreground:
+                    job.message = on_done(result)
+            # commands report errors with messages
+            job.state = (
+                "failed"
+                if isinstance(job.message, str) and job.message.startswith("Error")
+                else "done"
+            )
+        except JobCancelled:
+            job.state, job.message = "cancelled", "the job has been cancelled"
+        except Exception as e:
+            job.state, job.message = "failed", f"Error: {e or type(e).__name__}"
+        job.end_time = end_time
+        if job.start_time is None:
+            job.start_time = job.end_time
+        print(
+            f"[job {job.number} {job.state} in {job.elapsed:.1f} s] {job.description}\n{job.message}"
+        )
+
+    def jobs(self) -> str:
+        if not self._jobs:
+            return "There are no background jobs."
+        jobs = f"{'job':>4}  {'state':<10}{'time':>10}  description"
+        for job in self._jobs.values():
+            jobs += f"\n{job}"
+        return jobs
+
+    def _job(self, argument: str) -> Job:
+        try:
+            job = self._jobs.get(int(argument))
+        except ValueError:
+            job = None
+        if job is None:
+            raise ValueError(f"there is no job {argument}")
+        return job
+
+    async def wait(self, argument="") -> str:
+        """
+        The method waits for a job (or for all the running jobs if argument is empty).
+
+        :param argument: number of the job
+        :type argument: str
+        :raise ValueError: if there is no such job
+        :rtype: str
+        """
+        jobs = [self._job(argument)] if argument.strip() else self.running()
+        tasks = [job.task for job in jobs if not job.finished]
+        if tasks:
+            await asyncio.wait(tasks)
+        if not argument.strip():
+            return "All background jobs have finished."
+        return f"Job {jobs[0].number} {jobs[0].state}."
+
+    def cancel(self, argument: str) -> str:
+        """
+        The method cancels a job which has not started yet or a stoppable job.
+
+        :param argument: number of the job
+        :type argument: str
+        :raise ValueError: if there is no such job or it cannot be cancelled
+        :rtype: str
+        """
+        job = self._job(argument)
+        if job.finished:
+            raise ValueError(f"job {job.number} has already finished")
+        if job.start_time is not None and not job.stoppable:
+            raise ValueError(
+                f"job {job.number} ({job.description}) cannot be stopped while it is running"
+            )
+        job.cancel_event.set()
+        return f"Job {job.number} will be cancelled."
+
+    def cancel_stoppable(self):
+        # cancels all the jobs which can be cancelled (e.g. when the program is closed without waiting for them)
+        for job in self.running():
+            if job.start_time is None or job.stoppable:
+                job.cancel_event.set()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -0,0 +1,89 @@
+# Accessors of the modules which are imported on first use, not when the program starts
+# (commands given as arguments and the startup do not need them, see benchmarks/bench_startup.py).
+from pathlib import Path
+
+
+def prompt(message: str, **kwargs) -> str:
+    """
+    The function shows a prompt_toolkit prompt (prompt_toolkit is imported when the first prompt is shown).
+    The prompt runs in a thread (in_thread), so it works also in the asyncio REPL with its running event loop.
+
+    :param message: message of the prompt
+    :type message: str
+    :param kwargs: other arguments of prompt_toolkit.prompt (e.g. completer)
+    :rtype: str
+    """
+    from prompt_toolkit import prompt as toolkit_prompt
+
+    kwargs.setdefault("in_thread", True)
+    return toolkit_prompt(message, **kwargs)
+
+
+def fuzzy_completer(words):
+    """
+    The function returns a prompt_toolkit FuzzyWordCompleter of the words.
+
+    :param words: words to complete (e.g. commands)
+    :type words: iterable
+    :rtype: FuzzyWordCompleter
+    """
+    from prompt_toolkit.completion import FuzzyWordCompleter
+
+    return FuzzyWordCompleter(list(words))
+
+
+def index_completer(index):
+    """
+    The function returns a completer of the entries of a CompletionIndex (see CompletionIndexCompleter).
+
+    :param index: completion index of note titles / contact names
+    :type index: CompletionIndex
+    :rtype: CompletionIndexCompleter
+    """
+    from utility.completion_index_completer import CompletionIndexCompleter
+
+    return CompletionIndexCompleter(index)
+
+
+def close_matches(word: str, possibilities) -> list:
+    """
+    The function returns the possibilities which are close to the word (difflib.get_close_matches),
+    e.g. commands for a mistyped command.
+
+    :param word: word to match
+    :type word: str
+    :param possibilities: words to match against
+    :type possibilities: iterable
+    :rtype: list
+    """
+    import difflib
+
+    return difflib.get_close_matches(word, possibilities)
+
+
+def banner(text: str, font="slant") -> str:
+    """
+    The function returns the text rendered with pyfiglet. The rendering is cached in the PyAssist folder
+    of the home directory, so pyfiglet is imported only when there is no cached one (e.g. on the first start).
+
+    :param text: text of the banner
+    :type text: str
+    :param font: pyfiglet font
+    :type font: str
+    :rtype: str
+    """
+    cache_path = Path.home().joinpath(f"PyAssist/banner-{font}-{text}.txt")
+    try:
+        return cache_path.read_text(encoding="utf-8")
+    except OSError:
+        pass
+    import pyfiglet
+
+    rendered = pyfiglet.figlet_format(text, font=font)
+    try:
+        cache_path.parent.mkdir(exist_ok=True)
+        cache_path.write_text(rendered, encoding="utf-8")
+    except OSError:
+        # e.g. a read-only home directory - the banner is rendered on every start
+        pass
+    return rendered
@@ -0,0 +1,58 @@
+import os
+import threading
+
+
+class NameAllocator:
+    """
+    Class for allocating free file / directory names in destination directories.
+
+    For every destination directory a registry of taken names is built from one scandir of the directory
+    and updated with every allocated name, so no file system calls are needed to resolve collisions.
+    For every (name, extension) pair the registry remembers the next suffix to try,
+    so finding the next free "_n" suffix costs O(1) amortized.
+    Allocation is thread-safe (one lock per destination directory).
+    """
+
+    def __init__(self) -> None:
+        self._registries = {}
+        self._lock = threading.Lock()
+
+    def _registry(self, path: str, real_path=None) -> tuple:
+        with self._lock:
+            registry = self._registries.get(path)
+            if registry is None:
+                names = set()
+                try:
+                    with os.scandir(real_path or path) as entries:
+                        names.update(entry.name for entry in entries)
+                except (FileNotFoundError, NotADirectoryError):
+                    pass
+                registry = self._registries[path] = (names, {}, threading.Lock())
+            return registry
+
+    def allocate(self, path: str, file_name: str, ext="", real_path=None) -> str:
+        """
+        The method returns a free path for the file / directory in the destination directory and registers it as taken.
+        If the name is already taken, the character _n (where n is the first free number) is added to the name.
+
+        :param path: Path to destination directory
+        :type path: str
+        :param file_name: Destination directory/file (without extension) name
+        :type file_name: str
+        :param ext: The extension for file or empty for directory
+        :type ext: str
+        :param real_path: Current path to the destination directory on disk, if it differs from path
+        :type real_path: str
+        :rtype: str
+        """
+        names, next_suffixes, lock = self._registry(path, real_path)
+        with lock:
+            full_file_name = f"{file_name}{ext}"
+            if full_file_name in names:
+                i = next_suffixes.get((file_name, ext), 1)
+                while f"{file_name}_{i}{ext}" in names:
+                    i += 1
+                next_suffixes[(file_name, ext)] = i + 1
+                full_file_name = f"{file_name}_{i}{ext}"
+            names.add(full_file_name)
+        return os.path.join(path, full_file_name)
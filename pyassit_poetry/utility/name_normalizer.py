@@ -0,0 +1,89 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+# version of the normalization rules, a part of the sort index fingerprint (names sorted with other rules are sorted again)
+NORMALIZATION_VERSION = 2
+# blocks with Latin letters and their compatibility forms: Latin-1 Supplement, Latin Extended-A and -B,
+# Latin Extended Additional, ligatures (ﬁ) and fullwidth forms
+LATIN_BLOCKS = (
+    (0x00A0, 0x024F),
+    (0x1E00, 0x1EFF),
+    (0xFB00, 0xFB06),
+    (0xFF10, 0xFF5A),
+)
+# Latin letters which are not decomposed by NFKD
+LATIN_LETTERS = {
+    "Ł": "L",
+    "ł": "l",
+    "Ø": "O",
+    "ø": "o",
+    "Đ": "D",
+    "đ": "d",
+    "Ð": "D",
+    "ð": "d",
+    "Ħ": "H",
+    "ħ": "h",
+    "ı": "i",
+    "ŀ": "l",
+    "Ŀ": "L",
+    "ß": "ss",
+    "ẞ": "SS",
+    "Æ": "AE",
+    "æ": "ae",
+    "Œ": "OE",
+    "œ": "oe",
+    "Þ": "TH",
+    "þ": "th",
+    "Ŧ": "T",
+    "ŧ": "t",
+}
+MEMO_SIZE = 1 << 16
+_DISALLOWED = re.compile(r"\W+")
+
+
+def _build_table() -> dict:
+    # characters of the Latin blocks which have an ASCII form after NFKD decomposition without combining marks (ą -> a, ﬁ -> fi)
+    table = {}
+    for first, last in LATIN_BLOCKS:
+        for code in range(first, last + 1):
+            decomposed = unicodedata.normalize("NFKD", chr(code))
+            ascii_form = "".join(
+                char for char in decomposed if not unicodedata.combining(char)
+            )
+            if ascii_form and ascii_form.isascii() and ascii_form != chr(code):
+                table[code] = ascii_form
+    table.update(
+        {ord(letter): ascii_form for letter, ascii_form in LATIN_LETTERS.items()}
+    )
+    return table
+
+
+# str.translate table built once at import
+TRANSLATION_TABLE = _build_table()
+
+
+def transliterate(text: str) -> str:
+    """
+    The function converts Latin letters with diacritics of all Latin-script languages (ą, Ś, é, ñ, ø, ß, ...)
+    to their ASCII equivalents, with one table lookup per character. Other characters are left as they are.
+
+    :param text: text to transliterate
+    :type text: str
+    :rtype: str
+    """
+    return text.translate(TRANSLATION_TABLE)
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def normalize_name(name: str) -> str:
+    """
+    The function normalizes a file / directory name: Latin letters with diacritics are converted to ASCII letters
+    (see transliterate) and every run of characters other than letters, digits and _ is replaced with one _ .
+    Results are memoized (for at most MEMO_SIZE names), so repeated names cost one lookup.
+
+    :param name: name to normalize (without the extension)
+    :type name: str
+    :rtype: str
+    """
+    return _DISALLOWED.sub("_", name.translate(TRANSLATION_TABLE))
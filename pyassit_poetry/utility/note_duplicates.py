@@ -0,0 +1,140 @@
+import re
+import hashlib
+
+from utility.notes import Notes
+
+
+class NoteDuplicateFinder:
+    """
+    Class for finding near-duplicate notes.
+
+    Every note content is turned into a set of character shingles and summarised with a MinHash signature
+    (one-permutation hashing - every shingle is hashed once and lands in one of the signature bins).
+    Signatures are split into bands and notes sharing at least one band land in the same LSH bucket,
+    so only notes from the same buckets are compared with each other.
+    Signatures are cached and recomputed only for notes whose content has changed.
+
+    Args:
+        shingle_size (int): length of the character shingles
+        bands (int): number of LSH bands
+        rows (int): number of signature values in one band
+    """
+
+    _MAX_HASH = (1 << 64) - 1
+
+    def __init__(self, shingle_size=5, bands=16, rows=8) -> None:
+        self.shingle_size = shingle_size
+        self.bands = bands
+        self.rows = rows
+        self.num_perm = bands * rows
+        self._whitespace = re.compile(r"\s+")
+        # cache: note key -> (content used to compute the signature, signature)
+        self._signatures = {}
+
+    def _shingles(self, content: str) -> set:
+        text = self._whitespace.sub(" ", content.lower()).strip()
+        if len(text) <= self.shingle_size:
+            return {text} if text else set()
+        return {
+            text[i : i + self.shingle_size]
+            for i in range(len(text) - self.shingle_size + 1)
+        }
+
+    def _signature(self, content: str) -> tuple:
+        """
+        The method computes MinHash signature of the content.
+
+        :param content: note content
+        :type content: str
+        :rtype: tuple
+        """
+        bins = [self._MAX_HASH] * self.num_perm
+        for shingle in self._shingles(content):
+            value = int.from_bytes(
+                hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "little"
+            )
+            index = value % self.num_perm
+            value //= self.num_perm
+            if value < bins[index]:
+                bins[index] = value
+        # empty bins are filled with the value of the next non-empty bin (densification)
+        if self._MAX_HASH in bins and any(v != self._MAX_HASH for v in bins):
+            for i in range(self.num_perm):
+                if bins[i] == self._MAX_HASH:
+                    offset = 1
+                    while bins[(i + offset) % self.num_perm] == self._MAX_HASH:
+                        offset += 1
+                    bins[i] = bins[(i + offset) % self.num_perm] + offset
+        return tuple(bins)
+
+    def _update_signatures(self, notes: Notes) -> dict:
+        # signatures are recomputed only for new or edited notes, removed notes are dropped from cache
+        signatures = {}
+        for key, note in notes.items():
+            content = note.content.value if note.content else ""
+            cached = self._signatures.get(key)
+            if cached is not None and cached[0] == content:
+                signatures[key] = cached
+            else:
+                signatures[key] = (content, self._signature(content))
+        self._signatures = signatures
+        return signatures
+
+    def similarity(self, first_key: str, second_key: str) -> float:
+        """
+        The method estimates Jaccard similarity of two (already signed) notes.
+
+        :rtype: float
+        """
+        first = self._signatures[first_key][1]
+        second = self._signatures[second_key][1]
+        return sum(a == b for a, b in zip(first, second)) / self.num_perm
+
+    def find_duplicates(self, notes: Notes, threshold=0.8) -> list:
+        """
+        The method finds clusters of near-duplicate notes.
+
+        :param notes: notes to check
+        :type notes: Notes
+        :param threshold: minimal estimated similarity of two notes to treat them as duplicates
+        :type threshold: float
+        :return: list of clusters (lists of note keys), the biggest clusters first
+        :rtype: list
+        """
+        signatures = self._update_signatures(notes)
+        parents = {key: key for key in signatures}
+
+        def find(key):
+            while parents[key] != key:
+                parents[key] = parents[parents[key]]
+                key = parents[key]
+            return key
+
+        checked_pairs = set()
+        for band in range(self.bands):
+            start = band * self.rows
+            buckets = {}
+            for key, (content, signature) in signatures.items():
+                if not content.strip():
+                    continue
+                buckets.setdefault(signature[start : start + self.rows], []).append(key)
+            for bucket in buckets.values():
+                if len(bucket) < 2:
+                    continue
+                for i, first in enumerate(bucket):
+                    for other in bucket[i + 1 :]:
+                        pair = (first, other)
+                        if pair in checked_pairs or find(first) == find(other):
+                            continue
+                        checked_pairs.add(pair)
+                        if self.similarity(first, other) >= threshold:
+                            parents[find(other)] = find(first)
+
+        clusters = {}
+        for key in signatures:
+            clusters.setdefault(find(key), []).append(key)
+        return sorted(
+            (sorted(cluster) for cluster in clusters.values() if len(cluster) > 1),
+            key=len,
+            reverse=True,
+        )
@@ -7,6 +7,7 @@ from utility.note import Note
 from utility.title import Title
 from utility.content import Content
 from utility.invalid_csv_file_structure import InvalidCSVFileStructure
+from utility.job_cancelled import JobCancelled
 
 
 class Notes(UserDict):
@@ -33,11 +34,11 @@ class Notes(UserDict):
         self.data[note.title.value.lower()] = note
 
     # search in notes, return notes object that containing records with the query
-    def search(self, query: str):
+    def search(self, query: str, limit=None):
         """
         The method first looks for an exact match in the keys
         then searches the values of the individual notes and adds them to the returned Notes object
-        if the fragment matches the query.
+        if the fragment matches the query. With a limit the search stops when that many notes are found.
 
         Returns:
             Notes: a new object of class Notes with notes based on the query
@@ -46,7 +47,9 @@ class Notes(UserDict):
         query = query.strip().lower()
         if query in self.keys():
             query_notes[query] = self[query]
-        for note in self.values():
+        for note in self.data.values():
+            if limit is not None and len(query_notes) >= limit:
+                break
             if query in note.title.value.lower() or query in note.content.value.lower():
                 query_notes[note.title.value] = note
             if note.tags:
@@ -67,12 +70,15 @@ class Notes(UserDict):
                     note_dict["tags"] = "|".join(note.tags)
                     writer.writerow(note_dict)
 
-    def import_from_csv(self, file_path: Path):
+    # the import is stopped (JobCancelled) when the cancel event is set - it is checked before every row
+    def import_from_csv(self, file_path: Path, cancel=None):
         with open(file_path, "r", newline="") as fh:
             reader = csv.DictReader(fh)
             if ["title", "content", "tags"] != reader.fieldnames:
                 raise InvalidCSVFileStructure
             for row in reader:
+                if cancel is not None and cancel.is_set():
+                    raise JobCancelled
                 title = row["title"]
                 content = row["content"]
                 tags = set(row["tags"].split("|"))
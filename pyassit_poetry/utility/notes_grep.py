@@ -0,0 +1,148 @@
+import os
+import re
+import time
+from functools import lru_cache
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from utility.notes import Notes
+
+
+@lru_cache(maxsize=8)
+def _compile(pattern: str, flags: int):
+    # every worker process compiles the pattern only once
+    return re.compile(pattern, flags)
+
+
+def _snippet(content: str, start: int, end: int, context=30) -> str:
+    snippet_start = max(0, start - context)
+    snippet_end = min(len(content), end + context)
+    return (
+        f"{'...' if snippet_start else ''}"
+        f"{content[snippet_start:start]}[{content[start:end]}]{content[end:snippet_end]}"
+        f"{'...' if snippet_end < len(content) else ''}"
+    ).replace("\n", " ")
+
+
+def _scan(buffer, offsets: list, first_note: int, pattern: str, flags: int) -> list:
+    regex = _compile(pattern, flags)
+    matches = []
+    for i, (start, end) in enumerate(offsets):
+        content = bytes(buffer[start:end]).decode("utf-8")
+        snippets = [
+            _snippet(content, match.start(), match.end())
+            for match in regex.finditer(content)
+        ]
+        if snippets:
+            matches.append((first_note + i, snippets))
+    return matches
+
+
+def _grep_chunk(
+    shm_name: str, offsets: list, first_note: int, pattern: str, flags: int
+) -> tuple:
+    """
+    Worker function - scans contents of one chunk of notes read directly from the shared memory block.
+
+    :return: tuple (list of (note number, list of snippets), scan time in seconds, process id)
+    """
+    start_time = time.perf_counter()
+    # the block is owned (and unlinked) by the parent process, workers only attach to it
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        matches = _scan(shm.buf, offsets, first_note, pattern, flags)
+    finally:
+        shm.close()
+    return matches, time.perf_counter() - start_time, os.getpid()
+
+
+class NotesGrep:
+    """
+    Class for regex search in note contents with a pool of worker processes.
+
+    The contents of all notes are copied once into a shared memory block, the notes are split into chunks
+    and every worker process reads its chunk straight from the shared block (without pickling the contents).
+    Results are returned chunk by chunk as soon as the workers finish.
+
+    Args:
+        workers (int): number of worker processes (default: number of CPUs)
+        chunk_size (int): number of notes in one chunk (default: notes split evenly into 4 chunks per worker)
+        min_parallel_size (int): total size of contents in bytes below which notes are scanned in the current process
+    """
+
+    def __init__(self, workers=None, chunk_size=None, min_parallel_size=1 << 20):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.min_parallel_size = min_parallel_size
+
+    def grep(self, notes: Notes, pattern: str, ignore_case=False):
+        """
+        Generator yielding the results of the search chunk by chunk, in the order in which chunks are finished.
+
+        :param notes: notes to search in
+        :type notes: Notes
+        :param pattern: regular expression
+        :type pattern: str
+        :param ignore_case: case-insensitive search
+        :type ignore_case: bool
+        :raise re.error: if the pattern is not a valid regular expression
+        :return: tuples (chunk number, list of (note key, list of snippets), number of notes in chunk, scan time, pid)
+        """
+        flags = re.IGNORECASE if ignore_case else 0
+        # invalid patterns are reported before any work is started
+        _compile(pattern, flags)
+        keys = list(notes.keys())
+        if not keys:
+            return
+        contents = [notes[key].content.value.encode("utf-8") for key in keys]
+        offsets = []
+        position = 0
+        for content in contents:
+            offsets.append((position, position + len(content)))
+            position += len(content)
+
+        chunk_size = self.chunk_size or max(1, -(-len(keys) // (self.workers * 4)))
+        chunks = [
+            (first, offsets[first : first + chunk_size])
+            for first in range(0, len(keys), chunk_size)
+        ]
+
+        if position < self.min_parallel_size or self.workers == 1:
+            buffer = memoryview(b"".join(contents))
+            for number, (first, chunk_offsets) in enumerate(chunks):
+                start_time = time.perf_counter()
+                matches = _scan(buffer, chunk_offsets, first, pattern, flags)
+                yield (
+                    number,
+                    [(keys[i], snippets) for i, snippets in matches],
+                    len(chunk_offsets),
+                    time.perf_counter() - start_time,
+                    os.getpid(),
+                )
+            return
+
+        shm = shared_memory.SharedMemory(create=True, size=position)
+        try:
+            for content, (start, end) in zip(contents, offsets):
+                shm.buf[start:end] = content
+            del contents
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                futures = {
+                    executor.submit(
+                        _grep_chunk, shm.name, chunk_offsets, first, pattern, flags
+                    ): (number, len(chunk_offsets))
+                    for number, (first, chunk_offsets) in enumerate(chunks)
+                }
+                for future in as_completed(futures):
+                    number, size = futures[future]
+                    matches, elapsed, pid = future.result()
+                    yield (
+                        number,
+                        [(keys[i], snippets) for i, snippets in matches],
+                        size,
+                        elapsed,
+                        pid,
+                    )
+        finally:
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,2 @@
+class PromptNotAllowed(Exception):
+    pass
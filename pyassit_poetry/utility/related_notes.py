@@ -0,0 +1,212 @@
+import re
+import math
+import heapq
+from array import array
+
+from utility.notes import Notes
+
+
+class RelatedNotesIndex:
+    """
+    Class for finding notes similar to a given note (TF-IDF vectors and cosine similarity).
+
+    Term counts of every note (title, content and tags) are kept as sparse rows in CSR arrays
+    (indptr / indices / data), and every term keeps a posting list of the rows containing it.
+    A query walks only the posting lists of the query terms, so only notes sharing at least one term
+    with the queried note are scored.
+    The index is kept up to date by the commands changing the notes (update / remove), a query only scores.
+    The notes are indexed on the first query and after resync (a load or an import), then only the changed
+    notes are indexed again.
+
+    Args:
+        notes (Notes): notes to index
+    """
+
+    # compact the arrays when more than this part of the rows is outdated
+    _COMPACT_RATIO = 0.5
+
+    def __init__(self, notes: Notes) -> None:
+        self._token = re.compile(r"\w+")
+        self._notes = notes
+        self._synced = False
+        self._reset()
+
+    def _reset(self):
+        # empty index (the state rebuilt by _compact)
+        self._vocabulary = {}
+        self._document_frequency = array("l")
+        self._postings = []  # term id -> (array of rows, array of term counts)
+        self._indptr = array("l", [0])
+        self._indices = array("l")
+        self._data = array("d")
+        self._row_keys = []  # row -> note key (None for outdated rows)
+        self._rows = {}  # note key -> (row, fingerprint)
+        self._alive = 0
+        self._norms = {}
+
+    @staticmethod
+    def _fingerprint(note) -> tuple:
+        content = note.content.value if note.content else ""
+        return note.title.value, content, frozenset(note.tags or ())
+
+    def _term_counts(self, fingerprint: tuple) -> dict:
+        title, content, tags = fingerprint
+        counts = {}
+        for text in (title, content, " ".join(tags)):
+            for token in self._token.findall(text.lower()):
+                counts[token] = counts.get(token, 0) + 1
+        return counts
+
+    def _add_row(self, key: str, fingerprint: tuple):
+        row = len(self._row_keys)
+        for token, count in self._term_counts(fingerprint).items():
+            term = self._vocabulary.get(token)
+            if term is None:
+                term = self._vocabulary[token] = len(self._vocabulary)
+                self._document_frequency.append(0)
+                self._postings.append((array("l"), array("d")))
+            self._document_frequency[term] += 1
+            self._indices.append(term)
+            self._data.append(count)
+            rows, counts = self._postings[term]
+            rows.append(row)
+            counts.append(count)
+        self._indptr.append(len(self._indices))
+        self._row_keys.append(key)
+        self._rows[key] = (row, fingerprint)
+        self._alive += 1
+
+    def _remove_row(self, key: str):
+        row, _ = self._rows.pop(key)
+        for i in range(self._indptr[row], self._indptr[row + 1]):
+            self._document_frequency[self._indices[i]] -= 1
+        self._row_keys[row] = None
+        self._alive -= 1
+
+    def _compact(self):
+        rows = self._rows
+        self._reset()
+        for key, (_, fingerprint) in rows.items():
+            self._add_row(key, fingerprint)
+
+    def _changed(self):
+        # the IDF of every term depends on all the notes, so the norms are computed again
+        # (on the next query, only for the rows it scores)
+        self._norms.clear()
+        if len(self._row_keys) - self._alive > self._COMPACT_RATIO * len(
+            self._row_keys
+        ):
+            self._compact()
+
+    def _index(self, key: str, note) -> bool:
+        fingerprint = self._fingerprint(note)
+        indexed = self._rows.get(key)
+        if indexed is not None:
+            if indexed[1] == fingerprint:
+                return False
+            self._remove_row(key)
+        self._add_row(key, fingerprint)
+        return True
+
+    def _sync(self):
+        # only the notes changed since they were indexed are indexed again
+        changed = False
+        for key in [key for key in self._rows if key not in self._notes]:
+            self._remove_row(key)
+            changed = True
+        for key, note in self._notes.items():
+            changed = self._index(key, note) or changed
+        if changed:
+            self._changed()
+        self._synced = True
+
+    def resync(self, notes: Notes):
+        """
+        The method replaces the indexed notes (e.g. loaded or imported ones), they are synchronized on the next query.
+
+        :param notes: notes to index
+        :type notes: Notes
+        """
+        self._notes = notes
+        self._synced = False
+
+    def update(self, key: str, note):
+        """
+        The method indexes an added or changed note.
+
+        :param key: key of the note in the notes
+        :type key: str
+        :param note: the note
+        :type note: Note
+        """
+        # before the first query the whole notes are indexed by _sync
+        if self._synced and self._index(key, note):
+            self._changed()
+
+    def remove(self, key: str):
+        """
+        The method removes a deleted (or renamed) note from the index.
+
+        :param key: key of the note in the notes
+        :type key: str
+        """
+        if self._synced and key in self._rows:
+            self._remove_row(key)
+            self._changed()
+
+    def _idf(self, term: int) -> float:
+        return math.log((1 + self._alive) / (1 + self._document_frequency[term])) + 1
+
+    def _norm(self, row: int) -> float:
+        norm = self._norms.get(row)
+        if norm is None:
+            start, end = self._indptr[row], self._indptr[row + 1]
+            norm = math.sqrt(
+                sum(
+                    ((1 + math.log(count)) * self._idf(term)) ** 2
+                    for term, count in zip(
+                        self._indices[start:end], self._data[start:end]
+                    )
+                )
+            )
+            self._norms[row] = norm
+        return norm
+
+    def related(self, key: str, top_k=5) -> list:
+        """
+        The method returns notes most similar to the note with the given key.
+
+        :param key: key of the note for which related notes are searched
+        :type key: str
+        :param top_k: maximal number of returned notes
+        :type top_k: int
+        :return: list of (note key, cosine similarity) tuples, the most similar notes first
+        :rtype: list
+        """
+        if not self._synced:
+            self._sync()
+        if key not in self._rows:
+            raise KeyError(key)
+        row, _ = self._rows[key]
+        query_norm = self._norm(row)
+        if not query_norm:
+            return []
+        scores = {}
+        start, end = self._indptr[row], self._indptr[row + 1]
+        for term, count in zip(self._indices[start:end], self._data[start:end]):
+            idf = self._idf(term)
+            query_weight = (1 + math.log(count)) * idf * idf
+            rows, counts = self._postings[term]
+            for other, other_count in zip(rows, counts):
+                if other != row and self._row_keys[other] is not None:
+                    scores[other] = scores.get(other, 0.0) + query_weight * (
+                        1 + math.log(other_count)
+                    )
+        best = heapq.nlargest(
+            top_k,
+            (
+                (score / (query_norm * self._norm(other)), other)
+                for other, score in scores.items()
+            ),
+        )
+        return [(self._row_keys[other], score) for score, other in best]
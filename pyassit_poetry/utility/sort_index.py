@@ -0,0 +1,187 @@
+import os
+import sqlite3
+from pathlib import Path
+
+
+class SortIndex:
+    """
+    Class for the persistent index of directories sorted by FileSorter (SQLite database).
+
+    For every sorted directory the index keeps (path, size, mtime_ns, inode) as they were after the sort.
+    Sorting of a directory depends only on the names of its entries and every change of the entries
+    (file added, removed or renamed) changes the mtime of the directory, so a directory whose stat matches the index
+    is skipped without listing it - only its indexed subdirectories are checked.
+    The index heals itself: rows of directories which disappeared or were replaced (other inode) are dropped
+    and the directories around them are scanned again, an unreadable database is recreated
+    and the whole index is dropped when the settings of the sorter (fingerprint) change.
+
+    The index has rows of directories, not of files: a file is sorted again only when its directory
+    is listed again, and the stat of the directory already tells whether any of its entries changed,
+    so rows of files would not let the sorter skip more (they would only make the database much larger).
+    Sorters run at once by SortScheduler share the database: every transaction takes the write lock
+    when it starts (BEGIN IMMEDIATE) and waits up to BUSY_TIMEOUT seconds for the other sorters.
+
+    Args:
+        file_path (Path): path to the database file
+        fingerprint (str): settings of the sorter which affect the sort of a directory
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS directories (
+            path TEXT PRIMARY KEY,
+            parent TEXT,
+            size INTEGER,
+            mtime_ns INTEGER,
+            inode INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+    BUSY_TIMEOUT = 30.0
+
+    def __init__(self, file_path: Path, fingerprint="") -> None:
+        self.file_path = Path(file_path)
+        self.fingerprint = fingerprint
+        # path: (size, mtime_ns, inode) and path: list of subdirectories of the indexed directories
+        self._stats = {}
+        self._subdirectories = {}
+
+    def _open(self) -> sqlite3.Connection:
+        # transactions are started explicitly (see _begin)
+        connection = sqlite3.connect(
+            self.file_path, timeout=self.BUSY_TIMEOUT, isolation_level=None
+        )
+        connection.executescript(self.SCHEMA)
+        return connection
+
+    def _connect(self) -> sqlite3.Connection:
+        try:
+            return self._open()
+        except sqlite3.OperationalError:
+            # the database is fine, e.g. locked by another sorter for longer than BUSY_TIMEOUT
+            raise
+        except sqlite3.DatabaseError:
+            # the file is not a database (or is damaged) - the index is built again from scratch
+            os.remove(self.file_path)
+            return self._open()
+
+    @staticmethod
+    def _begin(connection: sqlite3.Connection):
+        # the write lock is taken at the start of the transaction, a deferred transaction reading first could not
+        # get it later while another sorter holds a read lock (SQLITE_BUSY without waiting for the busy timeout)
+        connection.execute("BEGIN IMMEDIATE")
+
+    def load(self, path: str, rules=""):
+        """
+        The method loads the indexed directories of the tree (only the rows under path are read).
+        The rows of the tree are dropped when the rules of the tree (e.g. its ignore rules) have changed,
+        so directories which are no longer excluded are scanned.
+
+        :param path: path to the sorted directory
+        :type path: str
+        :param rules: fingerprint of the rules of the tree
+        :type rules: str
+        """
+        self._stats = {}
+        self._subdirectories = {}
+        connection = self._connect()
+        try:
+            with connection:
+                self._begin(connection)
+                row = connection.execute(
+                    "SELECT value FROM meta WHERE key = 'fingerprint'"
+                ).fetchone()
+                if row is None or row[0] != self.fingerprint:
+                    connection.execute("DELETE FROM directories")
+                    connection.execute("DELETE FROM meta WHERE key LIKE 'rules:%'")
+                    connection.execute(
+                        "INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)",
+                        (self.fingerprint,),
+                    )
+                key = f"rules:{path}"
+                row = connection.execute(
+                    "SELECT value FROM meta WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or row[0] != rules:
+                    connection.execute(
+                        "DELETE FROM directories WHERE path = ? OR (path > ? AND path < ?)",
+                        (path, path + os.sep, path + chr(ord(os.sep) + 1)),
+                    )
+                    connection.execute(
+                        "INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, rules)
+                    )
+                    return
+            rows = connection.execute(
+                "SELECT path, parent, size, mtime_ns, inode FROM directories"
+                " WHERE path = ? OR (path > ? AND path < ?)",
+                (path, path + os.sep, path + chr(ord(os.sep) + 1)),
+            )
+            for folder_path, parent, size, mtime_ns, inode in rows:
+                self._stats[folder_path] = (size, mtime_ns, inode)
+                self._subdirectories.setdefault(parent, []).append(folder_path)
+        finally:
+            connection.close()
+
+    def unchanged(self, path: str, stat: os.stat_result):
+        """
+        The method checks if the directory has not changed since it was indexed.
+
+        :param path: path to the directory
+        :type path: str
+        :param stat: current stat of the directory
+        :type stat: os.stat_result
+        :return: list of indexed subdirectories if the directory has not changed, None otherwise
+        :rtype: list
+        """
+        if self._stats.get(path) != (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+            return None
+        return self._subdirectories.get(path, [])
+
+    def update(self, scanned: dict, stale=()):
+        """
+        The method saves the directories scanned during the sort (after the sort is done) in one transaction.
+        Indexed subdirectories which no longer exist are dropped together with their whole subtrees.
+
+        :param scanned: dict where keys are paths to scanned directories and values are lists of their subdirectories
+        :type scanned: dict
+        :param stale: paths to indexed directories which turned out not to exist
+        :type stale: iterable
+        """
+        connection = self._connect()
+        try:
+            with connection:
+                self._begin(connection)
+                removed = list(stale)
+                for path, subdirectories in scanned.items():
+                    removed.extend(
+                        set(self._subdirectories.get(path, ())) - set(subdirectories)
+                    )
+                for path in removed:
+                    connection.execute(
+                        "DELETE FROM directories WHERE path = ? OR (path > ? AND path < ?)",
+                        (path, path + os.sep, path + chr(ord(os.sep) + 1)),
+                    )
+                    # the parent of a stale directory is scanned again during the next sort
+                    connection.execute(
+                        "DELETE FROM directories WHERE path = ?",
+                        (os.path.dirname(path),),
+                    )
+                rows = []
+                for path, subdirectories in scanned.items():
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    rows.append(
+                        (
+                            path,
+                            os.path.dirname(path),
+                            stat.st_size,
+                            stat.st_mtime_ns,
+                            stat.st_ino,
+                        )
+                    )
+                connection.executemany(
+                    "INSERT OR REPLACE INTO directories VALUES (?, ?, ?, ?, ?)", rows
+                )
+        finally:
+            connection.close()
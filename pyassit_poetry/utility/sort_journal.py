@@ -0,0 +1,185 @@
+import os
+import json
+import threading
+from pathlib import Path
+
+from utility.sort_plan import SortOperation
+
+
+class SortJournal:
+    """
+    Class for the operation journal of a sorting run (one JSON Lines file per run), which makes sorting resumable and undoable.
+
+    Before anything is changed on disk, all operations of the run are written to the journal in the order of execution
+    and the journal is fsynced once. Executed operations are marked as done in batches ({"done": [numbers]} lines),
+    with one fsync per batch_size operations, so journaling costs about two fsyncs per batch instead of one per operation.
+    A run which is not marked as finished ({"event": "end"}) was interrupted: its operations which are not marked as done
+    (after a check on disk, as the last batch of markers may be lost) can be executed again with resume.
+    A finished run can be rolled back with undo.
+
+    Args:
+        file_path (Path): path to the journal file of the run
+        batch_size (int): number of done operations after which the markers are written and fsynced
+    """
+
+    def __init__(self, file_path: Path, batch_size=256) -> None:
+        self.file_path = Path(file_path)
+        self.batch_size = batch_size
+        self._numbers = {}
+        self._resumed = False
+        self._pending = []
+        self._lock = threading.Lock()
+        self._fh = None
+
+    @property
+    def run_id(self) -> str:
+        return self.file_path.stem
+
+    def __enter__(self):
+        self._fh = open(self.file_path, "a", encoding="utf-8")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with self._lock:
+            self._flush()
+        if exc_type is None:
+            self._write({"event": "end"})
+            self._sync()
+        self._fh.close()
+        self._fh = None
+
+    def _write(self, record: dict):
+        self._fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _sync(self):
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    def _flush(self):
+        if self._pending:
+            self._write({"done": self._pending})
+            self._pending = []
+            self._sync()
+
+    def write_plan(self, path: str, operations: list):
+        """
+        The method writes the operations in the order in which they will be executed and fsyncs the journal.
+        Nothing is written for a resumed run (its operations are already in the journal).
+
+        :param path: path to the sorted directory
+        :type path: str
+        :param operations: operations in the order of execution
+        :type operations: list
+        """
+        if self._resumed:
+            return
+        self._write({"event": "start", "path": path})
+        for number, operation in enumerate(operations):
+            self._numbers[id(operation)] = number
+            record = {
+                "kind": operation.kind,
+                "source": operation.source,
+                "destination": operation.destination,
+            }
+            if operation.original is not None:
+                record["original"] = operation.original.destination
+            if operation.kind == "extract":
+                # an extraction can only be undone by removing its directory if the directory did not exist before
+                record["existed"] = os.path.exists(operation.destination)
+            self._write(record)
+        self._sync()
+
+    def resume(self, numbers: dict):
+        """
+        The method prepares the journal of an interrupted run for the execution of its remaining operations.
+
+        :param numbers: dict where keys are ids of the remaining operations and values are their numbers in the journal
+        :type numbers: dict
+        """
+        self._numbers = numbers
+        self._resumed = True
+
+    @staticmethod
+    def mark_undone(file_path: Path):
+        # the run cannot be undone (or resumed) again
+        with open(file_path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps({"event": "undone"}) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    def done(self, operations):
+        """
+        The method marks the operations as done (thread-safe), the markers are fsynced every batch_size operations.
+
+        :param operations: executed operations
+        :type operations: iterable
+        """
+        with self._lock:
+            self._pending.extend(
+                self._numbers[id(operation)] for operation in operations
+            )
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+
+    @staticmethod
+    def load(file_path: Path) -> tuple:
+        """
+        The method reads a journal.
+
+        :param file_path: path to the journal file
+        :type file_path: Path
+        :return: tuple (path to the sorted directory, list of operation records, set of numbers of done operations, state)
+            where state is "finished", "undone" or "interrupted"
+        :rtype: tuple
+        """
+        path = None
+        records = []
+        done = set()
+        state = "interrupted"
+        with open(file_path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # the last line may be cut off by a crash
+                    break
+                if "done" in record:
+                    done.update(record["done"])
+                elif record.get("event") == "start":
+                    path = record["path"]
+                elif record.get("event") == "end":
+                    state = "finished"
+                elif record.get("event") == "undone":
+                    state = "undone"
+                else:
+                    records.append(record)
+        return path, records, done, state
+
+    @staticmethod
+    def operation(record: dict) -> SortOperation:
+        # SortOperation rebuilt from its record
+        operation = SortOperation(
+            record["kind"], record["source"], record["destination"]
+        )
+        if "original" in record:
+            operation.original = SortOperation("move", None, record["original"])
+        return operation
+
+    @staticmethod
+    def is_done(record: dict) -> bool:
+        """
+        The method checks on disk if an operation which is not marked as done has been executed anyway
+        (before a crash, after the last fsynced batch of markers).
+        Extractions cannot be checked, they are repeated unless they are marked as done.
+
+        :param record: operation record
+        :type record: dict
+        :rtype: bool
+        """
+        if record["kind"] == "extract":
+            return False
+        if record["kind"] == "rmdir":
+            return not os.path.exists(record["source"])
+        return not os.path.lexists(record["source"]) and os.path.lexists(
+            record["destination"]
+        )
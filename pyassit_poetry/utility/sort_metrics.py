@@ -0,0 +1,247 @@
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+
+class SortMetrics:
+    """
+    Class for the metrics of sorting runs: counters, latency histograms of single operations
+    and wall / CPU time of the phases (plan, execute, ...). All methods are thread-safe.
+
+    Latencies are counted in log2 buckets of microseconds (bucket n holds latencies up to 2**n us),
+    so a histogram has a fixed size no matter how many operations are observed.
+    CPU time of a phase much lower than its wall time means that the phase waits for I/O.
+    One object can be shared by sorters running at once (SortScheduler): the phase of every thread is tracked
+    separately and the progress line shows the phases of all of them.
+
+    Args:
+        progress (callable): function called with the metrics when they change, at most every interval seconds
+        interval (float): minimum time between progress calls in seconds
+    """
+
+    COUNTERS = (
+        "directories",
+        "scanned",
+        "renamed",
+        "removed",
+        "extracted",
+        "moved",
+        "linked",
+        "skipped",
+        "excluded",
+        "bytes_moved",
+        "copied",
+        "errors",
+    )
+    # counter of every kind of executed operation
+    OPERATION_COUNTERS = {
+        "rename": "renamed",
+        "rmdir": "removed",
+        "extract": "extracted",
+        "move": "moved",
+        "link": "linked",
+        "keep": "skipped",
+    }
+
+    def __init__(self, progress=None, interval=0.2) -> None:
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        self.histograms = {}
+        self.phases = {}
+        # thread id -> stack of the phases running in the thread
+        self._running = {}
+        # number of operations to execute (for the progress line)
+        self.total = 0
+        self.progress = progress
+        self.interval = interval
+        self._last_progress = 0.0
+        self._lock = threading.Lock()
+        self._progress_lock = threading.Lock()
+
+    @property
+    def phase_name(self):
+        # the innermost phase of every thread in a phase (e.g. "plan, execute" while two sorters run)
+        with self._lock:
+            names = [stack[-1] for stack in self._running.values()]
+        return ", ".join(dict.fromkeys(names)) or None
+
+    def add_total(self, count: int):
+        # adds planned operations to the total of the progress line
+        with self._lock:
+            self.total += count
+        self._update()
+
+    def count(self, name: str, value=1):
+        with self._lock:
+            self.counters[name] += value
+        self._update()
+
+    def observe(self, name: str, seconds: float):
+        """
+        The method adds the latency of one operation to the histogram of its kind.
+
+        :param name: kind of the operation (scan, move, ...)
+        :type name: str
+        :param seconds: latency in seconds
+        :type seconds: float
+        """
+        bucket = int(seconds * 1_000_000).bit_length()
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = {
+                    "count": 0,
+                    "sum": 0.0,
+                    "max": 0.0,
+                    "buckets": [],
+                }
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+            histogram["max"] = max(histogram["max"], seconds)
+            buckets = histogram["buckets"]
+            if bucket >= len(buckets):
+                buckets.extend([0] * (bucket + 1 - len(buckets)))
+            buckets[bucket] += 1
+
+    def operation(self, operation, seconds: float):
+        """
+        The method counts an executed operation of the plan and observes its latency.
+
+        :param operation: executed operation
+        :type operation: SortOperation
+        :param seconds: latency in seconds
+        :type seconds: float
+        """
+        with self._lock:
+            self.counters[self.OPERATION_COUNTERS[operation.kind]] += 1
+            if operation.kind == "move":
+                self.counters["bytes_moved"] += operation.size or 0
+        self.observe(operation.kind, seconds)
+        self._update()
+
+    @contextmanager
+    def phase(self, name: str):
+        # measures wall and CPU time of a phase (times of phases repeated e.g. in watch mode are summed up)
+        thread = threading.get_ident()
+        with self._lock:
+            self._running.setdefault(thread, []).append(name)
+        self._update(force=True)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            with self._lock:
+                phase = self.phases.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+                phase["wall"] += time.perf_counter() - wall
+                phase["cpu"] += time.process_time() - cpu
+                stack = self._running[thread]
+                stack.pop()
+                if not stack:
+                    del self._running[thread]
+
+    def _update(self, force=False):
+        if self.progress is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_progress < self.interval:
+            return
+        # only one thread renders the progress at a time, the others do not wait for it
+        if self._progress_lock.acquire(blocking=False):
+            try:
+                self._last_progress = now
+                self.progress(self)
+            finally:
+                self._progress_lock.release()
+
+    @staticmethod
+    def _percentile(histogram: dict, fraction: float) -> float:
+        # upper bound of the bucket with the given fraction of observations
+        threshold = histogram["count"] * fraction
+        seen = 0
+        for bucket, count in enumerate(histogram["buckets"]):
+            seen += count
+            if seen >= threshold:
+                return min((1 << bucket) / 1_000_000, histogram["max"])
+        return histogram["max"]
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "phases": {
+                    name: {
+                        **phase,
+                        "cpu_share": (
+                            phase["cpu"] / phase["wall"] if phase["wall"] else 0.0
+                        ),
+                    }
+                    for name, phase in self.phases.items()
+                },
+                "latency": {
+                    name: {
+                        "count": histogram["count"],
+                        "mean": histogram["sum"] / histogram["count"],
+                        "p50": self._percentile(histogram, 0.5),
+                        "p99": self._percentile(histogram, 0.99),
+                        "max": histogram["max"],
+                        # bucket n: latencies up to 2**n microseconds
+                        "buckets_us": {
+                            str(1 << bucket): count
+                            for bucket, count in enumerate(histogram["buckets"])
+                            if count
+                        },
+                    }
+                    for name, histogram in self.histograms.items()
+                },
+            }
+
+    def dump(self, file_path):
+        """
+        The method saves the metrics to a JSON file.
+
+        :param file_path: path to the file
+        :type file_path: str
+        """
+        with open(file_path, "w") as fh:
+            json.dump(self.to_dict(), fh, indent=2)
+
+    def progress_line(self) -> str:
+        counters = self.counters
+        done = sum(
+            counters[name]
+            for name in ("renamed", "removed", "extracted", "moved", "linked")
+        )
+        line = f"{self.phase_name or 'sort'}: {counters['scanned']} files in {counters['directories']} directories scanned"
+        if self.total:
+            line += f", {done}/{self.total} operations done"
+        line += f", {counters['bytes_moved'] / 1_000_000:.1f} MB moved"
+        if counters["errors"]:
+            line += f", {counters['errors']} errors"
+        return line
+
+
+class ProgressLine:
+    """
+    Class for the progress line of sorting, rewritten in place in the terminal (to be used as the progress of SortMetrics).
+
+    Args:
+        stream: stream to which the line is written (default: sys.stderr)
+    """
+
+    def __init__(self, stream=None) -> None:
+        self.stream = stream or sys.stderr
+        self._width = 0
+
+    def __call__(self, metrics: SortMetrics):
+        line = metrics.progress_line()
+        self.stream.write(f"\r{line}{' ' * max(0, self._width - len(line))}")
+        self.stream.flush()
+        self._width = len(line)
+
+    def close(self):
+        # the line is cleared, so the next output starts at the beginning of the line
+        if self._width:
+            self.stream.write(f"\r{' ' * self._width}\r")
+            self.stream.flush()
+            self._width = 0
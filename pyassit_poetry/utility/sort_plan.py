@@ -0,0 +1,115 @@
+import os
+
+
+class SortOperation:
+    """
+    Class for a single planned file system operation of FileSorter (plain data, nothing is done on disk).
+
+    Kinds of operations:
+        rename - rename of a directory to its normalized name
+        rmdir - removal of an empty directory
+        extract - extraction of an archive (source) to the destination directory
+        move - move of a file to its category directory
+        link - duplicate file replaced with a hardlink to its original (destination of the original operation)
+        keep - file which stays where it is (only reported)
+        done - marker of a directory whose all entries have been planned
+
+    Args:
+        kind (str): kind of the operation
+        source (str): source path
+        destination (str): destination path (None if not applicable)
+        category (str): file category (images, documents, ...) for file operations
+        extension (str): file extension for file operations
+        size (int): file size in bytes (if known)
+        real_source (str): path to the file on disk while planning (if it differs from source)
+        original (SortOperation): operation of the original file for duplicates
+    """
+
+    __slots__ = (
+        "kind",
+        "source",
+        "destination",
+        "category",
+        "extension",
+        "size",
+        "real_source",
+        "original",
+    )
+
+    def __init__(
+        self,
+        kind: str,
+        source: str,
+        destination=None,
+        category=None,
+        extension=None,
+        size=None,
+        real_source=None,
+    ) -> None:
+        self.kind = kind
+        self.source = source
+        self.destination = destination
+        self.category = category
+        self.extension = extension
+        self.size = size
+        self.real_source = real_source
+        self.original = None
+
+    def __repr__(self) -> str:
+        if self.destination is None:
+            return f"{self.kind:>7}: {self.source}"
+        return f"{self.kind:>7}: {self.source} -> {self.destination}"
+
+
+class SortPlan:
+    """
+    Class for the full list of operations planned by FileSorter for a directory tree.
+
+    Operations are kept in the order in which a serial, depth-first sort visits them
+    (a directory's "done" marker follows all operations of the directory and its subdirectories),
+    so the report can be written in that order regardless of the order in which the operations are executed.
+
+    Args:
+        path (str): path to the sorted directory
+        operations (list): list of SortOperation objects
+    """
+
+    def __init__(self, path: str, operations: list) -> None:
+        self.path = path
+        self.operations = operations
+        # directories listed while planning (path: list of their subdirectories after the sort)
+        # and indexed directories which turned out not to exist
+        self.scanned = {}
+        self.stale = set()
+        # numbers of directories (with their subtrees) and files excluded by the ignore rules
+        self.excluded = {"directories": 0, "files": 0}
+
+    def __len__(self) -> int:
+        return sum(
+            operation.kind not in ("keep", "done") for operation in self.operations
+        )
+
+    def __repr__(self) -> str:
+        plan = f"Sorting plan for {self.path} ({len(self)} operations):"
+        for operation in self.operations:
+            if operation.kind not in ("keep", "done"):
+                plan += f"\n{operation}"
+        return plan
+
+    def of_kind(self, kind: str) -> list:
+        return [operation for operation in self.operations if operation.kind == kind]
+
+    def moves_by_directory(self) -> dict:
+        """
+        The method groups planned moves by their destination directory,
+        so every directory is created and filled in one batch.
+
+        :return: dict where keys are destination directories and values are lists of move operations
+        :rtype: dict
+        """
+        batches = {}
+        for operation in self.of_kind("move"):
+            batches.setdefault(os.path.dirname(operation.destination), []).append(
+                operation
+            )
+        return batches
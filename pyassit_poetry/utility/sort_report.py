@@ -0,0 +1,257 @@
+import json
+import time
+import threading
+from pathlib import Path
+from datetime import datetime
+
+
+class SortReport:
+    """
+    Class for the report of a sorting run, streamed as JSON Lines (one event per line) through a single buffered file handle.
+
+    The run starts with a "start" event, every executed operation is written as an event of its kind
+    (move, link, keep, extract, rename, rmdir) and the run ends with a "summary" event
+    with per-category counts and bytes. Extractions of archives are summarized separately (their throughput
+    does not depend on the moves), with the number of failed extractions, and so are the directories
+    and files excluded by the ignore rules (the walking saved by pruning).
+    Only the counters are kept in memory, the events are not.
+
+    Args:
+        file_path (Path): path to the JSON Lines report file (events are appended)
+        sorted_path (str): path to the sorted directory
+        buffer_size (int): size of the file buffer in bytes
+    """
+
+    _last_run_id = ""
+    _run_id_lock = threading.Lock()
+
+    def __init__(self, file_path: Path, sorted_path: str, buffer_size=1 << 20):
+        self.file_path = Path(file_path)
+        self.sorted_path = sorted_path
+        self.buffer_size = buffer_size
+        self.run_id = self._new_run_id()
+        self.categories = {}
+        self.operations = {}
+        self.archives = {
+            "extracted": 0,
+            "failed": 0,
+            "members": 0,
+            "bytes": 0,
+            "archive_bytes": 0,
+            "seconds": 0.0,
+        }
+        # directories (pruned subtrees) and files excluded from the run by the ignore rules
+        self.excluded = {"directories": 0, "files": 0}
+        self._lock = threading.Lock()
+        self._fh = None
+        self._start_time = None
+
+    def __enter__(self):
+        self._fh = open(
+            self.file_path, "a", buffering=self.buffer_size, encoding="utf-8"
+        )
+        self._start_time = time.perf_counter()
+        self._write(
+            {
+                "event": "start",
+                "run": self.run_id,
+                "path": self.sorted_path,
+                "time": datetime.now().isoformat(timespec="seconds"),
+            }
+        )
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        summary = self.summary()
+        if exc_type is not None:
+            summary["error"] = f"{exc_type.__name__}: {exc_value}"
+        self._write(summary)
+        self._fh.close()
+        self._fh = None
+
+    @classmethod
+    def _new_run_id(cls) -> str:
+        # run ids name the journals, so runs started at the same time (e.g. sorts of several folders) get different ones
+        with cls._run_id_lock:
+            run_id = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+            while run_id <= cls._last_run_id:
+                run_id = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+            cls._last_run_id = run_id
+            return run_id
+
+    def _write(self, event: dict):
+        self._fh.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+    def add(self, operation, extraction=None):
+        """
+        The method writes the event of an executed operation (thread-safe).
+
+        :param operation: executed operation
+        :type operation: SortOperation
+        :param extraction: result of the extraction of an archive (see extract_archive)
+        :type extraction: dict
+        """
+        event = {"event": operation.kind, "source": operation.source}
+        if operation.destination is not None:
+            event["destination"] = operation.destination
+        if operation.category is not None:
+            event["category"] = operation.category
+            event["extension"] = operation.extension
+            event["size"] = operation.size or 0
+        if operation.original is not None:
+            event["original"] = operation.original.destination
+        if extraction is not None:
+            event.update(extraction)
+        with self._lock:
+            self.operations[operation.kind] = self.operations.get(operation.kind, 0) + 1
+            # only file operations are counted in categories (extractions are counted as operations)
+            if operation.category is not None and operation.kind != "extract":
+                counters = self.categories.setdefault(
+                    operation.category, {"files": 0, "bytes": 0}
+                )
+                counters["files"] += 1
+                counters["bytes"] += operation.size or 0
+            if extraction is not None:
+                archives = self.archives
+                archives["failed" if extraction["error"] else "extracted"] += 1
+                archives["members"] += extraction["members"]
+                archives["bytes"] += extraction["bytes"]
+                archives["archive_bytes"] += extraction["archive_size"]
+                archives["seconds"] += extraction["seconds"]
+            self._write(event)
+
+    def summary(self) -> dict:
+        summary = {
+            "event": "summary",
+            "run": self.run_id,
+            "path": self.sorted_path,
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "elapsed": round(time.perf_counter() - self._start_time, 3),
+            "operations": self.operations,
+            "categories": self.categories,
+        }
+        if self.excluded["directories"] or self.excluded["files"]:
+            summary["excluded"] = self.excluded
+        archives = self.archives
+        if archives["extracted"] or archives["failed"]:
+            # throughput of the extraction workers: extracted bytes per second of extraction
+            summary["archives"] = {
+                **archives,
+                "seconds": round(archives["seconds"], 3),
+                "mb_per_sec": (
+                    round(archives["bytes"] / 1_000_000 / archives["seconds"], 3)
+                    if archives["seconds"]
+                    else 0.0
+                ),
+            }
+        return summary
+
+    @staticmethod
+    def roll(file_path: Path, max_size=64 << 20, backups=3):
+        """
+        The method rolls the report file over when it is bigger than max_size
+        (sort_report.jsonl -> sort_report.jsonl.1 -> ... -> sort_report.jsonl.<backups>, the oldest one is removed).
+
+        :param file_path: path to the JSON Lines report file
+        :type file_path: Path
+        :param max_size: size of the file in bytes above which it is rolled over
+        :type max_size: int
+        :param backups: number of kept old report files
+        :type backups: int
+        """
+        file_path = Path(file_path)
+        try:
+            if file_path.stat().st_size <= max_size:
+                return
+        except FileNotFoundError:
+            return
+        for i in range(backups - 1, 0, -1):
+            backup = file_path.with_name(f"{file_path.name}.{i}")
+            if backup.exists():
+                backup.replace(file_path.with_name(f"{file_path.name}.{i + 1}"))
+        file_path.replace(file_path.with_name(f"{file_path.name}.1"))
+
+    @staticmethod
+    def render(file_path: Path, text_path: Path, run_id=None, append=False):
+        """
+        The method renders a human-readable report of a run from the JSON Lines report.
+
+        :param file_path: path to the JSON Lines report file
+        :type file_path: Path
+        :param text_path: path to the text file to which the report is saved
+        :type text_path: Path
+        :param run_id: id of the run to render (default: the last run in the file)
+        :type run_id: str
+        :param append: append the report to the text file (e.g. a section per sorted folder) instead of overwriting it
+        :type append: bool
+        """
+        run = None
+        files = {}
+        extensions = {}
+        failed = []
+        summary = None
+        with open(file_path, encoding="utf-8") as fh:
+            for line in fh:
+                event = json.loads(line)
+                if event["event"] == "start":
+                    if run_id is not None and run == run_id:
+                        break
+                    run = event["run"]
+                    start = event
+                    files, extensions, failed, summary = {}, {}, [], None
+                elif event["event"] == "summary":
+                    summary = event
+                elif event["event"] == "extract" and event.get("error"):
+                    failed.append(f"{event['source']}: {event['error']}")
+                elif "category" in event and event["event"] != "extract":
+                    category = event["category"]
+                    extensions.setdefault(category, set()).add(event["extension"])
+                    entry = event["source"]
+                    if "destination" in event:
+                        entry += f" has moved to: {event['destination']}"
+                    if "original" in event:
+                        entry += f" (duplicate of: {event['original']})"
+                    files.setdefault(category, []).append(entry)
+        if run is None or (run_id is not None and run != run_id):
+            raise ValueError(f"there is no run {run_id or ''} in the report")
+
+        with open(text_path, "a" if append else "w", encoding="utf-8") as fo:
+            fo.write(
+                f"{3*'>'} Activity report for directory: {start['path']} - {start['time']} (run {run}):\n"
+            )
+            if not files:
+                fo.write("Nothing to sort.\n")
+            else:
+                fo.write(f"Extensions of checked files by category:\n")
+                for category, values in extensions.items():
+                    fo.write(f"{category}: {' | '.join(sorted(values))};\n")
+                fo.write(f"\nFiles sorted by category:\n")
+                for category, entries in files.items():
+                    fo.write(f"{category}:\n")
+                    for entry in entries:
+                        fo.write(f"{entry};\n")
+            if failed:
+                fo.write(f"\nArchives which could not be extracted:\n")
+                for entry in failed:
+                    fo.write(f"{entry};\n")
+            if summary is not None:
+                fo.write(f"\nSummary ({summary['elapsed']} s):\n")
+                for category, counters in summary["categories"].items():
+                    fo.write(
+                        f"{category}: {counters['files']} files, {counters['bytes']} bytes;\n"
+                    )
+                if "archives" in summary:
+                    archives = summary["archives"]
+                    fo.write(
+                        f"archives extracted: {archives['extracted']} ({archives['failed']} failed), "
+                        f"{archives['members']} members, {archives['bytes']} bytes in {archives['seconds']} s "
+                        f"({archives['mb_per_sec']} MB/s);\n"
+                    )
+                if "excluded" in summary:
+                    fo.write(
+                        f"excluded: {summary['excluded']['directories']} directories (not scanned), "
+                        f"{summary['excluded']['files']} files;\n"
+                    )
+                if "error" in summary:
+                    fo.write(f"Run interrupted by error: {summary['error']}\n")
+            fo.write(f"{20*'-'}\n")
@@ -0,0 +1,155 @@
+import os
+import time
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utility.sort_report import SortReport
+
+
+class SortScheduler:
+    """
+    Class for sorting several independent directories (e.g. drop folders on different disks) in one run.
+
+    Every root is sorted by its own FileSorter (made by sorter_factory), in a thread of a global pool.
+    A root waits for a free slot of its device (st_dev of the root) - at most per_device roots of one device
+    are sorted at the same time, so roots on one slow disk do not compete for it, while roots on other disks go on.
+    Each root is a separate run in the report: its events are written to a part file which is appended
+    to the report file as a whole when the root is done, so the sections of the roots are not mixed.
+    The run ends with a throughput summary of every root and of all of them together.
+
+    Args:
+        sorter_factory (callable): function returning a new FileSorter (sorters are not shared between roots)
+        per_device (int): maximum number of roots of one device sorted at the same time
+        max_parallel (int): maximum number of roots sorted at the same time (default: all of them)
+    """
+
+    def __init__(self, sorter_factory, per_device=1, max_parallel=None) -> None:
+        if per_device < 1:
+            raise ValueError("number of roots per device must be at least 1")
+        self.sorter_factory = sorter_factory
+        self.per_device = per_device
+        self.max_parallel = max_parallel
+        self._devices = {}
+        self._lock = threading.Lock()
+
+    def _device_slots(self, device: int) -> threading.Semaphore:
+        with self._lock:
+            slots = self._devices.get(device)
+            if slots is None:
+                slots = self._devices[device] = threading.Semaphore(self.per_device)
+            return slots
+
+    @staticmethod
+    def check_roots(paths: list) -> list:
+        """
+        The method checks the roots to sort: they must be existing directories and none can be inside another one.
+
+        :param paths: paths to the directories
+        :type paths: list
+        :raise ValueError: if a path is not a directory or the roots overlap
+        :return: absolute paths to the roots (without repetitions)
+        :rtype: list
+        """
+        roots = list(dict.fromkeys(os.path.abspath(path) for path in paths))
+        for root in roots:
+            if not os.path.isdir(root):
+                raise ValueError(f'"{root}" is not a proper folder path')
+        for root in roots:
+            for other in roots:
+                if other != root and other.startswith(root.rstrip(os.sep) + os.sep):
+                    raise ValueError(f'"{other}" is inside "{root}"')
+        return roots
+
+    def _sort_root(self, root: str, number: int) -> dict:
+        sorter = self.sorter_factory()
+        report_file_path = sorter.report_file_path
+        # the events of the root are collected in a part file and appended to the report in one piece
+        sorter.report_file_path = report_file_path.with_name(
+            f"{report_file_path.name}.{number}.part"
+        )
+        result = {"path": root, "run": None, "error": None}
+        with self._device_slots(os.stat(root).st_dev):
+            start_time = time.perf_counter()
+            try:
+                plan = sorter.plan(root)
+                report = sorter.apply(plan, root)
+                result["run"] = report.run_id
+                result["files"] = sum(
+                    counters["files"] for counters in report.categories.values()
+                )
+                result["bytes"] = sum(
+                    counters["bytes"] for counters in report.categories.values()
+                )
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+            finally:
+                result["elapsed"] = time.perf_counter() - start_time
+                if sorter.report_file_path.exists():
+                    with self._lock:
+                        with open(sorter.report_file_path, "rb") as fh, open(
+                            report_file_path, "ab"
+                        ) as fo:
+                            shutil.copyfileobj(fh, fo)
+                    os.remove(sorter.report_file_path)
+                sorter.report_file_path = report_file_path
+        result["sorter"] = sorter
+        return result
+
+    def run(self, paths: list, text_report=False) -> str:
+        """
+        The method sorts the directories and returns the summary of the run.
+
+        :param paths: paths to the directories to sort
+        :type paths: list
+        :param text_report: also render the text report (a section per root and the throughput summary)
+        :type text_report: bool
+        :raise ValueError: if a path is not a directory or the roots overlap
+        :rtype: str
+        """
+        roots = self.check_roots(paths)
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(
+            max_workers=self.max_parallel or len(roots)
+        ) as executor:
+            results = list(executor.map(self._sort_root, roots, range(len(roots))))
+        elapsed = time.perf_counter() - start_time
+        lines = [self._throughput(result) for result in results]
+        done = [result for result in results if result["error"] is None]
+        total = {
+            "path": f"all {len(roots)} folders",
+            "files": sum(result["files"] for result in done),
+            "bytes": sum(result["bytes"] for result in done),
+            "elapsed": elapsed,
+            "error": None,
+        }
+        lines.append(self._throughput(total))
+        sorter = results[0]["sorter"]
+        message = "\n".join(lines) + f"\nReport file is here: {sorter.report_file_path}"
+        if text_report:
+            for i, result in enumerate(done):
+                SortReport.render(
+                    sorter.report_file_path,
+                    sorter.text_report_path,
+                    result["run"],
+                    append=i > 0,
+                )
+            with open(
+                sorter.text_report_path, "a" if done else "w", encoding="utf-8"
+            ) as fo:
+                fo.write("Throughput:\n" + "".join(f"{line};\n" for line in lines))
+            message += f"\nText report is here: {sorter.text_report_path}"
+        return message
+
+    @staticmethod
+    def _throughput(result: dict) -> str:
+        if result["error"] is not None:
+            return f"{result['path']}: not sorted - {result['error']}"
+        elapsed = max(result["elapsed"], 1e-9)
+        line = (
+            f"{result['path']}: {result['files']} files, {result['bytes'] / 1_000_000:.1f} MB in {result['elapsed']:.2f} s "
+            f"({result['files'] / elapsed:.0f} files/s, {result['bytes'] / 1_000_000 / elapsed:.1f} MB/s)"
+        )
+        if result.get("run") is not None:
+            line += f", run id: {result['run']}"
+        return line
@@ -1,194 +1,587 @@
 import os
+import time
 import shutil
-import re
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
 from pathlib import Path
-from datetime import datetime
+
+from utility.sort_plan import SortOperation, SortPlan
+from utility.name_allocator import NameAllocator
+from utility.file_mover import FileMover
+from utility.duplicate_finder import DuplicateFinder
+from utility.sort_report import SortReport
+from utility.sort_index import SortIndex
+from utility.folder_watcher import FolderWatcher
+from utility.category_rules import CategoryRules
+from utility.sort_journal import SortJournal
+from utility.sort_metrics import SortMetrics
+from utility.archive_extractor import ArchiveExtractor, archive_format, archive_stem
+from utility.name_normalizer import normalize_name, NORMALIZATION_VERSION
+from utility.ignore_rules import IgnoreRules
 
 
 class FileSorter:
-    def __init__(self) -> None:
+    DEDUPE_MODES = ("hardlink", "move", "skip")
+    JOURNALS_KEPT = 20
+
+    def __init__(
+        self,
+        workers=1,
+        dedupe=None,
+        incremental=True,
+        sniff=False,
+        rules=None,
+        metrics=None,
+        extractor=None,
+        exclude=(),
+    ) -> None:
+        # number of threads used to scan directories and move files (1 - serial sorting)
+        self.workers = workers
+        # what to do with duplicates of already sorted files: replace with a hardlink, move to the duplicates folder or skip
+        # (None - duplicates are sorted as any other file)
+        if dedupe is not None and dedupe not in self.DEDUPE_MODES:
+            raise ValueError(f"unknown dedupe mode: {dedupe}")
+        self.dedupe = dedupe
+        # rules assigning files to categories (with sniffing of the content of files with unknown extensions if sniff)
+        self.rules = rules or CategoryRules(sniff=sniff)
+        self.excluded_folders = list(self.rules.categories)
+        if dedupe == "move":
+            self.excluded_folders.append("duplicates")
+        # gitignore-style patterns of files and directories left out of sorting (added to the .sortignore of the sorted directory)
+        self.exclude = list(exclude)
+        self.duplicates_size = 0
+        # archives are extracted by a pool of worker processes, within the limits of the extractor
+        self.extractor = extractor or ArchiveExtractor()
+        # registry of names taken in destination directories (including names chosen, but not yet created on disk)
+        self._names = NameAllocator()
+        # moves files with os.rename on the same device and by copying across devices (category folders on another mount)
+        self._mover = FileMover()
         if not Path.exists(Path.home().joinpath("PyAssist")):
             os.mkdir(Path.home().joinpath("PyAssist"))
-        self.report_file_path = Path.home().joinpath("PyAssist/sort_report.txt")
-        print(self.report_file_path)
-
-        # auxiliary dictionaries to store data on processed files
-        self.extensions = {
-            "images": set(),
-            "documents": set(),
-            "audio": set(),
-            "video": set(),
-            "archives": set(),
-            "unsorted": set(),
-        }
-        self.paths = {
-            "images": [],
-            "documents": [],
-            "audio": [],
-            "video": [],
-            "archives": [],
-            "unsorted": [],
-        }
+        # the report is streamed as JSON Lines (one event per operation), the text report is rendered from it on demand
+        self.report_file_path = Path.home().joinpath("PyAssist/sort_report.jsonl")
+        self.text_report_path = Path.home().joinpath("PyAssist/sort_report.txt")
+        # journals of sorting runs (one file per run, named by the run id), the last JOURNALS_KEPT are kept
+        self.journal_path = Path.home().joinpath("PyAssist/journal")
+        os.makedirs(self.journal_path, exist_ok=True)
+        # directories which have not changed since the last sort are skipped (the index is updated after every sort anyway)
+        self.incremental = incremental
+        self.index = SortIndex(
+            Path.home().joinpath("PyAssist/sort_index.sqlite3"),
+            self._index_fingerprint(),
+        )
+        # in watch mode empty directories are not removed (new directories are empty before files are copied into them)
+        self._watching = False
+        # counters, latencies and phase times of all the runs of the sorter
+        self.metrics = metrics or SortMetrics()
 
-    def _sort_folder(self, path: str):
+    def plan(self, path: str, folders=None, busy=()) -> SortPlan:
         """
-        The method sorts files in the directory given as an argument and recursively its subdirectories (excluding excluded e.g. documents).
+        The method walks the directory given as an argument and recursively its subdirectories (excluding excluded e.g. documents)
+        and plans all the operations of sorting, without changing anything on disk.
         Empty directories are deleted.
         File names are normalized (all characters other than letters and numbers and _ ) are replaced with: _ .
         If a file or directory with the given name already exists, the character _n (where n is the next number) is added to the name.
         Files with specified extensions are moved to appropriate (created as needed) directories in the directory in which they are located
         (e.g., files with .doc extensions are moved to the documents folder, files with .zip extensions are moved to the archives directory, etc.)
-        Files with unknown extensions are not moved, but have a normalized name.
+        Files with unknown extensions are not moved, but have a normalized name (unless their category is sniffed from their content).
         Archives, after being moved to the archives directory, are unzipped to the directory with the name of the archive being unzipped
-        (without the extension).
-        For each directory, the function saves in the report file (whose name is passed as the second argument), the results of its work.
+        (without the extension, e.g. .tar.gz), if their format is supported (see ArchiveExtractor).
+
+        Directories to which files with given extensions are moved are defined by the category rules
+        (see CategoryRules and data/sort_categories.json), e.g.:
+        images -> .jpeg | .png | .jpg | .svg | .webp | .heic | ...
+        video -> .avi | .mp4 | .mov | .mkv | ...
+        documents -> .doc | .docx | .txt | .pdf | .xlsx | .pptx | ...
+        audio -> .mp3 | .ogg | .wav | .amr | .flac | ...
+        archives -> .zip | .gz | .tar | .7z | ...
 
-        Directories to which files with given extensions are moved:
-        images -> .jpeg | .png | .jpg | .svg
-        video -> .avi | .mp4 | .mov | .mkv
-        documents -> .doc | .docx | .txt | .pdf | .xlsx | .pptx
-        audio -> .mp3 | .ogg | .wav | .amr
-        archives -> .zip | .gz | .tar
+        With more than one worker, subdirectories are scanned by a pool of self.workers threads.
+        In incremental mode, directories which have not changed since the last sort (see SortIndex) are not listed again.
+        Files and directories matching the .sortignore file of the sorted directory or the exclude patterns
+        (see IgnoreRules) are not touched, excluded directories are not even scanned.
 
         :param path: string with path to directory to be sorted
         :type path: str
-        :param report_file_path: name of report file
-        :type report_file_path: str
+        :param folders: directories of the tree to sort (with their subdirectories), instead of the whole tree
+        :type folders: iterable
+        :param busy: paths to files which are still being written (they are left where they are)
+        :type busy: iterable
         :raise FileNotFoundError: if source path lead to non-existing directory
         :raise NotADirectoryError: if source path lead to file
-        :raise FileExistsError: if too many files versions (over 1 000 000) exists in folder
+        :rtype: SortPlan
+        """
+        with self.metrics.phase("plan"):
+            try:
+                return self._plan(path, folders, busy)
+            except Exception:
+                self.metrics.count("errors")
+                raise
+
+    def _plan(self, path: str, folders, busy) -> SortPlan:
+        self._names = NameAllocator()
+        # index keys are absolute paths
+        path = os.path.abspath(path)
+        self._root_path = path
+        self._skipped = set()
+        self._stale = set()
+        # directories which are listed even if the index says they have not changed
+        # and directories with busy files (they are not indexed, so they are sorted again next time)
+        self._forced = set(folders or ())
+        self._busy = set(busy)
+        self._incomplete = set()
+        self._ignore = IgnoreRules.for_directory(path, self.exclude)
+        # True for every excluded directory, False for every excluded file
+        self._excluded = []
+        if folders is None:
+            starts = [path]
+        else:
+            # subdirectories of other sorted directories are sorted with them
+            starts = sorted(
+                folder_path
+                for folder_path in self._forced
+                if not any(
+                    parent in self._forced for parent in self._parents(folder_path)
+                )
+            )
+        self.index.load(path, self._ignore.fingerprint)
+        # scans of directories (by their path after renaming), with ("dir") operations pointing to their subdirectories
+        scans = {}
+        if self.workers > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                pending = {
+                    executor.submit(self._scan_folder, start, start): start
+                    for start in starts
+                }
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        folder_path = pending.pop(future)
+                        scans[folder_path] = future.result()
+                        for operation in scans[folder_path] or ():
+                            if operation.kind == "dir":
+                                future = executor.submit(
+                                    self._scan_folder,
+                                    operation.source,
+                                    operation.destination,
+                                )
+                                pending[future] = operation.destination
+        else:
+            pending = [(start, start) for start in starts]
+            while pending:
+                real_path, folder_path = pending.pop()
+                scans[folder_path] = self._scan_folder(real_path, folder_path)
+                pending.extend(
+                    (operation.source, operation.destination)
+                    for operation in scans[folder_path] or ()
+                    if operation.kind == "dir"
+                )
+        operations = []
+        for start in starts:
+            operations.extend(self._flatten(start, scans))
+        if self.dedupe:
+            with self.metrics.phase("dedupe"):
+                self._plan_duplicates(operations)
+        plan = SortPlan(path, operations)
+        # directories listed during planning with their subdirectories which will be left after the sort
+        plan.scanned = {
+            folder_path: [
+                operation.destination
+                for operation in folder_operations
+                if operation.kind == "dir" and scans[operation.destination] is not None
+            ]
+            for folder_path, folder_operations in scans.items()
+            if folder_operations is not None
+            and folder_path not in self._skipped
+            and folder_path not in self._incomplete
+        }
+        plan.stale = self._stale
+        plan.excluded = {
+            "directories": sum(self._excluded),
+            "files": len(self._excluded) - sum(self._excluded),
+        }
+        return plan
+
+    def _parents(self, path: str):
+        # yields the parent directories of path up to the sorted directory
+        while path != self._root_path:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return
+            path = parent
+            yield path
+
+    def _flatten(self, path: str, scans: dict) -> list:
+        """
+        The method orders operations as in a serial, depth-first sort: subdirectory operations in place of the subdirectory.
+        The tree is walked with an explicit stack, so its depth is not limited by the Python recursion limit.
+        Empty subdirectories (scanned as None) are removed instead of being sorted (and renamed).
+
+        :param path: path to the sorted directory
+        :type path: str
+        :param scans: dict where keys are paths to directories and values are lists of their operations
+        :type scans: dict
+        :rtype: list
+        """
+        operations = []
+        stack = [(path, iter(scans[path] or ()))]
+        while stack:
+            folder_path, folder_operations = stack[-1]
+            for operation in folder_operations:
+                if operation.kind != "dir":
+                    operations.append(operation)
+                elif scans[operation.destination] is not None:
+                    stack.append(
+                        (operation.destination, iter(scans[operation.destination]))
+                    )
+                    break
+                # removal of empty directories
+                elif (
+                    operations
+                    and operations[-1].kind == "rename"
+                    and operations[-1].destination == operation.destination
+                ):
+                    operations.append(SortOperation("rmdir", operations.pop().source))
+                else:
+                    operations.append(SortOperation("rmdir", operation.destination))
+            else:
+                stack.pop()
+                operations.append(SortOperation("done", folder_path))
+        return operations
+
+    def _scan_folder(self, real_path: str, path: str) -> list:
+        """
+        The method plans the operations for the entries of one directory.
+
+        :param real_path: current path to the directory on disk
+        :type real_path: str
+        :param path: path to the directory after the planned renames of its parent directories
+        :type path: str
+        :return: list of SortOperation objects in scandir order, with ("dir", real path, path) operations for subdirectories to sort
+            or None if the directory is empty
+        :rtype: list
         """
-        # list of files and directories located in a given directory
-        files = list(os.scandir(path))
+        try:
+            stat = os.stat(real_path)
+        except FileNotFoundError:
+            # an indexed directory which no longer exists
+            self._stale.add(path)
+            return []
+        if self.incremental and real_path == path and path not in self._forced:
+            subdirectories = self.index.unchanged(path, stat)
+            if subdirectories is not None:
+                self._skipped.add(path)
+                return [
+                    SortOperation("dir", subdirectory, subdirectory)
+                    for subdirectory in subdirectories
+                    if os.path.basename(subdirectory) not in self.excluded_folders
+                    and not self._ignore.excluded(
+                        IgnoreRules.relative_path(self._root_path, subdirectory), True
+                    )
+                ]
+        start_time = time.perf_counter()
+        operations = []
+        # list of files and directories located in a given directory (the only scandir call for the directory,
+        # whether a subdirectory is empty is known after its own scan)
+        with os.scandir(real_path) as entries:
+            files = list(entries)
+        self.metrics.count("directories")
+        if not files and path != self._root_path and not self._watching:
+            self.metrics.observe("scan", time.perf_counter() - start_time)
+            return None
+        # path of the directory on disk relative to the sorted directory, for the ignore rules
+        relative_path = IgnoreRules.relative_path(self._root_path, real_path)
         for file in files:
-            # I check if it's a directory, if so I normalize its name and recursively call the sort_folde function
-            if file.is_dir():
-                # removal of empty directoriesw
-                temp_list = list(os.scandir(file.path))
-                if len(temp_list) == 0:
-                    os.rmdir(file.path)
-                # skip directories which are excluded from sorting
-                if not file.name in [
-                    "images",
-                    "video",
-                    "documents",
-                    "audio",
-                    "archives",
-                ]:
+            is_dir = file.is_dir()
+            # excluded files are left alone and excluded directories are pruned (never scanned)
+            if self._ignore.excluded(
+                f"{relative_path}/{file.name}" if relative_path else file.name, is_dir
+            ):
+                self._excluded.append(is_dir)
+                self.metrics.count("excluded")
+                continue
+            # I check if it's a directory, if so I normalize its name and add it to directories to sort
+            if is_dir:
+                # skip directories which are excluded from sorting (they are never opened)
+                if not file.name in self.excluded_folders:
                     dir_name = self._normalize(file.name)
-                    dir_path = os.path.join(path, dir_name)  # Path(path, dir_name)
-                    # I check if there was a change in the directory name after using the normalize function, and if so I move the contents to the directory with the new name
+                    dir_path = os.path.join(path, dir_name)
+                    # I check if there was a change in the directory name after using the normalize function, and if so I plan to rename the directory
                     if dir_name != file.name:
-                        # I check if a directory does not already exist that would conflict with the new name, if so I add a numbered version
-                        for entry in files:
-                            if dir_name == entry.name:
-                                dir_path = self._set_dest_path(
-                                    os.path.join(path, dir_name)
-                                )
-
-                        # I move the contents of the renamed directory
-                        try:
-                            os.renames(os.path.join(path, file.name, dir_path))
-                        except FileExistsError:
-                            print(
-                                f"Directory {dir_name} has not been copied, because too many directories with that name already exist."
+                        # if a directory with the new name already exists, a numbered version is used
+                        dir_path = self._set_dest_path(path, dir_name, "", real_path)
+                        operations.append(
+                            SortOperation(
+                                "rename", os.path.join(path, file.name), dir_path
                             )
-                            continue
+                        )
+                    operations.append(SortOperation("dir", file.path, dir_path))
 
-                    # recursive function call for non-empty directories
-                    self._sort_folder(dir_path)
+            # files which are still being written are sorted later
+            elif file.path in self._busy:
+                self._incomplete.add(path)
 
             # file operations
             else:
-                file_name, ext = os.path.splitext(file.name)
+                file_name, suffix = self._split_name(file.name)
                 file_name = self._normalize(file_name)
-                file_type = ""
-                match ext:
-                    case ".jpeg" | ".png" | ".jpg" | ".svg":
-                        file_type = "images"
-                    case ".avi" | ".mp4" | ".mov" | ".mkv":
-                        file_type = "video"
-                    case ".doc" | ".docx" | ".txt" | ".pdf" | ".xlsx" | ".pptx":
-                        file_type = "documents"
-                    case ".mp3" | ".ogg" | ".wav" | ".amr":
-                        file_type = "audio"
-                    case ".zip" | ".gz" | ".tar":
-                        file_type = "archives"
-                        # archive is immediately extracted to the folder: archives/"archive name without extension"
-                        shutil.unpack_archive(
-                            os.path.join(path, file.name),
-                            os.path.join(path, file_type, file_name),
-                        )
-                    case _:
-                        file_type = "unsorted"
+                ext = os.path.splitext(file.name)[1]
+                file_type = self.rules.category(
+                    ext, file.path, file.stat() if self.rules.sniff else None
+                )
 
-                # I move files (except those with unaccounted-for extensions) to the appropriate directories
-                if file_type != "unsorted":
-                    dest_path = self._set_dest_path(
-                        os.path.join(path, file_type), file_name, ext
+                source_path = os.path.join(path, file.name)
+                # files with unaccounted-for extensions are not moved
+                if file_type == "unsorted":
+                    operations.append(
+                        SortOperation(
+                            "keep",
+                            source_path,
+                            None,
+                            file_type,
+                            ext,
+                            file.stat().st_size,
+                        )
+                    )
+                    continue
+                dest_path = self._set_dest_path(
+                    os.path.join(path, file_type),
+                    file_name,
+                    suffix,
+                    os.path.join(real_path, file_type),
+                )
+                operations.append(
+                    SortOperation(
+                        "move",
+                        source_path,
+                        dest_path,
+                        file_type,
+                        ext,
+                        file.stat().st_size,
+                        file.path,
                     )
-                    try:
-                        os.renames(os.path.join(path, file.name), dest_path)
-                    except FileExistsError:
-                        print(
-                            f"File {file_name}{ext} has not been copied, because too many files with that name already exist in the destination directory."
+                )
+                # archive is extracted (after it is moved) to the folder: archives/"archive name without extension"
+                if file_type == "archives" and archive_format(file.name):
+                    operations.append(
+                        SortOperation(
+                            "extract",
+                            dest_path,
+                            os.path.join(
+                                path,
+                                file_type,
+                                self._normalize(archive_stem(file.name)),
+                            ),
+                            file_type,
+                            ext,
+                            file.stat().st_size,
                         )
-                        continue
+                    )
+        self.metrics.count(
+            "scanned",
+            sum(operation.kind in ("move", "keep") for operation in operations),
+        )
+        self.metrics.observe("scan", time.perf_counter() - start_time)
+        return operations
 
-                # adds information about the paths of processed files and their extensions to dicts paths and extensions
-                if self.paths.get(file_type) != None:
-                    temp_list = self.paths.get(file_type)
-                    if file_type == "unsorted":
-                        temp_list.append(os.path.join(path, file_type, file.name))
-                    else:
-                        temp_list.append(
-                            f"{os.path.join(path, file_type, file.name)} has moved to: {dest_path}"
-                        )
-                    self.paths.update({file_type: temp_list})
-                if self.extensions.get(file_type) != None:
-                    temp_set = self.extensions.get(file_type)
-                    temp_set.add(ext)
-                    self.extensions.update({file_type: temp_set})
+    def _plan_duplicates(self, operations: list):
+        """
+        The method finds files which are identical to files moved earlier in the plan
+        and changes their operations according to the dedupe mode.
+        Archives which are duplicates are not extracted again.
+
+        :param operations: list of planned operations
+        :type operations: list
+        """
+        duplicates = DuplicateFinder(self.workers).find(
+            [
+                (i, operation.real_source, operation.size)
+                for i, operation in enumerate(operations)
+                if operation.kind == "move"
+            ]
+        )
+        # planned destinations of duplicates (extractions of archives start there)
+        duplicate_destinations = set()
+        for i, original in duplicates.items():
+            operation = operations[i]
+            operation.original = operations[original]
+            operation.category = "duplicates"
+            duplicate_destinations.add(operation.destination)
+            if self.dedupe == "hardlink":
+                operation.kind = "link"
+            elif self.dedupe == "move":
+                folder_path = os.path.dirname(operation.source)
+                file_name, suffix = self._split_name(os.path.basename(operation.source))
+                operation.destination = self._set_dest_path(
+                    os.path.join(folder_path, "duplicates"),
+                    self._normalize(file_name),
+                    suffix,
+                    os.path.join(os.path.dirname(operation.real_source), "duplicates"),
+                )
+            else:
+                operation.kind = "keep"
+                operation.destination = None
+        operations[:] = [
+            operation
+            for operation in operations
+            if not (
+                operation.kind == "extract"
+                and operation.source in duplicate_destinations
+            )
+        ]
+
+    def execute(self, plan: SortPlan, report=None, journal=None):
+        """
+        The method applies the planned operations: directories are renamed (parents before their subdirectories)
+        and empty directories removed first, then files are moved in batches -
+        one batch per destination directory, which is created once per batch.
+        With more than one worker, the batches are moved by a pool of self.workers threads.
+        Every archive is queued for extraction in the pool of processes of self.extractor as soon as it is moved,
+        so extraction runs alongside the moves and the results are collected at the end.
+        An archive which cannot be extracted (e.g. it breaks a limit) is reported with the error, sorting goes on.
+        Every operation is written to the report as soon as it is done.
+        If a journal is given, all the operations are written to it before the first one is executed
+        and every operation is marked in it as done after it is executed.
+
+        :param plan: plan created by the plan method
+        :type plan: SortPlan
+        :param report: report of the run (nothing is reported if None)
+        :type report: SortReport
+        :param journal: journal of the run (nothing is journaled if None)
+        :type journal: SortJournal
+        """
+        with self.metrics.phase("execute"):
+            try:
+                self._execute(plan, report or _NoReport(), journal or _NoJournal())
+            except Exception:
+                self.metrics.count("errors")
+                raise
+
+    def _execute(self, plan: SortPlan, report, journal):
+        self.metrics.add_total(len(plan))
+        self._mover.reset()
 
-        self._create_report(path)
+        def done(operation, start_time):
+            self.metrics.operation(operation, time.perf_counter() - start_time)
+            journal.done((operation,))
+            report.add(operation)
+
+        batches = plan.moves_by_directory()
+        journal.write_plan(
+            plan.path,
+            plan.of_kind("rename")
+            + plan.of_kind("rmdir")
+            + [operation for batch in batches.values() for operation in batch]
+            + plan.of_kind("link")
+            + plan.of_kind("extract"),
+        )
+        for operation in plan.of_kind("rename"):
+            start_time = time.perf_counter()
+            os.rename(operation.source, operation.destination)
+            done(operation, start_time)
+        for operation in plan.of_kind("rmdir"):
+            start_time = time.perf_counter()
+            os.rmdir(operation.source)
+            done(operation, start_time)
+        with self.extractor as extractor:
+            # extractions of archives which have not been moved yet (by the paths of the moved archives)
+            waiting = {
+                operation.source: operation for operation in plan.of_kind("extract")
+            }
+            extractions = {}
+
+            def extract(operation):
+                extractions[
+                    extractor.submit(operation.source, operation.destination)
+                ] = operation
+
+            def moved(operation, start_time):
+                done(operation, start_time)
+                # the archive is queued for extraction as soon as it is in place
+                extraction = waiting.pop(operation.destination, None)
+                if extraction is not None:
+                    extract(extraction)
+
+            # archives which are already in place (e.g. moved before a resumed run was interrupted) are extracted right away
+            moving = {operation.destination for operation in plan.of_kind("move")}
+            for source in [source for source in waiting if source not in moving]:
+                extract(waiting.pop(source))
+            if self.workers > 1:
+                with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                    for _ in executor.map(
+                        lambda batch: self._move_batch(batch, moved), batches.items()
+                    ):
+                        pass
+            else:
+                for batch in batches.items():
+                    self._move_batch(batch, moved)
+            # duplicates are linked when their originals are already in place
+            for operation in plan.of_kind("link"):
+                start_time = time.perf_counter()
+                self._mover.make_dirs(os.path.dirname(operation.destination))
+                try:
+                    os.link(operation.original.destination, operation.destination)
+                    os.unlink(operation.source)
+                except OSError:
+                    # hardlinks are not possible e.g. between file systems, the duplicate is moved like any other file
+                    self._move_file(operation.source, operation.destination)
+                done(operation, start_time)
+            # time spent waiting for the extractions which have not finished during the moves
+            with self.metrics.phase("extract"):
+                for future in as_completed(extractions):
+                    operation = extractions[future]
+                    result = future.result()
+                    if result["error"] is not None:
+                        self.metrics.count("errors")
+                    # the latency of an extraction is its time in the worker process
+                    self.metrics.operation(operation, result["seconds"])
+                    journal.done((operation,))
+                    report.add(operation, result)
+        for operation in plan.of_kind("keep"):
+            self.metrics.count("skipped")
+            report.add(operation)
+
+    def _move_batch(self, batch: tuple, done):
+        directory, operations = batch
+        self._mover.make_dirs(directory)
+        # all the files of a batch come from one directory, so the devices are compared once per batch
+        same_device = self._mover.same_device(
+            os.path.dirname(operations[0].source), directory
+        )
+        for operation in operations:
+            start_time = time.perf_counter()
+            self._move_file(operation.source, operation.destination, same_device)
+            done(operation, start_time)
+
+    def _move_file(self, source: str, destination: str, same_device=True):
+        if self._mover.move(source, destination, same_device):
+            self.metrics.count("copied")
+
+    def _duplicates_summary(self, count: int) -> str:
+        if self.dedupe == "hardlink":
+            return f"Duplicates: {count} files replaced with hardlinks, {self.duplicates_size} bytes reclaimed."
+        return f"Duplicates: {count} files ({self.dedupe}), {self.duplicates_size} bytes can be reclaimed."
 
     def _normalize(self, name: str) -> str:
         """
-        The function normalizes the passed string so that Polish characters are converted to Latin characters,
-        and characters other than Latin letters, digits and _ , are converted to _ .
+        The function normalizes the passed string so that Latin letters with diacritics (Polish and of all other
+        Latin-script languages) are converted to ASCII letters, and characters other than letters, digits and _ ,
+        are converted to _ (see name_normalizer.normalize_name).
 
         :param name: The variable with string to normalize
         :type name: str
         :rtype: str
         """
-        # Auxiliary dict for the translate() function
-        polish_chars = {
-            ord("ą"): "a",
-            ord("Ą"): "A",
-            ord("ć"): "c",
-            ord("Ć"): "C",
-            ord("ę"): "e",
-            ord("Ę"): "E",
-            ord("ł"): "l",
-            ord("Ł"): "L",
-            ord("ń"): "n",
-            ord("Ń"): "N",
-            ord("ó"): "o",
-            ord("Ó"): "O",
-            ord("ś"): "s",
-            ord("Ś"): "Ś",
-            ord("ź"): "z",
-            ord("Ż"): "Z",
-            ord("ż"): "z",
-            ord("Ż"): "Z",
-        }
-        # I change Polish characters to Latin equivalents on the basis of dict: polish_chars
-        normalized_name = name.translate(polish_chars)
-        # I change other disallowed characters in the name to the _ character
-        normalized_name = re.sub(r"\W+", "_", normalized_name)
-        return normalized_name
+        return normalize_name(name)
 
-    def _set_dest_path(self, path: str, file_name: str, ext="") -> str:
+    @staticmethod
+    def _split_name(file_name: str) -> tuple:
+        # name and extension of a file, archives keep their double extensions (photos.tar.gz -> photos, .tar.gz)
+        stem = archive_stem(file_name)
+        if not stem:
+            return os.path.splitext(file_name)
+        return stem, file_name[len(stem) :]
+
+    def _set_dest_path(self, path: str, file_name: str, ext="", real_path=None) -> str:
         """
         A helper function for creating file and directory names.
 
@@ -198,70 +591,213 @@ class FileSorter:
         :type file_name: str
         :param ext: The extension for file or empty for directory
         :type ext: str
+        :param real_path: Current path to the directory on disk, if it differs from path (planned rename of its parent)
+        :type real_path: str
         :rtype: str
         """
-        # I check if the given file / directory does not already exist in dest_folder
-        full_file_name = f"{file_name}{ext}"
-        if os.path.exists(os.path.join(path, full_file_name)):
-            # if the file / directory already exists in subsequent versions in dest_folder adds to its name "_n" where i is the first free number from 1 to 1000000
-            for i in range(1, 1000000):
-                if not os.path.exists(f"{path}{file_name}_{i}{ext}"):
-                    file_name += f"_{i}"
-                    break
-        full_file_name = f"{file_name}{ext}"
-        return os.path.join(path, full_file_name)
+        return self._names.allocate(path, file_name, ext, real_path)
 
-    def _create_report(self, path: str):
+    def sort(self, path: str, dry_run=False, text_report=False):
+        if not os.path.exists(os.path.dirname(path)) or not os.path.isdir(path):
+            return f'"{path}" is not a proper folder path, try again.'
+        plan = self.plan(path)
+        if dry_run:
+            return repr(plan)
+        report = self.apply(plan, path)
+        self.duplicates_size = report.categories.get("duplicates", {}).get("bytes", 0)
+        duplicates_info = ""
+        if self.dedupe:
+            duplicates_info = f"\n{self._duplicates_summary(report.categories.get('duplicates', {}).get('files', 0))}"
+        report_info = (
+            f"\nRun id: {report.run_id}, report file is here: {self.report_file_path}"
+        )
+        if text_report:
+            SortReport.render(
+                self.report_file_path, self.text_report_path, report.run_id
+            )
+            report_info += f"\nText report is here: {self.text_report_path}"
+        return f"I've sorted your files in {path}.{duplicates_info}{report_info}"
+
+    def apply(self, plan: SortPlan, path: str) -> SortReport:
         """
-        The function saves a report with the extensions and files used.
+        The method executes the plan as a new sorting run: with a new run in the report and a journal of the run
+        (so it can be resumed or undone). The directories scanned by the plan are saved in the index.
 
-        :param extensions: dict where keys are file categories and values are set with extensions used
-        :type extensions: dict
-        :param paths: dictionary where the keys are file categories and the values are a list of file paths on which sorting was performed
-        :type paths: dict
-        :param path: path to the directory on which sorting is performed
+        :param plan: plan created by the plan method
+        :type plan: SortPlan
+        :param path: path to the sorted directory
         :type path: str
-        :param report_file_path: the name of the file to which the report is saved
-        :type report_file_path: Path
+        :return: report of the run
+        :rtype: SortReport
         """
-        now = datetime.now()
-        with open(self.report_file_path, "a") as fo:
-            fo.write(
-                f"{3*'>'} Activity report for directory: {path} - {now.strftime('%Y-%m-%d %H:%M:%S')}:\n"
-            )
+        with SortReport(self.report_file_path, path) as report:
+            report.excluded = plan.excluded
+            with SortJournal(
+                self.journal_path.joinpath(f"{report.run_id}.jsonl")
+            ) as journal:
+                self.execute(plan, report, journal)
+        with self.metrics.phase("index"):
+            self.index.update(plan.scanned, plan.stale)
+        self._prune_journals()
+        return report
 
-            # I check to see if there will be information in the given directory to write in the report
-            contain_data_to_report = False
-            for value in self.extensions.values():
-                if len(value) > 0:
-                    contain_data_to_report = True
-            # if there is data to record I save it
-            if contain_data_to_report:
-                fo.write(f"Extensions of checked files by category:\n")
-                no_transfered_data = True
-                for key, values in self.extensions.items():
-                    if len(values) > 0:
-                        no_transfered_data = False
-                        values = list(values)
-                        fo.write(f"{key}: {' | '.join(values)};\n")
-                if no_transfered_data:
-                    fo.write(f"{3*'-'}")
-                fo.write(f"\nFiles sorted by category:\n")
-                for key, values in self.paths.items():
-                    if len(values) > 0:
-                        no_transfered_data = False
-                        fo.write(f"{key}:\n")
-                        for value in values:
-                            fo.write(f"{value};\n")
-                if no_transfered_data:
-                    fo.write(f"{3*'-'}")
-                fo.write(f"\n{20*'-'}\n\n")
-            else:
-                fo.write("Nothing to sort.\n")
+    def _prune_journals(self):
+        # the oldest journals of finished runs are removed (journals of interrupted runs are kept until they are resumed)
+        journals = sorted(self.journal_path.glob("*.jsonl"), reverse=True)
+        for file_path in journals[self.JOURNALS_KEPT :]:
+            # journals may be pruned by the sorters of other folders at the same time
+            try:
+                if SortJournal.load(file_path)[3] != "interrupted":
+                    os.remove(file_path)
+            except FileNotFoundError:
+                pass
 
-    def sort(self, path: str):
-        if not os.path.exists(os.path.dirname(path)) or not os.path.isdir(path):
-            return f'"{path}" is not a proper folder path, try again.'
-        # the name of the file to which the report is saved (the report is saved in the main folder of sorted directory)
-        self._sort_folder(path)
-        return f"I've sorted your files in {path}.\nReport file is here: {self.report_file_path}"
+    def resume(self) -> str:
+        """
+        The method executes the remaining operations of the last interrupted sorting run, exactly as they were planned.
+
+        :rtype: str
+        """
+        for file_path in sorted(self.journal_path.glob("*.jsonl"), reverse=True):
+            path, records, done, state = SortJournal.load(file_path)
+            if state == "interrupted":
+                break
+        else:
+            return "There is no interrupted sorting run to resume."
+        operations = []
+        numbers = {}
+        for number, record in enumerate(records):
+            if number in done or SortJournal.is_done(record):
+                continue
+            operation = SortJournal.operation(record)
+            numbers[id(operation)] = number
+            operations.append(operation)
+        plan = SortPlan(path, operations)
+        with SortReport(self.report_file_path, path) as report:
+            with SortJournal(file_path) as journal:
+                journal.resume(numbers)
+                self.execute(plan, report, journal)
+        return f"I've resumed sorting run {file_path.stem} of {path} ({len(operations)} remaining operations).\nReport file is here: {self.report_file_path}"
+
+    def undo(self, run_id: str) -> str:
+        """
+        The method rolls back the operations of a sorting run (in reverse order):
+        files are moved back, renamed directories get their old names, removed empty directories are created again,
+        extracted archives are removed and category directories left empty are removed.
+
+        :param run_id: id of the run (the name of its journal file, as in the report)
+        :type run_id: str
+        :raise ValueError: if there is no journal of the run or the run has already been undone
+        :rtype: str
+        """
+        file_path = self.journal_path.joinpath(f"{run_id}.jsonl")
+        if not file_path.exists():
+            raise ValueError(f"there is no journal of sorting run {run_id}")
+        path, records, done, state = SortJournal.load(file_path)
+        if state == "undone":
+            raise ValueError(f"sorting run {run_id} has already been undone")
+        undone = 0
+        for number in range(len(records) - 1, -1, -1):
+            record = records[number]
+            if number not in done and not SortJournal.is_done(record):
+                continue
+            source, destination = record["source"], record["destination"]
+            if record["kind"] in ("rename", "move"):
+                os.makedirs(os.path.dirname(source), exist_ok=True)
+                if record["kind"] == "rename":
+                    os.rename(destination, source)
+                else:
+                    self._move_file(destination, source)
+            elif record["kind"] == "link":
+                if os.stat(destination).st_nlink > 1:
+                    # the duplicate is restored as a separate file, not as another link to its original
+                    shutil.copy2(destination, source)
+                    os.unlink(destination)
+                else:
+                    self._move_file(destination, source)
+            elif record["kind"] == "rmdir":
+                os.makedirs(source, exist_ok=True)
+            elif not record["existed"]:
+                shutil.rmtree(destination, ignore_errors=True)
+            if record["kind"] in ("move", "link", "extract"):
+                # the category directory is removed with its last file (before its parent gets its old name back)
+                try:
+                    os.rmdir(os.path.dirname(destination))
+                except OSError:
+                    pass
+            undone += 1
+        SortJournal.mark_undone(file_path)
+        return f"I've undone sorting run {run_id} of {path} ({undone} operations)."
+
+    def watch(self, path: str, debounce=1.0, polling=False, on_batch=None):
+        """
+        The method sorts the directory and then keeps sorting files as they arrive, until it is interrupted (Ctrl+C).
+        Only the directories with new files (see FolderWatcher) are sorted, files which are still being written are left for later.
+        Every batch is a separate run in the report, the report file is rolled over when it grows too big.
+
+        :param path: string with path to directory to be sorted
+        :type path: str
+        :param debounce: seconds without new files after which the waiting files are sorted
+        :type debounce: float
+        :param polling: watch the directory by polling even if inotify is available
+        :type polling: bool
+        :param on_batch: function called with a message after every sorted batch
+        :type on_batch: callable
+        :rtype: str
+        """
+        message = self.sort(path)
+        if on_batch is not None:
+            on_batch(message)
+        batches = 0
+        operations = 0
+        self._watching = True
+        try:
+            with FolderWatcher(
+                path,
+                self.excluded_folders,
+                debounce,
+                polling=polling,
+                ignore=IgnoreRules.for_directory(path, self.exclude),
+            ) as watcher:
+                if on_batch is not None:
+                    on_batch(
+                        f"Watching {path} ({'inotify' if watcher.uses_inotify else 'polling'}), press Ctrl+C to stop."
+                    )
+                for folders, busy in watcher.batches():
+                    plan = self.plan(path, folders, busy)
+                    if not len(plan):
+                        # e.g. events caused by the previous batch
+                        self.index.update(plan.scanned, plan.stale)
+                        continue
+                    SortReport.roll(self.report_file_path)
+                    self.apply(plan, path)
+                    batches += 1
+                    operations += len(plan)
+                    if on_batch is not None:
+                        on_batch(
+                            f"Sorted {len(plan)} operations in: {', '.join(sorted(folders))}"
+                        )
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._watching = False
+        return f"I've stopped watching {path} ({operations} operations in {batches} batches).\nReport file is here: {self.report_file_path}"
+
+    def _index_fingerprint(self) -> str:
+        # settings which change the result of sorting of an unchanged directory
+        return f"{','.join(sorted(self.excluded_folders))}:{self.rules.fingerprint}:{NORMALIZATION_VERSION}"
+
+
+class _NoReport:
+    # report used when the operations of execute are not reported
+    def add(self, operation, extraction=None):
+        pass
+
+
+class _NoJournal:
+    # journal used when the operations of execute are not journaled
+    def write_plan(self, path, operations):
+        pass
+
+    def done(self, operations):
+        pass
@@ -0,0 +1,41 @@
+import contextlib
+
+from utility.lazy import prompt
+from utility.prompt_not_allowed import PromptNotAllowed
+
+# False while commands run without prompts (see no_prompts)
+_prompts_allowed = True
+
+
+def ask(message: str, completer=None) -> str:
+    """
+    The function reads an answer of the user - with input, or with a prompt_toolkit prompt if a completer is given.
+    Every question of the menus is asked here, so commands which must not prompt fail instead of waiting for an answer.
+
+    :param message: question shown to the user
+    :type message: str
+    :param completer: prompt_toolkit completer of the answer
+    :type completer: Completer
+    :raise PromptNotAllowed: if prompts are not allowed (see no_prompts)
+    :rtype: str
+    """
+    if not _prompts_allowed:
+        raise PromptNotAllowed(f"the command asks for input: {message.strip()}")
+    if completer is None:
+        return input(message)
+    return prompt(message, completer=completer)
+
+
+@contextlib.contextmanager
+def no_prompts():
+    """
+    Context manager in which every question of the menus raises PromptNotAllowed (e.g. in the batch mode,
+    where all the answers must be given as arguments and stdin may be the script itself).
+    """
+    global _prompts_allowed
+    allowed = _prompts_allowed
+    _prompts_allowed = False
+    try:
+        yield
+    finally:
+        _prompts_allowed = allowed
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+# the modules of PyAssist import each other from the package directory (as when cli_pyassist.py is run)
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pyassit_poetry")
+)
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    # the sorter keeps its report, journals and index in ~/PyAssist
+    home_path = tmp_path / "home"
+    home_path.mkdir()
+    monkeypatch.setenv("HOME", str(home_path))
+    return home_path
+
+
+@pytest.fixture
+def cli_pyassist(tmp_path, monkeypatch):
+    # assistant with an empty addressbook and notes, the data is saved to tmp_path, not to the data files of the program
+    from cli_pyassist import CliPyassist
+    from utility.addressbook import AddressBook
+    from utility.notes import Notes
+    from utility.cli_addressbook_interaction import CliAddressBookInteraction
+    from utility.cli_notes_interaction import CliNotesInteraction
+
+    monkeypatch.setattr(
+        CliPyassist,
+        "data_files",
+        staticmethod(lambda: (tmp_path / "addressbook.dat", tmp_path / "notes.dat")),
+    )
+    return CliPyassist(
+        CliAddressBookInteraction(AddressBook()), CliNotesInteraction(Notes())
+    )
@@ -0,0 +1,50 @@
+from utility.addressbook import AddressBook
+from utility.address import Address
+from utility.street import Street
+from utility.city import City
+from utility.zip_code import ZipCode
+from utility.country import Country
+from utility.email import Email
+from utility.record import Record
+from utility.name import Name
+
+
+def make_addressbook() -> AddressBook:
+    addressbook = AddressBook()
+    # the address fields are Field objects, the ones not given have the value None
+    addressbook.add_record(
+        Record(
+            Name("Anna"),
+            [],
+            [Email(None)],
+            None,
+            Address(Street("Main Street"), City("Lviv"), ZipCode(None), Country()),
+        )
+    )
+    addressbook.add_record(
+        Record(
+            Name("Bob"),
+            [],
+            [],
+            None,
+            Address(Street(), City("Kyiv"), ZipCode("01001"), Country("Ukraine")),
+        )
+    )
+    addressbook.add_record(Record(Name("Carl"), [], [], None, None))
+    return addressbook
+
+
+def test_search_in_addresses():
+    addressbook = make_addressbook()
+    assert list(addressbook.search("main")) == ["Anna"]
+    assert list(addressbook.search("KYIV")) == ["Bob"]
+    assert list(addressbook.search("0100")) == ["Bob"]
+    assert list(addressbook.search("ukraine")) == ["Bob"]
+    assert list(addressbook.search("carl")) == ["Carl"]
+    assert list(addressbook.search("nowhere")) == []
+
+
+def test_search_limit():
+    addressbook = make_addressbook()
+    assert list(addressbook.search("a", limit=2)) == ["Anna", "Bob"]
+    assert len(addressbook.search("a")) == 3
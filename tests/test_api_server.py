@@ -0,0 +1,346 @@
+import json
+import socket
+import asyncio
+import threading
+from datetime import date
+from http.client import HTTPConnection
+
+import pytest
+
+from utility import api_server
+from utility.api_server import ApiServer
+from utility.addressbook import AddressBook
+from utility.notes import Notes
+
+
+class Client:
+    """
+    Client of a running ApiServer: one keep-alive connection, JSON bodies.
+
+    Args:
+        port (int): port of the server
+    """
+
+    def __init__(self, port: int) -> None:
+        self.port = port
+        self.connection = HTTPConnection("127.0.0.1", port, timeout=10)
+
+    def request(self, method: str, path: str, body=None, headers=None):
+        if body is not None and not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        self.connection.request(method, path, body, headers or {})
+        response = self.connection.getresponse()
+        data = response.read()
+        if response.getheader("Content-Type") == ApiServer.JSON:
+            data = json.loads(data)
+        return response, data
+
+
+@pytest.fixture
+def start_server(cli_pyassist):
+    # start_server(**arguments of ApiServer) runs a server in a thread with its event loop, stopped after the test
+    servers = []
+
+    def start(**kwargs):
+        server = ApiServer(cli_pyassist, port=0, **kwargs)
+        started = threading.Event()
+        state = {}
+
+        async def main():
+            state["loop"] = asyncio.get_running_loop()
+            state["stop"] = asyncio.Event()
+            serving = asyncio.ensure_future(server.serve(state["stop"]))
+            while server.port == 0 and not serving.done():
+                await asyncio.sleep(0.01)
+            started.set()
+            await serving
+
+        thread = threading.Thread(target=asyncio.run, args=(main(),))
+        thread.start()
+        assert started.wait(10)
+
+        def stop():
+            state["loop"].call_soon_threadsafe(state["stop"].set)
+            thread.join(30)
+            assert not thread.is_alive()
+
+        server.stop = stop
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        if server.stop is not None:
+            server.stop()
+
+
+@pytest.fixture
+def client(start_server):
+    server = start_server(save_delay=60)
+    yield Client(server.port)
+
+
+def add_contacts(client, *contacts):
+    for contact in contacts:
+        response, data = client.request("POST", "/contacts", contact)
+        assert response.status == 201, data
+
+
+def test_contacts_crud(client):
+    response, data = client.request(
+        "POST",
+        "/contacts",
+        {
+            "name": "anna smith",
+            "phones": ["123456789"],
+            "birthday": "01-02-1990",
+            "address": {"city": "Kyiv"},
+        },
+    )
+    assert response.status == 201
+    assert data == {
+        "name": "Anna Smith",
+        "phones": ["123456789"],
+        "emails": [],
+        "birthday": "01-02-1990",
+        "address": {"street": "", "city": "Kyiv", "zip_code": "", "country": ""},
+    }
+    response, data = client.request("POST", "/contacts", {"name": "Anna Smith"})
+    assert response.status == 409
+    assert data == {"error": "contact Anna Smith already exists"}
+
+    response, data = client.request("GET", "/contacts/anna%20smith")
+    assert response.status == 200
+    assert data["name"] == "Anna Smith"
+
+    response, data = client.request(
+        "PATCH",
+        "/contacts/Anna%20Smith",
+        {"name": "Anna Brown", "address": {"street": "Main"}},
+    )
+    assert response.status == 200
+    assert data["name"] == "Anna Brown"
+    assert data["phones"] == ["123456789"]
+    assert data["address"]["street"] == "Main" and data["address"]["city"] == "Kyiv"
+    response, data = client.request("GET", "/contacts/Anna%20Smith")
+    assert response.status == 404
+    assert data == {"error": "contact Anna Smith not found"}
+
+    response, data = client.request("DELETE", "/contacts/Anna%20Brown")
+    assert response.status == 200
+    assert data == {"deleted": "Anna Brown"}
+    response, data = client.request("DELETE", "/contacts/Anna%20Brown")
+    assert response.status == 404
+
+    response, data = client.request("DELETE", "/contacts")
+    assert response.status == 405
+    assert data == {"error": "DELETE is not allowed for /contacts (allowed: GET, POST)"}
+    response, data = client.request("GET", "/unknown")
+    assert response.status == 404
+
+
+def test_notes_crud(client):
+    response, data = client.request(
+        "POST",
+        "/notes",
+        {"title": "Shopping", "content": "milk", "tags": ["food home"]},
+    )
+    assert response.status == 201
+    assert data == {"title": "shopping", "content": "milk", "tags": ["food", "home"]}
+    response, data = client.request("POST", "/notes", {"title": "SHOPPING"})
+    assert response.status == 409
+
+    response, data = client.request(
+        "PATCH", "/notes/Shopping", {"title": "groceries", "tags": ["food"]}
+    )
+    assert response.status == 200
+    assert data == {"title": "groceries", "content": "milk", "tags": ["food"]}
+    response, data = client.request("PATCH", "/notes/groceries", {"title": " "})
+    assert response.status == 400
+    response, data = client.request("GET", "/notes/shopping")
+    assert response.status == 404
+
+    response, data = client.request("DELETE", "/notes/groceries")
+    assert response.status == 200
+    assert data == {"deleted": "groceries"}
+    response, data = client.request("PUT", "/notes/groceries")
+    assert response.status == 405
+    assert data == {
+        "error": "PUT is not allowed for /notes/groceries (allowed: GET, PATCH, DELETE)"
+    }
+
+
+def test_requests_share_the_connection(start_server):
+    server = start_server()
+    client = Client(server.port)
+    for _ in range(3):
+        response, data = client.request("GET", "/health")
+        assert response.status == 200
+        assert response.getheader("Connection") == "keep-alive"
+    assert data["requests"] == 3
+    assert server.connections == 1
+
+
+def test_search_and_limit(client):
+    add_contacts(
+        client,
+        {"name": "Anna"},
+        {"name": "Joanna"},
+        {"name": "Bob", "emails": ["bob@anna.com"]},
+        {"name": "Carl"},
+    )
+    response, data = client.request("GET", "/contacts?q=anna")
+    assert data["count"] == 3
+    assert {result["name"] for result in data["results"]} == {"Anna", "Joanna", "Bob"}
+    response, data = client.request("GET", "/contacts?q=anna&limit=2")
+    assert data["count"] == 2
+    response, data = client.request("GET", "/contacts?limit=1")
+    assert data["count"] == 1
+    response, data = client.request("GET", "/contacts?limit=many")
+    assert response.status == 400
+    assert data == {"error": "limit must be a number"}
+
+    for title in ("plans", "old plans", "recipes"):
+        client.request("POST", "/notes", {"title": title})
+    response, data = client.request("GET", "/notes?q=plans&limit=5")
+    assert [result["title"] for result in data["results"]] == ["plans", "old plans"]
+
+
+def today(monkeypatch, day: date):
+    # the server takes today's date from date.today() of its module
+    class Today(date):
+        @classmethod
+        def today(cls):
+            return day
+
+    monkeypatch.setattr(api_server, "date", Today)
+
+
+def birthdays(client, days: int) -> list:
+    response, data = client.request("GET", f"/birthdays?days={days}")
+    assert response.status == 200
+    return [
+        (result["name"], result["date"], result["days"]) for result in data["results"]
+    ]
+
+
+def test_birthdays_across_the_year_boundary(client, monkeypatch):
+    add_contacts(
+        client,
+        {"name": "December", "birthday": "30-12-1990"},
+        {"name": "January", "birthday": "03-01-1985"},
+        {"name": "Later", "birthday": "10-01-1990"},
+        {"name": "Past", "birthday": "20-12-1990"},
+        {"name": "No Birthday"},
+    )
+    today(monkeypatch, date(2025, 12, 28))
+    assert birthdays(client, 7) == [
+        ("December", "30-12-2025", 2),
+        ("January", "03-01-2026", 6),
+    ]
+    assert [name for name, _, _ in birthdays(client, 365)] == [
+        "December",
+        "January",
+        "Later",
+        "Past",
+    ]
+    response, data = client.request("GET", "/birthdays?days=0")
+    assert response.status == 400
+
+
+def test_birthdays_on_29_february(client, monkeypatch):
+    add_contacts(
+        client,
+        {"name": "Leap", "birthday": "29-02-2000"},
+        {"name": "Before", "birthday": "28-02-1990"},
+    )
+    # celebrated on 1 March in the years without 29 February
+    today(monkeypatch, date(2025, 2, 25))
+    assert birthdays(client, 4) == [
+        ("Before", "28-02-2025", 3),
+        ("Leap", "01-03-2025", 4),
+    ]
+    assert birthdays(client, 3) == [("Before", "28-02-2025", 3)]
+    today(monkeypatch, date(2028, 2, 25))
+    assert birthdays(client, 4) == [
+        ("Before", "28-02-2028", 3),
+        ("Leap", "29-02-2028", 4),
+    ]
+
+
+@pytest.mark.parametrize("headers", [{"Accept": ApiServer.JSON_LINES}, {}])
+def test_lists_are_streamed_as_json_lines(start_server, headers):
+    # with the Accept header every list is streamed, without it the lists over stream_threshold
+    server = start_server(stream_threshold=2 if not headers else 1000)
+    client = Client(server.port)
+    add_contacts(client, {"name": "Anna"}, {"name": "Bob"}, {"name": "Carl"})
+    response, data = client.request("GET", "/contacts", headers=headers)
+    assert response.status == 200
+    assert response.getheader("Content-Type") == ApiServer.JSON_LINES
+    assert response.getheader("Transfer-Encoding") == "chunked"
+    assert response.getheader("X-Result-Count") == "3"
+    lines = data.decode().splitlines()
+    assert [json.loads(line)["name"] for line in lines] == ["Anna", "Bob", "Carl"]
+    # the connection is still usable after the last chunk
+    response, data = client.request("GET", "/contacts?limit=2")
+    assert data["count"] == 2
+
+
+@pytest.mark.parametrize(
+    "body, error",
+    [
+        (b"{not json", "invalid JSON"),
+        (b'["Anna"]', "the body must be a JSON object"),
+    ],
+)
+def test_invalid_body(client, body, error):
+    response, data = client.request("POST", "/contacts", body)
+    assert response.status == 400
+    assert data["error"].startswith(error)
+
+
+def send_head(port: int, head: bytes) -> bytes:
+    # a raw request - http.client would not send a Content-Length without the body
+    with socket.create_connection(("127.0.0.1", port), timeout=10) as connection:
+        connection.sendall(head)
+        response = b""
+        while chunk := connection.recv(65536):
+            response += chunk
+    return response
+
+
+def test_oversized_body(start_server):
+    server = start_server()
+    response = send_head(
+        server.port,
+        b"POST /contacts HTTP/1.1\r\nHost: localhost\r\n"
+        b"Content-Length: %d\r\n\r\n" % (ApiServer.MAX_BODY_SIZE + 1),
+    )
+    assert response.startswith(b"HTTP/1.1 413 ")
+    assert b"Connection: close" in response
+
+
+def test_oversized_headers(start_server):
+    server = start_server()
+    response = send_head(
+        server.port,
+        b"GET /health HTTP/1.1\r\nHost: localhost\r\nX-Padding: %s\r\n\r\n"
+        % (b"x" * ApiServer.MAX_HEADER_SIZE),
+    )
+    assert response.startswith(b"HTTP/1.1 431 ")
+    assert b"the headers are too large" in response
+
+
+def test_changes_are_saved_when_stopped(start_server, tmp_path):
+    server = start_server(save_delay=60)
+    client = Client(server.port)
+    add_contacts(client, {"name": "Anna", "phones": ["123456789"]})
+    client.request("POST", "/notes", {"title": "plans", "content": "rest"})
+    assert not (tmp_path / "addressbook.dat").exists()
+    server.stop()
+    server.stop = None
+
+    addressbook = AddressBook().load_addresbook(tmp_path / "addressbook.dat")
+    assert [phone.value for phone in addressbook["Anna"].phones] == ["123456789"]
+    notes = Notes().load_notes(tmp_path / "notes.dat")
+    assert notes["plans"].content.value == "rest"
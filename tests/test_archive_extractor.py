@@ -0,0 +1,51 @@
+import io
+import tarfile
+
+from utility.archive_extractor import extract_archive
+
+LIMITS = {
+    "max_size": 1 << 20,
+    "max_members": 10,
+    "max_ratio": 200,
+    "min_ratio_size": 1 << 20,
+}
+
+
+def make_tar(path, members: dict, mode="w:gz"):
+    with tarfile.open(path, mode) as archive:
+        for name, content in members.items():
+            info = tarfile.TarInfo(name)
+            if content is None:
+                info.type = tarfile.DIRTYPE
+                archive.addfile(info)
+                continue
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+
+
+def test_tar_members_are_extracted_from_the_stream(tmp_path):
+    source = tmp_path / "archive.tar.gz"
+    make_tar(source, {"folder": None, "folder/a.txt": b"a", "b.txt": b"bb"})
+    destination = tmp_path / "archive"
+    result = extract_archive(str(source), str(destination), LIMITS)
+    assert result["error"] is None
+    assert (result["members"], result["bytes"]) == (3, 3)
+    assert (destination / "folder/a.txt").read_bytes() == b"a"
+    assert (destination / "b.txt").read_bytes() == b"bb"
+
+
+def test_tar_with_a_member_outside_the_destination_is_rejected(tmp_path):
+    source = tmp_path / "archive.tar"
+    make_tar(source, {"a.txt": b"a", "../outside.txt": b"x"}, "w")
+    destination = tmp_path / "archive"
+    result = extract_archive(str(source), str(destination), LIMITS)
+    assert result["error"].startswith("ArchiveError")
+    assert not destination.exists()
+    assert not (tmp_path / "outside.txt").exists()
+
+
+def test_tar_with_too_many_members_is_rejected(tmp_path):
+    source = tmp_path / "archive.tar.xz"
+    make_tar(source, {f"{i}.txt": b"" for i in range(11)}, "w:xz")
+    result = extract_archive(str(source), str(tmp_path / "archive"), LIMITS)
+    assert result["error"] == "ArchiveError: more than 10 members"
@@ -0,0 +1,146 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from utility.async_repl import AsyncRepl
+from utility.addressbook import AddressBook
+from utility.notes import Notes
+from utility.note import Note
+from utility.title import Title
+from utility.content import Content
+from utility.phone import Phone
+from utility.record import Record
+from utility.name import Name
+
+
+def run_jobs(cli_pyassist, start, edit):
+    # start() gives a command which starts a background job, edit() changes the data while the job runs
+    async def main():
+        repl = AsyncRepl(cli_pyassist)
+        assert (await start(repl)).startswith("Job 1 started")
+        edit()
+        assert "finished" in await repl.jobs.wait()
+        repl.jobs.shutdown()
+
+    asyncio.run(main())
+
+
+@pytest.fixture
+def slow_saves(monkeypatch):
+    # the saves wait until the data has been edited in the foreground
+    edited = threading.Event()
+    for data_class, name in ((Notes, "save_notes"), (AddressBook, "save_addresbook")):
+        save = getattr(data_class, name)
+
+        def slow_save(self, filename, save=save):
+            assert edited.wait(5)
+            save(self, filename)
+
+        monkeypatch.setattr(data_class, name, slow_save)
+    return edited
+
+
+def test_notes_are_saved_as_they_were_when_save_was_given(
+    cli_pyassist, tmp_path, slow_saves
+):
+    interaction = cli_pyassist.cli_notes_interaction
+    interaction.insert_note("shopping", "milk", {"home"})
+
+    def edit():
+        note = interaction.notes["shopping"]
+        note.content = Content("bread")
+        note.add_tag("weekly")
+        interaction.rename_note(note, "groceries")
+        slow_saves.set()
+
+    run_jobs(cli_pyassist, lambda repl: repl.save_notes(""), edit)
+    saved = Notes().load_notes(tmp_path / "notes.dat")
+    assert list(saved) == ["shopping"]
+    assert saved["shopping"].content.value == "milk"
+    assert saved["shopping"].tags == {"home"}
+    assert interaction.notes["groceries"].content.value == "bread"
+
+
+def test_addressbook_is_saved_as_it_was_when_save_was_given(
+    cli_pyassist, tmp_path, slow_saves
+):
+    interaction = cli_pyassist.cli_addressbook_interaction
+    interaction.insert_record(Record(Name("Ann"), [Phone("111")], []))
+
+    def edit():
+        record = interaction.addressbook["Ann"]
+        record.phones[0] = Phone("222")
+        record.add_phone(Phone("333"))
+        interaction.insert_record(Record(Name("Bob"), [], []))
+        slow_saves.set()
+
+    run_jobs(cli_pyassist, lambda repl: repl.save_addressbook(""), edit)
+    saved = AddressBook().load_addresbook(tmp_path / "addressbook.dat")
+    assert list(saved) == ["Ann"]
+    assert [phone.value for phone in saved["Ann"].phones] == ["111"]
+    assert [phone.value for phone in interaction.addressbook["Ann"].phones] == [
+        "222",
+        "333",
+    ]
+
+
+def test_ends_of_jobs_are_printed_while_a_foreground_command_runs(cli_pyassist, capsys):
+    interaction = cli_pyassist.cli_notes_interaction
+
+    def question(self, argument):
+        # the user answers when the end of the job has been printed
+        deadline = time.monotonic() + 2
+        while repl.jobs.running():
+            if time.monotonic() > deadline:
+                return "the end of the job is held up"
+            time.sleep(0.01)
+        return "answered"
+
+    async def main():
+        await repl.save_notes("")
+        return await repl._execute(
+            "question", "", {"question": question}, repl.NOTES_JOBS, interaction
+        )
+
+    repl = AsyncRepl(cli_pyassist)
+    assert asyncio.run(main()) == "answered"
+    repl.jobs.shutdown()
+    assert "[job 1 done in" in capsys.readouterr().out
+
+
+def test_imported_notes_are_merged_after_a_foreground_command(
+    cli_pyassist, tmp_path, monkeypatch
+):
+    imported = Notes()
+    imported.add_note(Note(Title("imported"), Content("from the file"), set()))
+    imported.export_to_csv(tmp_path / "notes.csv")
+    interaction = cli_pyassist.cli_notes_interaction
+    monkeypatch.setattr(
+        interaction, "_import_export_prepare", lambda _: tmp_path / "notes.csv"
+    )
+    seen = []
+
+    def edit(self, argument):
+        # the import has been read, but it is not merged while the command changes the notes
+        job = repl.jobs._job("1")
+        deadline = time.monotonic() + 2
+        while not job.future.done() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        seen.append("imported" in self.notes)
+        self.insert_note("edited", "in the foreground", set())
+        return "edited"
+
+    async def main():
+        assert (await repl.import_notes("")).startswith("Job 1 started")
+        await repl._execute("edit", "", {"edit": edit}, repl.NOTES_JOBS, interaction)
+        assert "finished" in await repl.jobs.wait()
+
+    repl = AsyncRepl(cli_pyassist)
+    asyncio.run(main())
+    repl.jobs.shutdown()
+    assert seen == [False]
+    assert set(interaction.notes) == {"imported", "edited"}
+    assert interaction.titles_index.complete("") == ["edited", "imported"]
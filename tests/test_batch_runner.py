@@ -0,0 +1,130 @@
+import pytest
+
+from utility.notes import Notes
+from utility.cli_notes_interaction import CliNotesInteraction
+from utility.batch_runner import BatchRunner, BatchError
+from utility.prompt_not_allowed import PromptNotAllowed
+from utility.user_input import no_prompts
+
+
+def run(cli_pyassist, script: str, **options) -> int:
+    return BatchRunner(cli_pyassist, **options).run(script.splitlines())
+
+
+def test_all_commands_succeed(cli_pyassist, tmp_path, monkeypatch, capsys):
+    # nothing is read from stdin (it may be the script itself)
+    monkeypatch.setattr("builtins.input", pytest.fail)
+    script = """
+    # comments and blank lines are skipped
+
+    addressbook add "john smith" phone=123456789 phone=+48-600-100-200 email=john@example.com birthday=15-10-1985 city=Warsaw
+    addressbook edit "John Smith" name="john smith jr" street="Long 1" zip_code=00-001
+    notes add Shopping content="milk, bread" tags="home weekly"
+    notes edit shopping title=groceries addtag=food deltag=weekly
+    """
+    assert run(cli_pyassist, script) == 0
+    output = capsys.readouterr().out
+    assert "4 commands: 4 ok, 0 failed" in output
+    assert "Exit status: 0" in output
+    addressbook = cli_pyassist.cli_addressbook_interaction.addressbook
+    assert list(addressbook) == ["John Smith Jr"]
+    record = addressbook["John Smith Jr"]
+    assert [phone.value for phone in record.phones] == ["123456789", "48600100200"]
+    assert [email.value for email in record.emails] == ["john@example.com"]
+    assert record.birthday.value.strftime("%d-%m-%Y") == "15-10-1985"
+    assert (
+        record.address.street.value,
+        record.address.city.value,
+        record.address.zip_code.value,
+    ) == ("Long 1", "Warsaw", "00-001")
+    notes = cli_pyassist.cli_notes_interaction.notes
+    assert list(notes) == ["groceries"]
+    assert notes["groceries"].content.value == "milk, bread"
+    assert notes["groceries"].tags == {"home", "food"}
+    # the completion indexes are kept up to date with the changes
+    assert "John Smith Jr" in cli_pyassist.cli_addressbook_interaction.names_index
+    assert "John Smith" not in cli_pyassist.cli_addressbook_interaction.names_index
+    assert "groceries" in cli_pyassist.cli_notes_interaction.titles_index
+    assert "shopping" not in cli_pyassist.cli_notes_interaction.titles_index
+    # the changes are saved once, after the last command
+    assert (tmp_path / "addressbook.dat").exists()
+    assert (tmp_path / "notes.dat").exists()
+
+
+@pytest.mark.parametrize(
+    "line, error",
+    [
+        ("addressbook add", "missing argument"),
+        ("addressbook add Ann phone", "unexpected argument 'phone'"),
+        ("addressbook add Ann nickname=annie", "unexpected argument 'nickname=annie'"),
+        ("addressbook add Ann phone=12a", "invalid phone: '12a'"),
+        ("addressbook add Ann birthday=1-1-2999", "1-1-2999 is a future date"),
+        ("addressbook edit Bob phone=1", "record Bob not found"),
+        ("notes edit missing content=x", "note with title missing doesn't exist"),
+        ("notes frobnicate", "command notes frobnicate is not recognized"),
+        ("sort --workers 2", "missing folder path"),
+    ],
+)
+def test_failed_command(cli_pyassist, capsys, line, error):
+    assert run(cli_pyassist, line) == 1
+    output = capsys.readouterr().out
+    assert "#1 FAILED" in output
+    assert error in output
+    assert "Exit status: 1" in output
+
+
+def test_field_values_are_split_like_in_a_shell(cli_pyassist):
+    runner = BatchRunner(cli_pyassist)
+    runner.execute('notes add "to do" content="a = b, c" tags="x y" tags=z')
+    note = cli_pyassist.cli_notes_interaction.notes["to do"]
+    # only the first = separates the field from its value
+    assert note.content.value == "a = b, c"
+    assert note.tags == {"x", "y", "z"}
+    runner.execute('notes edit "to do" content= tags=')
+    assert (note.content.value, note.tags) == ("", set())
+    with pytest.raises(BatchError, match="No closing quotation"):
+        runner.execute('notes add other content="x')
+
+
+def test_an_invalid_edit_does_not_change_the_record(cli_pyassist):
+    runner = BatchRunner(cli_pyassist)
+    runner.execute("addressbook add Ann phone=111")
+    with pytest.raises(BatchError):
+        runner.execute("addressbook edit Ann phone=222 email=not-an-email")
+    record = cli_pyassist.cli_addressbook_interaction.addressbook["Ann"]
+    assert [phone.value for phone in record.phones] == ["111"]
+
+
+def test_stop_on_error(cli_pyassist, capsys):
+    script = "notes add a\nnotes add a\nnotes add b\n"
+    assert run(cli_pyassist, script) == 1
+    assert list(cli_pyassist.cli_notes_interaction.notes) == ["a", "b"]
+    assert "3 commands: 2 ok, 1 failed" in capsys.readouterr().out
+    notes = Notes()
+    cli_pyassist.cli_notes_interaction = CliNotesInteraction(notes)
+    assert run(cli_pyassist, script, stop_on_error=True) == 1
+    assert list(notes) == ["a"]
+    assert "2 commands: 1 ok, 1 failed" in capsys.readouterr().out
+
+
+def test_interrupted_script_is_saved(cli_pyassist, tmp_path, capsys):
+    def lines():
+        yield "notes add a"
+        raise KeyboardInterrupt
+
+    assert BatchRunner(cli_pyassist).run(lines()) == 130
+    output = capsys.readouterr().out
+    assert "Interrupted, the changes made so far are saved." in output
+    assert "Saved: notes" in output
+    assert (tmp_path / "notes.dat").exists()
+
+
+def test_a_question_of_the_menus_fails_instead_of_reading_stdin(
+    cli_pyassist, monkeypatch
+):
+    monkeypatch.setattr("builtins.input", pytest.fail)
+    with no_prompts(), pytest.raises(
+        PromptNotAllowed, match="the command asks for input: Enter note content:"
+    ):
+        cli_pyassist.cli_notes_interaction.create_note("new")
+    assert "new" not in cli_pyassist.cli_notes_interaction.notes
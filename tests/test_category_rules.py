@@ -0,0 +1,109 @@
+import os
+import json
+import struct
+
+import pytest
+
+from utility.category_rules import CategoryRules
+
+# 54-byte header of a BMP image with a 40-byte DIB header (BITMAPINFOHEADER)
+BMP = b"BM" + struct.pack("<IHHII", 58, 0, 0, 54, 40) + bytes(36) + b"\xff" * 4
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(16)
+
+
+def sniffed(rules, tmp_path, content: bytes, name="file") -> str:
+    path = tmp_path / name
+    path.write_bytes(content)
+    return rules.category("", str(path), os.stat(path))
+
+
+def test_extensions_are_case_insensitive(home):
+    rules = CategoryRules()
+    assert rules.category(".jpg") == "images"
+    assert rules.category(".JPG") == "images"
+    assert rules.category(".Tar") == "archives"
+    assert rules.category(".xyz") == CategoryRules.DEFAULT_CATEGORY
+    assert rules.category("") == CategoryRules.DEFAULT_CATEGORY
+
+
+def test_rules_loaded_from_json(tmp_path, home):
+    config = {
+        "categories": {"books": ["EPUB", ".Mobi"], "code": [".py"]},
+        "signatures": [{"category": "scans", "offset": 0, "magic": "2550"}],
+    }
+    file_path = tmp_path / "rules.json"
+    file_path.write_text(json.dumps(config))
+    rules = CategoryRules(file_path)
+    # the extensions are lowercased and get a dot, the categories of signatures are categories too
+    assert rules.category(".epub") == "books"
+    assert rules.category(".MOBI") == "books"
+    assert rules.category(".jpg") == CategoryRules.DEFAULT_CATEGORY
+    assert rules.categories == ["books", "code", "scans"]
+    assert rules.header_size == 2
+
+    # the rules of ~/PyAssist/sort_categories.json replace the default ones
+    assert CategoryRules().category(".py") == CategoryRules.DEFAULT_CATEGORY
+    (home / "PyAssist").mkdir()
+    (home / "PyAssist" / "sort_categories.json").write_text(json.dumps(config))
+    assert CategoryRules().category(".py") == "code"
+
+    # other rules or sniffing give another fingerprint (the sort index is dropped)
+    fingerprints = {
+        CategoryRules(file_path).fingerprint,
+        CategoryRules(file_path, sniff=True).fingerprint,
+    }
+    (home / "PyAssist" / "sort_categories.json").unlink()
+    fingerprints.add(CategoryRules().fingerprint)
+    assert len(fingerprints) == 3
+
+
+@pytest.mark.parametrize(
+    "content, category",
+    [
+        (PNG, "images"),
+        (BMP, "images"),
+        (b"%PDF-1.7\n", "documents"),
+        (b"ID3\x04\x00" + bytes(10), "audio"),
+        (b"\x1f\x8b\x08\x00" + bytes(10), "archives"),
+        (bytes(257) + b"ustar\x0000", "archives"),
+        # short magic numbers alone are not enough
+        (b"BMW service on Monday\n" * 3, CategoryRules.DEFAULT_CATEGORY),
+        (b"BM" + bytes(60), CategoryRules.DEFAULT_CATEGORY),
+        (b"\xff\xfb\x90\x00" + bytes(60), CategoryRules.DEFAULT_CATEGORY),
+        (b"ID3 tags of the music collection", CategoryRules.DEFAULT_CATEGORY),
+        (b"", CategoryRules.DEFAULT_CATEGORY),
+    ],
+)
+def test_sniffing(tmp_path, home, content, category):
+    rules = CategoryRules(sniff=True)
+    assert sniffed(rules, tmp_path, content) == category
+
+
+def test_sniffing_is_a_fallback(tmp_path, home):
+    # the extension wins, files are sniffed only with sniff on
+    rules = CategoryRules(sniff=True)
+    path = tmp_path / "image.txt"
+    path.write_bytes(PNG)
+    assert rules.category(".txt", str(path), os.stat(path)) == "documents"
+    assert (
+        sniffed(CategoryRules(), tmp_path, PNG, "not_sniffed")
+        == CategoryRules.DEFAULT_CATEGORY
+    )
+    # a file which cannot be read is unsorted
+    missing = CategoryRules(sniff=True).category(
+        "", str(tmp_path / "missing"), os.stat(path)
+    )
+    assert missing == CategoryRules.DEFAULT_CATEGORY
+
+
+def test_sniffing_results_are_cached_by_stat(tmp_path, home):
+    rules = CategoryRules(sniff=True)
+    path = tmp_path / "file"
+    path.write_bytes(PNG)
+    stat = os.stat(path)
+    assert rules.category("", str(path), stat) == "images"
+    path.write_bytes(b"%PDF-1.7\n")
+    # the same (device, inode, mtime) - the file is not read again
+    assert rules.category("", str(path), stat) == "images"
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert rules.category("", str(path), os.stat(path)) == "documents"
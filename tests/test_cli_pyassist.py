@@ -0,0 +1,22 @@
+import sys
+
+
+def test_help_fits_in_the_box(cli_pyassist):
+    lines = cli_pyassist.help("").splitlines()
+    # every line of the box has the same width, however long the entries are
+    assert {len(line) for line in lines} == {len(lines[0])}
+    assert all(line.endswith(("║", "╗", "╣", "╝")) for line in lines)
+    text = "\n".join(lines)
+    for command in cli_pyassist.COMMANDS_HELP:
+        assert f" {command.strip()} - " in text
+
+
+def test_banner_is_rendered_once(home, monkeypatch):
+    from utility.lazy import banner
+
+    rendered = banner("PyAssist")
+    assert "____" in rendered
+    assert (home / "PyAssist" / "banner-slant-PyAssist.txt").read_text() == rendered
+    # later starts do not import pyfiglet
+    monkeypatch.setitem(sys.modules, "pyfiglet", None)
+    assert banner("PyAssist") == rendered
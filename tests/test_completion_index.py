@@ -0,0 +1,66 @@
+from prompt_toolkit.document import Document
+
+from utility.completion_index import CompletionIndex
+from utility.completion_index_completer import CompletionIndexCompleter
+
+NAMES = ["John Smith", "Jane Smithson", "Anna-Maria Lopez", "smoke_test.notes", "Bob"]
+
+
+def test_completion_of_word_starts():
+    index = CompletionIndex(NAMES)
+    assert len(index) == 5 and "Bob" in index
+    assert index.complete("jo") == ["John Smith"]
+    assert index.complete("SMI") == ["John Smith", "Jane Smithson"]
+    # words are separated by spaces, dashes, dots and underscores
+    assert index.complete("maria") == ["Anna-Maria Lopez"]
+    assert index.complete("test") == ["smoke_test.notes"]
+    assert index.complete("notes") == ["smoke_test.notes"]
+    # shorter completions of a prefix first, the walk stops at the limit
+    assert index.complete("sm", limit=2) == ["John Smith", "Jane Smithson"]
+    assert index.complete("x") == []
+    assert index.complete("") == sorted(NAMES)
+
+
+def test_add_and_remove():
+    index = CompletionIndex(["John Smith"])
+    index.add("John Smith")
+    index.add("Johnny")
+    assert index.complete("john") == ["John Smith", "Johnny"]
+    index.remove("John Smith")
+    index.remove("Nobody")
+    assert index.complete("john") == ["Johnny"]
+    assert index.complete("smith") == []
+    # the branches of the removed entry are pruned, the shared prefix stays
+    assert "s" not in index._root
+    assert list(index._root) == ["j"]
+    index.remove("Johnny")
+    assert index._root == {} and len(index) == 0
+
+
+def test_fuzzy_fallback():
+    index = CompletionIndex(NAMES)
+    # the characters in order, the shortest matches first (then alphabetically),
+    # only entries with a word starting with the same letter
+    assert index.complete("jsm") == []
+    assert index.fuzzy_complete("jsm") == ["Jane Smithson", "John Smith"]
+    assert index.fuzzy_complete("sn") == ["Jane Smithson", "smoke_test.notes"]
+    assert index.fuzzy_complete("bx") == []
+    assert index.fuzzy_complete("") == []
+    assert len(index.fuzzy_complete("s")) == 3
+    assert len(index.fuzzy_complete("s", max_scan=1)) == 1
+
+
+def test_completer_adds_fuzzy_matches():
+    index = CompletionIndex(NAMES)
+
+    def completions(text, **kwargs):
+        completer = CompletionIndexCompleter(index, **kwargs)
+        return [
+            completion.text
+            for completion in completer.get_completions(Document(text), None)
+        ]
+
+    assert completions("smi") == ["John Smith", "Jane Smithson"]
+    assert completions("jsm") == ["Jane Smithson", "John Smith"]
+    assert completions("jsm", fuzzy=False) == []
+    assert completions("smi", limit=1) == ["John Smith"]
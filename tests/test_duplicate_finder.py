@@ -0,0 +1,50 @@
+from utility.duplicate_finder import DuplicateFinder
+
+
+def write(path, content: bytes):
+    path.write_bytes(content)
+    return str(path), len(content)
+
+
+def test_duplicates_found_by_size_edge_and_full_hash(tmp_path):
+    # files bigger than two edges: the same first and last bytes, different middle
+    edge_size = 16
+    same_edges = b"a" * edge_size + b"b" * 8 + b"c" * edge_size
+    other_middle = b"a" * edge_size + b"x" * 8 + b"c" * edge_size
+    files = [
+        ("original", *write(tmp_path / "original", same_edges)),
+        ("copy", *write(tmp_path / "copy", same_edges)),
+        ("other middle", *write(tmp_path / "other_middle", other_middle)),
+        ("other size", *write(tmp_path / "other_size", same_edges + b"!")),
+        ("small", *write(tmp_path / "small", b"small")),
+        ("small copy", *write(tmp_path / "small_copy", b"small")),
+        ("empty", *write(tmp_path / "empty", b"")),
+        ("empty copy", *write(tmp_path / "empty_copy", b"")),
+    ]
+    for workers in (1, 4):
+        duplicates = DuplicateFinder(workers, edge_size=edge_size).find(files)
+        # empty files are not duplicates
+        assert duplicates == {"copy": "original", "small copy": "small"}
+
+
+def test_first_file_is_the_original(tmp_path):
+    files = [
+        ("c", *write(tmp_path / "c", b"same")),
+        ("a", *write(tmp_path / "a", b"same")),
+        ("b", *write(tmp_path / "b", b"same")),
+    ]
+    assert DuplicateFinder().find(files) == {"a": "c", "b": "c"}
+
+
+def test_every_stage_reads_a_file_once(tmp_path):
+    content = b"0123456789" * 10
+    files = [
+        (i, *write(tmp_path / str(i), content[:-1] + bytes([i % 2]))) for i in range(4)
+    ]
+    # the same size, but different first bytes
+    files.append((4, *write(tmp_path / "4", b"!" + content[1:])))
+    finder = DuplicateFinder(edge_size=16)
+    assert finder.find(files) == {2: 0, 3: 1}
+    # the hashes are cached by path and only the candidates of the previous stage are hashed
+    assert len(finder._edge_hashes) == 5
+    assert len(finder._full_hashes) == 4
@@ -0,0 +1,126 @@
+import os
+import errno
+
+import pytest
+
+from utility.file_mover import FileMover
+from utility.sorter import FileSorter
+from tests.test_sorter import make_tree, read_tree
+
+# bigger than one copy_file_range call on some systems, not a multiple of the page size
+CONTENT = os.urandom(3 * 1024 * 1024 + 123)
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source" / "file.bin"
+    path.parent.mkdir()
+    path.write_bytes(CONTENT)
+    os.utime(path, (1_000_000, 1_000_000))
+    (tmp_path / "destination").mkdir()
+    return path
+
+
+def leftovers(tmp_path) -> list:
+    return [path.name for path in tmp_path.rglob("*.part")]
+
+
+def assert_moved(tmp_path, source, destination):
+    assert not source.exists()
+    assert destination.read_bytes() == CONTENT
+    assert os.stat(destination).st_mtime == 1_000_000
+    assert leftovers(tmp_path) == []
+
+
+def test_move_across_devices(tmp_path, source):
+    destination = tmp_path / "destination" / "file.bin"
+    assert FileMover().move(str(source), str(destination), same_device=False)
+    assert_moved(tmp_path, source, destination)
+
+
+def test_rename_failing_with_exdev_falls_back_to_copy(tmp_path, source, monkeypatch):
+    rename = os.rename
+
+    def cross_device_rename(src, dst):
+        # the rename of the source fails, the rename of the copied temporary file works
+        if src == str(source):
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        rename(src, dst)
+
+    monkeypatch.setattr(os, "rename", cross_device_rename)
+    destination = tmp_path / "destination" / "file.bin"
+    assert FileMover().move(str(source), str(destination))
+    assert_moved(tmp_path, source, destination)
+
+
+@pytest.mark.parametrize("fallback", ["sendfile", "userspace"])
+def test_copy_fallbacks(tmp_path, source, monkeypatch, fallback):
+    def unsupported(*args):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    monkeypatch.setattr(os, "copy_file_range", unsupported, raising=False)
+    if fallback == "userspace":
+        monkeypatch.setattr(os, "sendfile", unsupported, raising=False)
+    destination = tmp_path / "destination" / "file.bin"
+    assert FileMover().move(str(source), str(destination), same_device=False)
+    assert_moved(tmp_path, source, destination)
+
+
+@pytest.mark.parametrize("failure", ["error", "short copy"])
+def test_failure_in_the_middle_of_the_copy(tmp_path, source, monkeypatch, failure):
+    copy_file_range = getattr(os, "copy_file_range", None)
+    if copy_file_range is None:
+        pytest.skip("os.copy_file_range is not available")
+    calls = []
+
+    def failing_copy(source_fd, destination_fd, count, *args):
+        calls.append(count)
+        if len(calls) == 1:
+            return copy_file_range(source_fd, destination_fd, 1024 * 1024)
+        if failure == "error":
+            raise OSError(errno.EIO, "Input/output error")
+        # the source ends earlier than its size said
+        return 0
+
+    monkeypatch.setattr(os, "copy_file_range", failing_copy)
+    destination = tmp_path / "destination" / "file.bin"
+    with pytest.raises(OSError) as e:
+        FileMover().move(str(source), str(destination), same_device=False)
+    assert e.value.errno == errno.EIO
+    # the source is kept, there is neither a destination nor a temporary file
+    assert source.read_bytes() == CONTENT
+    assert not destination.exists()
+    assert leftovers(tmp_path) == []
+
+
+def test_symlink_across_devices(tmp_path, source):
+    link = tmp_path / "source" / "link"
+    link.symlink_to("file.bin")
+    destination = tmp_path / "destination" / "link"
+    assert FileMover().move(str(link), str(destination), same_device=False)
+    assert not os.path.lexists(link)
+    assert os.readlink(destination) == "file.bin"
+
+
+def test_sort_into_folders_on_another_device(tmp_path, home, monkeypatch):
+    # every category folder is on its own device, so every move of the sort is a copy
+    categories = FileSorter().excluded_folders
+
+    def device(self, directory):
+        name = os.path.basename(directory)
+        return categories.index(name) + 1 if name in categories else 0
+
+    expected_path = tmp_path / "renamed"
+    expected_path.mkdir()
+    make_tree(expected_path)
+    FileSorter(incremental=False).sort(str(expected_path))
+
+    monkeypatch.setattr(FileMover, "device", device)
+    path = tmp_path / "copied"
+    path.mkdir()
+    make_tree(path)
+    sorter = FileSorter(incremental=False)
+    sorter.sort(str(path))
+    assert read_tree(path) == read_tree(expected_path)
+    assert sorter.metrics.counters["copied"] == sorter.metrics.counters["moved"] > 0
+    assert leftovers(path) == []
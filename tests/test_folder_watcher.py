@@ -0,0 +1,98 @@
+import queue
+import shutil
+import threading
+
+import pytest
+
+from utility import folder_watcher
+from utility.folder_watcher import FolderWatcher
+
+WATCHERS = [
+    pytest.param(False, id="inotify"),
+    pytest.param(True, id="polling"),
+]
+
+
+def make_watcher(path, polling: bool) -> FolderWatcher:
+    if not polling and folder_watcher._load_inotify() is None:
+        pytest.skip("inotify is not available")
+    return FolderWatcher(
+        str(path),
+        ["archives"],
+        debounce=0.1,
+        max_delay=1.0,
+        polling=polling,
+        poll_interval=0.05,
+    )
+
+
+def next_batch(batches, timeout=5.0):
+    # the generator waits for changes forever, so it is advanced in a thread
+    result = queue.Queue()
+    thread = threading.Thread(target=lambda: result.put(next(batches)), daemon=True)
+    thread.start()
+    try:
+        return result.get(timeout=timeout)
+    except queue.Empty:
+        pytest.fail("no batch of changes")
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for folder in ("inbox", "inbox/old", "other", "archives"):
+        (tmp_path / folder).mkdir()
+    return tmp_path
+
+
+@pytest.mark.parametrize("polling", WATCHERS)
+def test_new_file_is_picked_up(tree, polling):
+    with make_watcher(tree, polling) as watcher:
+        assert watcher.uses_inotify is not polling
+        batches = watcher.batches()
+        (tree / "inbox" / "photo.jpg").write_bytes(b"jpg")
+        ready, busy = next_batch(batches)
+        assert ready == {str(tree / "inbox")}
+        assert busy == set()
+        # files in excluded folders are not watched, a new directory is sorted with its parent
+        (tree / "archives" / "old.zip").write_bytes(b"zip")
+        (tree / "other" / "new").mkdir()
+        ready, _ = next_batch(batches)
+        assert ready == {str(tree / "other")}
+
+
+@pytest.mark.parametrize("polling", WATCHERS)
+def test_directory_removed_while_watching(tree, polling):
+    with make_watcher(tree, polling) as watcher:
+        batches = watcher.batches()
+        shutil.rmtree(tree / "inbox")
+        (tree / "other" / "notes.txt").write_text("notes")
+        ready, _ = next_batch(batches)
+        assert ready == {str(tree / "other")}
+        if not polling:
+            # the watches of the removed directories are dropped
+            assert sorted(watcher._watches.values()) == [
+                str(tree),
+                str(tree / "other"),
+            ]
+
+
+def test_directory_removed_before_it_is_watched(tree, monkeypatch):
+    walk = FolderWatcher._walk
+
+    def racing_walk(self, path):
+        # the directory is removed between its scan and inotify_add_watch (ENOENT)
+        for folder_path, entries in walk(self, path):
+            if folder_path == str(tree / "inbox" / "old"):
+                shutil.rmtree(folder_path)
+            yield folder_path, entries
+
+    monkeypatch.setattr(FolderWatcher, "_walk", racing_walk)
+    with make_watcher(tree, polling=False) as watcher:
+        assert sorted(watcher._watches.values()) == [
+            str(tree),
+            str(tree / "inbox"),
+            str(tree / "other"),
+        ]
+        (tree / "inbox" / "photo.jpg").write_bytes(b"jpg")
+        ready, _ = next_batch(watcher.batches())
+        assert ready == {str(tree / "inbox")}
@@ -0,0 +1,69 @@
+import pytest
+
+from utility.ignore_rules import IgnoreRules
+
+
+@pytest.mark.parametrize(
+    "relative_path, is_dir, excluded",
+    [
+        ("build.log", False, True),
+        ("logs/build.log", False, True),
+        # the negation is the last matching pattern
+        ("logs/keep.log", False, False),
+        ("keep.log", False, False),
+        # anchored to the sorted directory
+        ("tmp", True, True),
+        ("project/tmp", True, False),
+        # a pattern with a / in the middle is anchored too
+        ("docs/drafts", True, True),
+        ("archive/docs/drafts", True, False),
+        # directories only
+        ("cache", True, True),
+        ("cache", False, False),
+        ("a/b/cache", True, True),
+        ("src/node_modules", True, True),
+    ],
+)
+def test_negation_and_anchoring(relative_path, is_dir, excluded):
+    rules = IgnoreRules(
+        ["*.log", "!keep.log", "/tmp", "docs/drafts", "cache/", "node_modules"]
+    )
+    assert rules.excluded(relative_path, is_dir) is excluded
+
+
+def test_patterns_without_negations_give_the_same_results_as_with_them():
+    # without negations the patterns are joined into sets and regexes
+    patterns = ["*.log", "/tmp", "docs/**/drafts", "cache/", "node_modules", "?.bak"]
+    joined = IgnoreRules(patterns)
+    ordered = IgnoreRules(patterns + ["!never_matched"])
+    for relative_path in [
+        "a.log",
+        "x/a.log",
+        "tmp",
+        "x/tmp",
+        "docs/drafts",
+        "docs/a/b/drafts",
+        "x/docs/drafts",
+        "cache",
+        "node_modules",
+        "a.bak",
+        "ab.bak",
+    ]:
+        for is_dir in (False, True):
+            assert joined.excluded(relative_path, is_dir) == ordered.excluded(
+                relative_path, is_dir
+            ), relative_path
+
+
+def test_sortignore_file_and_exclude_patterns(tmp_path):
+    (tmp_path / ".sortignore").write_text(
+        "# comment\n\n*.iso\n!keep.iso\n", encoding="utf-8"
+    )
+    rules = IgnoreRules.for_directory(str(tmp_path), ["keep.iso"])
+    # the rules file itself is not sorted
+    assert rules.excluded(".sortignore")
+    assert not rules.excluded("sub/.sortignore")
+    assert rules.excluded("image.iso")
+    # patterns from the command line take precedence over the file
+    assert rules.excluded("keep.iso")
+    assert IgnoreRules.for_directory(str(tmp_path)).fingerprint != rules.fingerprint
@@ -0,0 +1,27 @@
+import os
+
+from utility.name_allocator import NameAllocator
+
+
+def test_taken_names_get_the_next_free_suffix(tmp_path):
+    (tmp_path / "report.txt").write_text("")
+    (tmp_path / "report_2.txt").write_text("")
+    allocator = NameAllocator()
+    assert allocator.allocate(str(tmp_path), "report", ".txt") == os.path.join(
+        tmp_path, "report_1.txt"
+    )
+    assert allocator.allocate(str(tmp_path), "report", ".txt") == os.path.join(
+        tmp_path, "report_3.txt"
+    )
+    assert allocator.allocate(str(tmp_path), "report", ".pdf") == os.path.join(
+        tmp_path, "report.pdf"
+    )
+
+
+def test_names_of_a_directory_which_does_not_exist_yet(tmp_path):
+    allocator = NameAllocator()
+    path = str(tmp_path / "documents")
+    assert allocator.allocate(path, "a", ".txt") == os.path.join(path, "a.txt")
+    assert allocator.allocate(path, "a", ".txt") == os.path.join(path, "a_1.txt")
+    # a directory named like a file without its extension does not collide with it
+    assert allocator.allocate(path, "a") == os.path.join(path, "a")
@@ -0,0 +1,22 @@
+from utility.name_normalizer import normalize_name, transliterate
+
+
+def test_polish_letters_are_transliterated():
+    assert normalize_name("Zażółć gęślą jaźń") == "Zazolc_gesla_jazn"
+    assert normalize_name("ŁÓDŹ") == "LODZ"
+
+
+def test_letters_of_other_latin_languages_and_compatibility_forms():
+    assert transliterate("Ærøskøbing") == "AEroskobing"
+    assert transliterate("Straße") == "Strasse"
+    assert transliterate("café crème") == "cafe creme"
+    # ligature and fullwidth forms are decomposed by NFKD
+    assert transliterate("ﬁle") == "file"
+    assert transliterate("ＡＢＣ") == "ABC"
+
+
+def test_other_characters_are_replaced_with_one_underscore():
+    assert normalize_name("my file (1)") == "my_file_1_"
+    assert normalize_name("already_normal_123") == "already_normal_123"
+    # letters of other scripts are kept
+    assert normalize_name("Привет мир") == "Привет_мир"
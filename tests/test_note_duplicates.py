@@ -0,0 +1,102 @@
+import pytest
+
+from utility.note_duplicates import NoteDuplicateFinder
+from utility.cli_notes_interaction import CliNotesInteraction
+from utility.notes import Notes
+from utility.note import Note
+from utility.title import Title
+from utility.content import Content
+
+TEXT = (
+    "Buy milk, bread and eggs on the way home, then call the plumber about "
+    "the leaking kitchen tap and book the car service for next Tuesday."
+)
+
+
+def make_notes(contents: dict) -> Notes:
+    notes = Notes()
+    for title, content in contents.items():
+        notes.add_note(Note(Title(title), Content(content), set()))
+    return notes
+
+
+@pytest.fixture
+def signed(monkeypatch):
+    # contents signed by the finder (a signature is computed for every one)
+    contents = []
+    signature = NoteDuplicateFinder._signature
+
+    def counted(self, content):
+        contents.append(content)
+        return signature(self, content)
+
+    monkeypatch.setattr(NoteDuplicateFinder, "_signature", counted)
+    return contents
+
+
+def test_signatures_are_recomputed_only_for_changed_notes(signed):
+    notes = make_notes({"a": TEXT, "b": TEXT.upper(), "c": "something else"})
+    finder = NoteDuplicateFinder()
+    finder.find_duplicates(notes)
+    assert len(signed) == 3
+    signed.clear()
+    finder.find_duplicates(notes)
+    assert signed == []
+    notes["c"].content = Content("something new")
+    del notes["b"]
+    finder.find_duplicates(notes)
+    assert signed == ["something new"]
+    # removed notes are dropped from the cache
+    assert set(finder._signatures) == {"a", "c"}
+
+
+def test_near_duplicates():
+    notes = make_notes(
+        {
+            "shopping": TEXT,
+            "shopping copy": TEXT.replace("Tuesday", "Wednesday"),
+            "shopping again": TEXT.replace("eggs", "butter").upper(),
+            "other": "Meeting notes: the budget for the next quarter is approved.",
+            "empty": "",
+            "empty too": "   ",
+        }
+    )
+    clusters = NoteDuplicateFinder().find_duplicates(notes, 0.6)
+    # empty notes are not duplicates of each other
+    assert clusters == [["shopping", "shopping again", "shopping copy"]]
+    assert NoteDuplicateFinder().find_duplicates(notes, 1.0) == []
+
+
+def test_threshold():
+    notes = make_notes(
+        {"first": TEXT, "second": TEXT[: len(TEXT) // 2] + " and a different ending."}
+    )
+    # one row per band - notes with any common signature value are compared
+    finder = NoteDuplicateFinder(bands=128, rows=1)
+    finder.find_duplicates(notes)
+    similarity = finder.similarity("first", "second")
+    assert 0.2 < similarity < 0.8
+    assert finder.find_duplicates(notes, similarity) == [["first", "second"]]
+    assert finder.find_duplicates(notes, similarity + 1 / finder.num_perm) == []
+
+
+@pytest.mark.parametrize(
+    "threshold, message",
+    [
+        ("", "No near-duplicate notes found."),
+        ("0.5", "Near-duplicate notes (similarity >= 0.5):\n1. a | b"),
+        ("0", "Error: similarity threshold must be between 0 and 1. Please try again."),
+        (
+            "1.5",
+            "Error: similarity threshold must be between 0 and 1. Please try again.",
+        ),
+        ("many", "Error: could not convert string to float: 'many'. Please try again."),
+    ],
+)
+def test_dupes_command(threshold, message):
+    interaction = CliNotesInteraction(
+        make_notes({"a": TEXT, "b": TEXT.replace("milk", "tea").replace("car", "bike")})
+    )
+    if not threshold:
+        interaction.notes["b"].content = Content("nothing like the other note")
+    assert interaction.find_duplicates(threshold) == message
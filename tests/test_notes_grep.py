@@ -0,0 +1,101 @@
+import re
+from types import SimpleNamespace
+from multiprocessing import shared_memory
+
+import pytest
+
+from utility import notes_grep
+from utility.notes_grep import NotesGrep
+from utility.notes import Notes
+from utility.note import Note
+from utility.title import Title
+from utility.content import Content
+
+
+def make_notes(count: int) -> Notes:
+    notes = Notes()
+    for i in range(count):
+        content = f"note {i}: buy Milk" if i % 3 == 0 else f"note {i}: buy tea"
+        if i % 4 == 0:
+            content += " and MILK ąę"
+        notes.add_note(Note(Title(f"note {i}"), Content(content), set()))
+    return notes
+
+
+def matches(results) -> dict:
+    return {key: snippets for _, found, _, _, _ in results for key, snippets in found}
+
+
+def test_case_insensitive_search():
+    notes = make_notes(6)
+    grep = NotesGrep(workers=1)
+    assert set(matches(grep.grep(notes, "Milk"))) == {"note 0", "note 3"}
+    found = matches(grep.grep(notes, "milk", ignore_case=True))
+    assert set(found) == {"note 0", "note 3", "note 4"}
+    assert found["note 0"] == [
+        "note 0: buy [Milk] and MILK ąę",
+        "note 0: buy Milk and [MILK] ąę",
+    ]
+    assert matches(grep.grep(notes, "coffee")) == {}
+    assert list(grep.grep(Notes(), "milk")) == []
+    with pytest.raises(re.error):
+        list(grep.grep(notes, "(milk"))
+
+
+def test_chunks_of_worker_processes():
+    notes = make_notes(25)
+    serial = matches(NotesGrep(workers=1).grep(notes, "milk", True))
+    results = list(
+        NotesGrep(workers=3, chunk_size=4, min_parallel_size=0).grep(
+            notes, "milk", True
+        )
+    )
+    # 25 notes in chunks of 4: the last chunk is shorter, no note is lost or scanned twice
+    assert sorted(number for number, _, _, _, _ in results) == list(range(7))
+    assert sorted(size for _, _, size, _, _ in results) == [1] + [4] * 6
+    assert matches(results) == serial
+    assert len(serial) == 13
+
+
+@pytest.fixture
+def blocks(monkeypatch):
+    # names of the shared memory blocks created by grep
+    names = []
+
+    class SharedMemory(shared_memory.SharedMemory):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            names.append(self.name)
+
+    monkeypatch.setattr(
+        notes_grep, "shared_memory", SimpleNamespace(SharedMemory=SharedMemory)
+    )
+    return names
+
+
+def assert_released(names):
+    assert names
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+
+def test_shared_memory_is_released_after_an_error(blocks, monkeypatch):
+    def failing_scan(*args):
+        raise RuntimeError("scan failed")
+
+    # the worker processes are forked with the failing scan
+    monkeypatch.setattr(notes_grep, "_scan", failing_scan)
+    grep = NotesGrep(workers=2, chunk_size=5, min_parallel_size=0)
+    with pytest.raises(RuntimeError, match="scan failed"):
+        list(grep.grep(make_notes(20), "milk"))
+    assert_released(blocks)
+
+
+def test_shared_memory_is_released_when_the_results_are_not_read(blocks):
+    results = NotesGrep(workers=2, chunk_size=5, min_parallel_size=0).grep(
+        make_notes(20), "milk"
+    )
+    next(results)
+    results.close()
+    assert_released(blocks)
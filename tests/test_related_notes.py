@@ -0,0 +1,110 @@
+import math
+
+import pytest
+
+from utility.related_notes import RelatedNotesIndex
+from utility.cli_notes_interaction import CliNotesInteraction
+from utility.notes import Notes
+from utility.note import Note
+from utility.title import Title
+from utility.content import Content
+
+
+def make_notes(contents: dict) -> Notes:
+    notes = Notes()
+    for title, content in contents.items():
+        notes.add_note(Note(Title(title), Content(content), set()))
+    return notes
+
+
+NOTES = {
+    "x": "apple banana",
+    "y": "apple",
+    "w": "apple banana banana",
+    "z": "cherry",
+}
+
+
+def test_ranking():
+    index = RelatedNotesIndex(make_notes(NOTES))
+    # 4 notes: idf = ln(5 / (1 + document frequency)) + 1, tf = 1 + ln(count)
+    # the titles and cherry are in 1 note, apple in 3 notes, banana in 2 notes
+    title, apple, banana = math.log(5 / 2) + 1, math.log(5 / 4) + 1, math.log(5 / 3) + 1
+    x = math.sqrt(title**2 + apple**2 + banana**2)
+    y = math.sqrt(title**2 + apple**2)
+    w = math.sqrt(title**2 + apple**2 + ((1 + math.log(2)) * banana) ** 2)
+    related = index.related("x")
+    # z has no term in common with x
+    assert [key for key, _ in related] == ["w", "y"]
+    assert related[0][1] == pytest.approx(
+        (apple**2 + (1 + math.log(2)) * banana**2) / (x * w)
+    )
+    assert related[1][1] == pytest.approx(apple**2 / (x * y))
+    assert [key for key, _ in index.related("x", top_k=1)] == ["w"]
+    assert index.related("z") == []
+    with pytest.raises(KeyError):
+        index.related("missing")
+
+
+def test_updates_give_the_ranking_of_a_new_index():
+    notes = make_notes(NOTES)
+    index = RelatedNotesIndex(notes)
+    index.related("x")
+    notes["y"].content = Content("apple banana")
+    index.update("y", notes["y"])
+    del notes["w"]
+    index.remove("w")
+    notes.add_note(Note(Title("v"), Content("banana cherry"), {"apple"}))
+    index.update("v", notes["v"])
+    fresh = RelatedNotesIndex(notes)
+    for key in notes:
+        assert index.related(key) == pytest.approx(fresh.related(key))
+
+
+def test_compact():
+    notes = make_notes(NOTES)
+    index = RelatedNotesIndex(notes)
+    index.related("x")
+    assert len(index._row_keys) == 4
+    # every update outdates a row, the arrays are compacted when most of the rows are outdated
+    for content in ("apple cherry", "banana", "apple banana cherry"):
+        notes["y"].content = Content(content)
+        index.update("y", notes["y"])
+    index.remove("z")
+    del notes["z"]
+    assert len(index._row_keys) == index._alive == 3
+    assert None not in index._row_keys
+    assert list(index._indptr) == sorted(index._indptr)
+    fresh = RelatedNotesIndex(notes)
+    for key in notes:
+        assert index.related(key) == pytest.approx(fresh.related(key))
+
+
+def test_unchanged_note_is_not_indexed_again():
+    notes = make_notes(NOTES)
+    index = RelatedNotesIndex(notes)
+    index.related("x")
+    index.update("x", notes["x"])
+    assert len(index._row_keys) == 4
+
+
+def test_commands_keep_the_index_up_to_date(monkeypatch):
+    interaction = CliNotesInteraction(make_notes(NOTES))
+    assert [key for key, _ in interaction.related_index.related("z")] == []
+
+    # after the first query the notes are not synchronized again, the commands update the index
+    def no_sync():
+        raise AssertionError("the notes are synchronized again")
+
+    monkeypatch.setattr(interaction.related_index, "_sync", no_sync)
+    interaction.insert_note("cherries", "cherry pie", set())
+    assert [key for key, _ in interaction.related_index.related("z")] == ["cherries"]
+    note = interaction.notes["cherries"]
+    note.content = Content("pie")
+    interaction.note_changed(note)
+    assert interaction.related_index.related("z") == []
+    interaction.rename_note(note, "cherry")
+    assert [key for key, _ in interaction.related_index.related("z")] == ["cherry"]
+    interaction.remove_note("cherry")
+    assert interaction.related_index.related("z") == []
+    assert "No related notes." in interaction.show_notes("z")
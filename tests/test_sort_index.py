@@ -0,0 +1,154 @@
+import os
+import sqlite3
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from utility import sorter as sorter_module
+from utility.sort_index import SortIndex
+from utility.sorter import FileSorter
+from tests.test_sorter import make_tree
+
+
+def stat(size=10, mtime_ns=100, inode=1):
+    return SimpleNamespace(st_size=size, st_mtime_ns=mtime_ns, st_ino=inode)
+
+
+def indexed(tmp_path, fingerprint="settings", rules="rules"):
+    # a directory tree indexed as after a sort, loaded by a new index with the given settings
+    root = tmp_path / "tree"
+    (root / "sub").mkdir(parents=True, exist_ok=True)
+    index = SortIndex(tmp_path / "index.sqlite3", "settings")
+    index.load(str(root), "rules")
+    index.update({str(root): [str(root / "sub")], str(root / "sub"): []})
+    index = SortIndex(tmp_path / "index.sqlite3", fingerprint)
+    index.load(str(root), rules)
+    return index, root
+
+
+def test_unchanged_directory(tmp_path):
+    index, root = indexed(tmp_path)
+    assert index.unchanged(str(root), os.stat(root)) == [str(root / "sub")]
+    assert index.unchanged(str(root / "sub"), os.stat(root / "sub")) == []
+
+
+def test_changed_directory(tmp_path):
+    index, root = indexed(tmp_path)
+    current = os.stat(root)
+    size, mtime_ns, inode = current.st_size, current.st_mtime_ns, current.st_ino
+    assert index.unchanged(str(root), stat(size, mtime_ns, inode)) is not None
+    assert index.unchanged(str(root), stat(size, mtime_ns + 1, inode)) is None
+    # a directory replaced by another one with the same path
+    assert index.unchanged(str(root), stat(size, mtime_ns, inode + 1)) is None
+    assert index.unchanged(str(root / "new"), os.stat(root)) is None
+
+
+def test_changed_settings_or_rules_drop_the_index(tmp_path):
+    index, root = indexed(tmp_path, fingerprint="other settings")
+    assert index.unchanged(str(root), os.stat(root)) is None
+    index, root = indexed(tmp_path, rules="other rules")
+    assert index.unchanged(str(root), os.stat(root)) is None
+
+
+def test_stale_directories_are_dropped(tmp_path):
+    index, root = indexed(tmp_path)
+    index.update({}, stale=[str(root / "sub")])
+    index.load(str(root), "rules")
+    assert index.unchanged(str(root / "sub"), os.stat(root / "sub")) is None
+    # the parent of a stale directory is scanned again
+    assert index.unchanged(str(root), os.stat(root)) is None
+
+
+def test_damaged_database_is_recreated(tmp_path):
+    (tmp_path / "index.sqlite3").write_bytes(b"not a database" * 100)
+    index, root = indexed(tmp_path)
+    assert index.unchanged(str(root), os.stat(root)) == [str(root / "sub")]
+
+
+def test_waits_for_the_lock_of_another_sorter(tmp_path):
+    index, root = indexed(tmp_path)
+    other = sqlite3.connect(
+        tmp_path / "index.sqlite3", isolation_level=None, check_same_thread=False
+    )
+    other.execute("BEGIN IMMEDIATE")
+    timer = threading.Timer(0.3, other.commit)
+    timer.start()
+    try:
+        index.update({str(root): []})
+    finally:
+        timer.join()
+        other.close()
+    index.load(str(root), "rules")
+    assert index.unchanged(str(root), os.stat(root)) == []
+
+
+def test_lock_held_too_long(tmp_path, monkeypatch):
+    index, root = indexed(tmp_path)
+    monkeypatch.setattr(SortIndex, "BUSY_TIMEOUT", 0.05)
+    other = sqlite3.connect(tmp_path / "index.sqlite3", isolation_level=None)
+    other.execute("BEGIN EXCLUSIVE")
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            index.load(str(root), "rules")
+    finally:
+        other.rollback()
+        other.close()
+    # a locked database is not taken for a damaged one
+    index.load(str(root), "rules")
+    assert index.unchanged(str(root), os.stat(root)) == [str(root / "sub")]
+
+
+def test_indexes_shared_by_sorters_running_at_once(tmp_path):
+    roots = []
+    for i in range(4):
+        root = tmp_path / f"tree_{i}"
+        for j in range(20):
+            (root / str(j)).mkdir(parents=True)
+        roots.append(root)
+    errors = []
+
+    def sort(root):
+        index = SortIndex(tmp_path / "index.sqlite3", "settings")
+        try:
+            for _ in range(10):
+                index.load(str(root), "rules")
+                index.update({str(root / name): [] for name in os.listdir(root)})
+        except sqlite3.Error as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=sort, args=(root,)) for root in roots]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def scanned_directories(path, incremental=True) -> int:
+    # number of directories listed by a sort of the tree
+    sorter = FileSorter(incremental=incremental)
+    sorter.sort(str(path))
+    return sorter.metrics.counters["directories"]
+
+
+def test_sorter_skips_unchanged_directories(tmp_path, home, monkeypatch):
+    path = tmp_path / "sorted"
+    path.mkdir()
+    make_tree(path)
+    assert scanned_directories(path) > 0
+    assert scanned_directories(path) == 0
+
+    # only the changed directory is listed again (its subdirectories are checked by their stat)
+    folder = next(path.glob("Nowy_folder_*/deeper"))
+    (folder / "new.txt").write_bytes(b"text")
+    assert scanned_directories(path) == 1
+    assert (folder / "documents" / "new.txt").exists()
+
+    # other normalization of names gives other sorts of the directories, the index is dropped
+    directories = scanned_directories(path, incremental=False)
+    monkeypatch.setattr(
+        sorter_module, "NORMALIZATION_VERSION", sorter_module.NORMALIZATION_VERSION + 1
+    )
+    assert scanned_directories(path) == directories
+    assert scanned_directories(path) == 0
@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+from utility.sorter import FileSorter
+from utility.sort_journal import SortJournal
+from tests.test_sorter import make_tree, read_tree
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupt_after(monkeypatch, moves: int):
+    # the sort is interrupted (as by a crash) after the given number of moved files
+    move_file = FileSorter._move_file
+    moved = []
+
+    def interrupted_move_file(self, source, destination, same_device=True):
+        if len(moved) == moves:
+            raise Interrupted
+        moved.append(source)
+        move_file(self, source, destination, same_device)
+
+    monkeypatch.setattr(FileSorter, "_move_file", interrupted_move_file)
+
+
+def sorted_tree(tmp_path) -> dict:
+    path = tmp_path / "expected"
+    path.mkdir()
+    make_tree(path)
+    FileSorter(incremental=False).sort(str(path))
+    return read_tree(path)
+
+
+def interrupted_sort(tmp_path, home, monkeypatch, workers=1):
+    # only the journal of the interrupted run is left
+    for file_path in home.joinpath("PyAssist/journal").glob("*.jsonl"):
+        file_path.unlink()
+    path = tmp_path / "sorted"
+    path.mkdir()
+    make_tree(path)
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, 3)
+        with pytest.raises(Interrupted):
+            FileSorter(workers=workers, incremental=False).sort(str(path))
+    return path
+
+
+def journal_file(home):
+    (file_path,) = home.joinpath("PyAssist/journal").glob("*.jsonl")
+    return file_path
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_interrupted_sort_is_resumed(tmp_path, home, monkeypatch, workers):
+    expected = sorted_tree(tmp_path)
+    path = interrupted_sort(tmp_path, home, monkeypatch, workers)
+    assert SortJournal.load(journal_file(home))[3] == "interrupted"
+    assert read_tree(path) != expected
+    message = FileSorter(workers=workers).resume()
+    assert message.startswith("I've resumed sorting run")
+    assert read_tree(path) == expected
+    assert SortJournal.load(journal_file(home))[3] == "finished"
+    assert FileSorter().resume() == "There is no interrupted sorting run to resume."
+
+
+def test_resume_checks_operations_without_done_markers_on_disk(
+    tmp_path, home, monkeypatch
+):
+    expected = sorted_tree(tmp_path)
+    path = interrupted_sort(tmp_path, home, monkeypatch)
+    # the markers of the last batch are lost in a crash
+    file_path = journal_file(home)
+    lines = file_path.read_text(encoding="utf-8").splitlines(keepends=True)
+    file_path.write_text(
+        "".join(line for line in lines if "done" not in json.loads(line)),
+        encoding="utf-8",
+    )
+    FileSorter().resume()
+    assert read_tree(path) == expected
+
+
+def test_undo_restores_the_original_tree(tmp_path, home):
+    path = tmp_path / "sorted"
+    path.mkdir()
+    make_tree(path)
+    original = read_tree(path)
+    sorter = FileSorter(workers=4, incremental=False)
+    sorter.sort(str(path))
+    assert read_tree(path) != original
+    run_id = journal_file(home).stem
+    assert sorter.undo(run_id).startswith(f"I've undone sorting run {run_id}")
+    assert read_tree(path) == original
+    with pytest.raises(ValueError):
+        sorter.undo(run_id)
+
+
+def test_load_stops_at_a_cut_off_line(tmp_path):
+    file_path = tmp_path / "run.jsonl"
+    file_path.write_text(
+        '{"event": "start", "path": "/sorted"}\n'
+        '{"kind": "move", "source": "/sorted/a.txt", "destination": "/sorted/documents/a.txt"}\n'
+        '{"done": [0]}\n'
+        '{"kind": "move", "sour',
+        encoding="utf-8",
+    )
+    path, records, done, state = SortJournal.load(file_path)
+    assert (path, len(records), done, state) == ("/sorted", 1, {0}, "interrupted")
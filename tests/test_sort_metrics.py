@@ -0,0 +1,85 @@
+import io
+import json
+import time
+
+from utility.sort_metrics import SortMetrics, ProgressLine
+from utility.sort_plan import SortOperation
+
+
+def test_latencies_in_log2_buckets():
+    metrics = SortMetrics()
+    # microseconds: 0 -> bucket 0, 1 -> 1, 2..3 -> 2, 4..7 -> 3, 1000 -> 10
+    for us in (0, 1, 2, 3, 4, 7, 1000):
+        metrics.observe("scan", us / 1_000_000)
+    histogram = metrics.histograms["scan"]
+    assert histogram["buckets"] == [1, 1, 2, 2] + [0] * 6 + [1]
+    assert histogram["count"] == 7
+    assert histogram["max"] == 0.001
+    latency = metrics.to_dict()["latency"]["scan"]
+    assert latency["buckets_us"] == {"1": 1, "2": 1, "4": 2, "8": 2, "1024": 1}
+    # the upper bound of the bucket, but not more than the longest latency
+    assert latency["p50"] == 4 / 1_000_000
+    assert latency["p99"] == 0.001
+    assert abs(latency["mean"] - 1017 / 7 / 1_000_000) < 1e-12
+
+
+def test_operations_are_counted():
+    metrics = SortMetrics()
+    metrics.operation(SortOperation("move", "a", "b", "images", ".jpg", 300), 0.01)
+    metrics.operation(SortOperation("move", "c", "d", "images", ".jpg", None), 0.01)
+    metrics.operation(SortOperation("keep", "e"), 0.0)
+    assert metrics.counters["moved"] == 2
+    assert metrics.counters["skipped"] == 1
+    assert metrics.counters["bytes_moved"] == 300
+    assert metrics.histograms["move"]["count"] == 2
+
+
+def test_cpu_share_of_phases():
+    metrics = SortMetrics()
+    with metrics.phase("wait"):
+        time.sleep(0.2)
+    with metrics.phase("work"):
+        end = time.perf_counter() + 0.2
+        while time.perf_counter() < end:
+            pass
+    # a repeated phase is summed up
+    with metrics.phase("wait"):
+        time.sleep(0.1)
+    phases = metrics.to_dict()["phases"]
+    assert phases["wait"]["wall"] >= 0.3
+    assert phases["wait"]["cpu_share"] < 0.5
+    assert phases["work"]["cpu_share"] > 0.5
+    assert metrics.phase_name is None
+
+
+def test_dump(tmp_path):
+    metrics = SortMetrics()
+    metrics.count("scanned", 3)
+    metrics.observe("scan", 0.000_003)
+    with metrics.phase("plan"):
+        pass
+    file_path = tmp_path / "metrics.json"
+    metrics.dump(file_path)
+    dumped = json.loads(file_path.read_text())
+    assert dumped == json.loads(json.dumps(metrics.to_dict()))
+    assert dumped["counters"]["scanned"] == 3
+    assert dumped["latency"]["scan"]["buckets_us"] == {"4": 1}
+    assert set(dumped["phases"]["plan"]) == {"wall", "cpu", "cpu_share"}
+
+
+def test_progress_line():
+    stream = io.StringIO()
+    progress = ProgressLine(stream)
+    metrics = SortMetrics(progress, interval=60)
+    with metrics.phase("plan"):
+        metrics.count("scanned", 12)
+    # the calls within the interval are skipped, phases are always shown
+    line = "plan: 0 files in 0 directories scanned, 0.0 MB moved"
+    assert stream.getvalue() == "\r" + line
+    metrics.add_total(4)
+    metrics.count("errors")
+    assert metrics.progress_line() == (
+        "sort: 12 files in 0 directories scanned, 0/4 operations done, 0.0 MB moved, 1 errors"
+    )
+    progress.close()
+    assert stream.getvalue().endswith("\r" + " " * len(line) + "\r")
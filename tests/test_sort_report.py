@@ -0,0 +1,121 @@
+import json
+import contextlib
+
+import pytest
+
+from utility.sort_plan import SortOperation
+from utility.sort_report import SortReport
+
+
+def write_run(file_path, sorted_path: str, error=None) -> SortReport:
+    report = SortReport(file_path, sorted_path)
+    # the error ends the run, the report records it in the summary
+    with contextlib.suppress(OSError):
+        with report:
+            report.add(
+                SortOperation(
+                    "move",
+                    f"{sorted_path}/photo.jpg",
+                    f"{sorted_path}/images/photo.jpg",
+                    "images",
+                    ".jpg",
+                    100,
+                )
+            )
+            report.add(
+                SortOperation(
+                    "move",
+                    f"{sorted_path}/notes.txt",
+                    f"{sorted_path}/documents/notes.txt",
+                    "documents",
+                    ".txt",
+                    20,
+                )
+            )
+            report.add(
+                SortOperation(
+                    "keep", f"{sorted_path}/a.xyz", None, "unsorted", ".xyz", 5
+                )
+            )
+            report.add(SortOperation("rmdir", f"{sorted_path}/empty"))
+            if error is not None:
+                raise error
+    return report
+
+
+def test_events_and_summary(tmp_path):
+    file_path = tmp_path / "sort_report.jsonl"
+    report = write_run(file_path, "/data")
+    events = [json.loads(line) for line in file_path.read_text().splitlines()]
+    assert [event["event"] for event in events] == [
+        "start",
+        "move",
+        "move",
+        "keep",
+        "rmdir",
+        "summary",
+    ]
+    assert events[0]["run"] == events[-1]["run"] == report.run_id
+    assert events[1] == {
+        "event": "move",
+        "source": "/data/photo.jpg",
+        "destination": "/data/images/photo.jpg",
+        "category": "images",
+        "extension": ".jpg",
+        "size": 100,
+    }
+    summary = events[-1]
+    assert summary["operations"] == {"move": 2, "keep": 1, "rmdir": 1}
+    assert summary["categories"] == {
+        "images": {"files": 1, "bytes": 100},
+        "documents": {"files": 1, "bytes": 20},
+        "unsorted": {"files": 1, "bytes": 5},
+    }
+    assert "error" not in summary
+
+
+def test_render(tmp_path):
+    file_path = tmp_path / "sort_report.jsonl"
+    text_path = tmp_path / "sort_report.txt"
+    first = write_run(file_path, "/first")
+    write_run(file_path, "/second", error=OSError("disk full"))
+
+    # the last run by default
+    SortReport.render(file_path, text_path)
+    text = text_path.read_text()
+    assert "Activity report for directory: /second" in text
+    assert "/first" not in text
+    assert "images: .jpg;" in text
+    assert "/second/photo.jpg has moved to: /second/images/photo.jpg;" in text
+    assert "images: 1 files, 100 bytes;" in text
+    assert "Run interrupted by error: OSError: disk full" in text
+
+    SortReport.render(file_path, text_path, first.run_id, append=True)
+    text = text_path.read_text()
+    assert text.index("directory: /second") < text.index("directory: /first")
+    assert text.count("Summary (") == 2
+    with pytest.raises(ValueError):
+        SortReport.render(file_path, text_path, "19700101-000000-000000")
+
+
+def test_roll_keeps_the_configured_number_of_reports(tmp_path):
+    file_path = tmp_path / "sort_report.jsonl"
+    # no report yet - nothing to roll
+    SortReport.roll(file_path, max_size=10, backups=2)
+    runs = []
+    for i in range(4):
+        runs.append(write_run(file_path, f"/run{i}").run_id)
+        SortReport.roll(file_path, max_size=10, backups=2)
+    # every run is bigger than max_size, so it is rolled over, the two newest ones are kept
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "sort_report.jsonl.1",
+        "sort_report.jsonl.2",
+    ]
+    for backup, run_id in (("1", runs[3]), ("2", runs[2])):
+        events = (tmp_path / f"sort_report.jsonl.{backup}").read_text().splitlines()
+        assert json.loads(events[0])["run"] == run_id
+
+    # a small report is not rolled over
+    write_run(file_path, "/small")
+    SortReport.roll(file_path, max_size=1 << 20, backups=2)
+    assert file_path.exists()
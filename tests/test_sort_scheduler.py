@@ -0,0 +1,122 @@
+import json
+import time
+import threading
+
+import pytest
+
+from utility.sorter import FileSorter
+from utility.sort_metrics import SortMetrics
+from utility.sort_scheduler import SortScheduler
+from tests.test_sorter import make_tree
+
+
+def make_roots(tmp_path, count: int) -> list:
+    roots = []
+    for i in range(count):
+        root = tmp_path / f"root_{i}"
+        root.mkdir()
+        make_tree(root)
+        roots.append(str(root))
+    return roots
+
+
+@pytest.fixture
+def running(monkeypatch):
+    # the highest number of roots planned at the same time
+    lock = threading.Lock()
+    state = {"now": 0, "max": 0}
+    plan = FileSorter.plan
+
+    def slow_plan(self, path, *args, **kwargs):
+        with lock:
+            state["now"] += 1
+            state["max"] = max(state["max"], state["now"])
+        try:
+            time.sleep(0.1)
+            return plan(self, path, *args, **kwargs)
+        finally:
+            with lock:
+                state["now"] -= 1
+
+    monkeypatch.setattr(FileSorter, "plan", slow_plan)
+    return state
+
+
+@pytest.mark.parametrize("per_device", [1, 2])
+def test_roots_of_one_device_wait_for_a_slot(tmp_path, home, running, per_device):
+    roots = make_roots(tmp_path, 4)
+    SortScheduler(FileSorter, per_device).run(roots)
+    # all the roots are on the device of tmp_path
+    assert running["max"] == per_device
+
+
+def test_report_has_a_whole_section_per_root(tmp_path, home):
+    roots = make_roots(tmp_path, 3)
+    message = SortScheduler(FileSorter, per_device=3).run(roots, text_report=True)
+    assert f"all 3 folders: {3 * 9} files" in message
+    report_path = home / "PyAssist" / "sort_report.jsonl"
+    events = [json.loads(line) for line in report_path.read_text().splitlines()]
+    # every run is a start event, the events of its operations and its summary, the runs are not mixed
+    runs = []
+    for event in events:
+        if event["event"] == "start":
+            runs.append({"run": event["run"], "path": event["path"], "events": []})
+        elif event["event"] == "summary":
+            assert event["run"] == runs[-1]["run"]
+            runs[-1]["done"] = True
+        else:
+            assert "done" not in runs[-1]
+            runs[-1]["events"].append(event)
+    assert sorted(run["path"] for run in runs) == roots
+    for run in runs:
+        assert run["done"]
+        assert all(event["source"].startswith(run["path"]) for event in run["events"])
+    # the part files are appended and removed
+    assert list((home / "PyAssist").glob("*.part")) == []
+    text_report = (home / "PyAssist" / "sort_report.txt").read_text()
+    assert text_report.count("Activity report for directory") == 3
+    assert "Throughput:" in text_report
+
+
+def test_sorters_share_the_metrics(tmp_path, home):
+    roots = make_roots(tmp_path, 4)
+    metrics = SortMetrics()
+    plans = []
+    apply = FileSorter.apply
+
+    def new_sorter():
+        sorter = FileSorter(metrics=metrics)
+        sorter.apply = lambda plan, path: plans.append(len(plan)) or apply(
+            sorter, plan, path
+        )
+        return sorter
+
+    SortScheduler(new_sorter, per_device=4).run(roots)
+    assert metrics.total == sum(plans)
+    assert metrics.counters["moved"] == 4 * 8
+    assert metrics.phase_name is None
+
+
+def test_phases_of_sorters_running_at_once():
+    metrics = SortMetrics()
+    started, finish = threading.Barrier(3), threading.Event()
+
+    def sorter(name):
+        with metrics.phase(name):
+            started.wait()
+            finish.wait()
+
+    threads = [
+        threading.Thread(target=sorter, args=(name,)) for name in ("plan", "execute")
+    ]
+    for thread in threads:
+        thread.start()
+    started.wait()
+    assert set(metrics.phase_name.split(", ")) == {"plan", "execute"}
+    with metrics.phase("plan"):
+        with metrics.phase("index"):
+            assert set(metrics.phase_name.split(", ")) == {"plan", "execute", "index"}
+    finish.set()
+    for thread in threads:
+        thread.join()
+    assert metrics.phase_name is None
@@ -0,0 +1,82 @@
+import os
+import gzip
+import shutil
+import tarfile
+
+from utility.sorter import FileSorter
+
+FILES = {
+    "photo.jpg": b"jpeg",
+    "Photo!.jpg": b"another jpeg",
+    "notes.txt": b"text",
+    "song.mp3": b"mp3",
+    "unknown.xyz": b"?",
+    "Nowy folder/photo.jpg": b"jpeg in a subdirectory",
+    "Nowy folder/Zażółć.pdf": b"pdf",
+    "Nowy folder/deeper/clip.mp4": b"mp4",
+    "Nowy_folder/readme.txt": b"collides with the renamed directory",
+    # an empty directory
+    "empty": None,
+}
+
+
+def make_tree(path):
+    for name, content in FILES.items():
+        file_path = path / name
+        if content is None:
+            file_path.mkdir(parents=True)
+            continue
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_bytes(content)
+
+
+def read_tree(path) -> dict:
+    tree = {}
+    for folder_path, folders, files in os.walk(path):
+        relative_path = os.path.relpath(folder_path, path)
+        if not folders and not files:
+            tree[relative_path] = None
+        for name in files:
+            with open(os.path.join(folder_path, name), "rb") as fh:
+                tree[os.path.normpath(os.path.join(relative_path, name))] = fh.read()
+    return tree
+
+
+def test_parallel_and_serial_sorts_give_the_same_tree(tmp_path, home):
+    trees = []
+    for workers in (1, 4):
+        path = tmp_path / f"sorted_{workers}"
+        path.mkdir()
+        make_tree(path)
+        sorter = FileSorter(workers=workers, incremental=False)
+        assert sorter.sort(str(path)).startswith("I've sorted your files")
+        trees.append(read_tree(path))
+    assert trees[0] == trees[1]
+    assert trees[0]["images/photo.jpg"] == b"jpeg"
+    assert trees[0]["Nowy_folder_1/deeper/video/clip.mp4"] == b"mp4"
+    # empty directories are removed
+    assert "empty" not in trees[0]
+    assert trees[0]["Nowy_folder_1/documents/Zazolc.pdf"] == b"pdf"
+
+
+def test_archives_keep_double_extensions(tmp_path, home):
+    member = tmp_path / "member.txt"
+    member.write_bytes(b"member")
+    path = tmp_path / "sorted"
+    path.mkdir()
+    with tarfile.open(path / "My photos.tar.gz", "w:gz") as archive:
+        archive.add(member, "member.txt")
+    (path / "copy").mkdir()
+    with tarfile.open(path / "copy" / "Backup.TAR.GZ", "w:gz") as archive:
+        archive.add(member, "backup.txt")
+    shutil.copy(path / "My photos.tar.gz", path / "copy" / "Backup (2).TAR.GZ")
+    (path / "data.json.gz").write_bytes(gzip.compress(b"{}"))
+    FileSorter(dedupe="move", incremental=False).sort(str(path))
+    tree = read_tree(path)
+    assert "archives/My_photos.tar.gz" in tree
+    assert tree["archives/My_photos/member.txt"] == b"member"
+    assert "copy/archives/Backup.TAR.GZ" in tree
+    # the duplicate keeps its extension as well
+    assert "copy/duplicates/Backup_2_.TAR.GZ" in tree
+    # only archive suffixes are kept together
+    assert "archives/data_json.gz" in tree